@@ -5,6 +5,7 @@ from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 
 from .config import config
+from .json_provider import FastJSONProvider
 
 db = SQLAlchemy()
 jwt = JWTManager()
@@ -16,6 +17,7 @@ def create_app(config_name=None):
         config_name = os.getenv('FLASK_ENV', 'default')
     
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     app.config.from_object(config[config_name])
     
     # Initialize extensions
@@ -0,0 +1,99 @@
+"""Helpers for batch lookups by an id list and for batch write requests."""
+
+
+# Most IDs one batch request may ask for
+MAX_BATCH_IDS = 100
+
+# Most items one batch write request may carry
+MAX_BATCH_ACTIONS = 500
+
+# Largest ID of an INTEGER primary key; larger ones overflow the drivers
+MAX_ID = 2 ** 31 - 1
+
+
+def parse_ids(args):
+    """
+    Read the ids query parameter of a list request.
+
+    Args:
+        args: The request query arguments
+
+    Returns:
+        Tuple of unique positive IDs in request order, or None when the
+        client did not ask for a batch
+
+    Raises:
+        ValueError: If an ID is not a positive integer or there are too many
+    """
+    raw = args.get('ids')
+    if raw is None:
+        return None
+
+    # A dict keeps the first occurrence of each ID in request order
+    ids = {}
+    for value in raw.split(','):
+        value = value.strip()
+        if not value:
+            continue
+        try:
+            number = int(value) if value.isdecimal() else 0
+        except ValueError:
+            # Longer than Python's integer string conversion limit
+            number = 0
+        if not 1 <= number <= MAX_ID:
+            raise ValueError('IDs must be positive integers')
+        ids[number] = None
+        if len(ids) > MAX_BATCH_IDS:
+            raise ValueError(f'At most {MAX_BATCH_IDS} IDs can be requested at once')
+
+    if not ids:
+        raise ValueError('IDs must name at least one ID')
+    return tuple(ids)
+
+
+def order_by_ids(items, ids, key=lambda item: item.id):
+    """
+    Arrange the items found by a batch lookup in the requested ID order.
+
+    Args:
+        items: Items returned by the IN query, in any order
+        ids: The requested IDs
+        key: Callable returning the ID of an item
+
+    Returns:
+        Tuple of (list of items in ids order, list of IDs not found)
+    """
+    found = {key(item): item for item in items}
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+
+
+def parse_actions(items, actions):
+    """
+    Read the items of a batch write request.
+
+    Args:
+        items: The items list of the request body, [{"id": ..., "action": ...}]
+        actions: The allowed action names
+
+    Returns:
+        List of (id, action) tuples in request order
+
+    Raises:
+        ValueError: If the list is empty or too long, or an item is malformed
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty array')
+    if len(items) > MAX_BATCH_ACTIONS:
+        raise ValueError(f'At most {MAX_BATCH_ACTIONS} items can be sent at once')
+
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'Item {index} must be an object')
+        item_id, action = item.get('id'), item.get('action')
+        if not isinstance(item_id, int) or isinstance(item_id, bool) or not 1 <= item_id <= MAX_ID:
+            raise ValueError(f'Item {index}: id must be a positive integer')
+        if action not in actions:
+            raise ValueError(f'Item {index}: action must be one of {", ".join(actions)}')
+        parsed.append((item_id, action))
+    return parsed
@@ -0,0 +1,112 @@
+"""In-process result cache used by read-heavy service lookups."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a fixed TTL.
+
+    Entries are dropped when they are least recently used and the cache is
+    full, when they are older than ttl seconds, or when invalidate() matches
+    them. Writes that raced with an invalidation are discarded: get_or_load()
+    only stores a loaded value if no invalidation happened while it was being
+    computed, so a stale read can never be cached after the write that made it
+    stale.
+
+    The cache lives in one process. Other gunicorn workers or instances keep
+    their own copy, so the TTL bounds how long they can serve stale results.
+    """
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        Args:
+            key: Hashable cache key
+            loader: Zero-argument callable producing the value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        if not self.enabled:
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            generation = self._generation
+
+        # Load outside the lock so slow queries do not serialize other readers
+        value = loader()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, predicate=None):
+        """
+        Drop cached entries.
+
+        Args:
+            predicate: Callable taking a key and returning True for entries to
+                drop. Drops every entry when None.
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            self._generation += 1
+            if predicate is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [key for key in self._entries if predicate(key)]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self.invalidations += dropped
+            return dropped
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
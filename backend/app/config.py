@@ -12,6 +12,17 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    # Flat search result cache (entries, seconds); 0 disables it
+    FLAT_SEARCH_CACHE_SIZE = int(os.getenv('FLAT_SEARCH_CACHE_SIZE', 256))
+    FLAT_SEARCH_CACHE_TTL = int(os.getenv('FLAT_SEARCH_CACHE_TTL', 30))
+    # Answer flat searches from an in-memory numpy snapshot (needs numpy);
+    # the snapshot is rebuilt after FLAT_CATALOG_TTL seconds
+    FLAT_CATALOG_ENABLED = os.getenv('FLAT_CATALOG_ENABLED', 'false').lower() == 'true'
+    FLAT_CATALOG_TTL = int(os.getenv('FLAT_CATALOG_TTL', 300))
+    # Seconds a response stored under an Idempotency-Key is replayed
+    IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+    # Seconds a request holds its Idempotency-Key before a retry may take it over
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))
 
 
 class DevelopmentConfig(Config):
@@ -28,6 +39,8 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # Tests write fixtures straight to the database, bypassing invalidation
+    FLAT_SEARCH_CACHE_SIZE = 0
 
 
 config = {
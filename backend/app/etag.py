@@ -0,0 +1,158 @@
+"""Strong ETags for catalog endpoints, derived from shared per-resource version counters."""
+import hashlib
+import threading
+from functools import wraps
+from flask import current_app, request, make_response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import ResourceVersion
+from . import db
+
+
+# Resources whose write paths bump a version counter
+FLATS = 'flats'
+TOWERS = 'towers'
+AMENITIES = 'amenities'
+
+# Callbacks run when a process sees a resource version it did not write
+_change_listeners = {}
+
+
+def on_version_change(resource, callback):
+    """
+    Register a callback run when a request sees a new version of a resource.
+
+    Processes keep local copies of catalog data (the flat search cache and
+    columnar catalog) that their own writes keep current. Writes made by
+    other workers or instances only show up as a new shared version, so the
+    callback must drop the local copies built from the resource; otherwise a
+    fresh ETag could be served with a stale cached body. Called with the app
+    context of the request.
+
+    Args:
+        resource: Name of the resource (FLATS, TOWERS, AMENITIES)
+        callback: Callable taking no arguments
+    """
+    _change_listeners.setdefault(resource, []).append(callback)
+
+
+class ResourceVersions:
+    """
+    The versions of each resource last seen by this process.
+
+    The counters themselves live in the resource_versions table, bumped in
+    the transaction of every write, so all gunicorn workers and instances
+    derive the same ETag from the same data. This only tracks what the
+    process has seen, to notice changes made elsewhere.
+    """
+
+    def __init__(self):
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def observe(self, versions):
+        """
+        Record the current versions and return the resources that changed.
+
+        Resources seen for the first time do not count as changed.
+        """
+        with self._lock:
+            changed = [resource for resource, version in versions.items()
+                       if self._seen.get(resource, version) != version]
+            self._seen.update(versions)
+        return changed
+
+
+def get_resource_versions():
+    """Get the seen versions of the current app, creating them on first use."""
+    versions = current_app.extensions.get('resource_versions')
+    if versions is None:
+        versions = current_app.extensions.setdefault('resource_versions', ResourceVersions())
+    return versions
+
+
+def read_versions(resources):
+    """
+    Read the shared versions of the given resources in one query.
+
+    Runs the change listeners of resources changed since this process last
+    read them.
+
+    Returns:
+        Tuple of versions in the order of resources (0 if never written)
+    """
+    rows = dict(db.session.execute(
+        select(ResourceVersion.name, ResourceVersion.version).where(ResourceVersion.name.in_(resources))
+    ).all())
+    versions = {resource: rows.get(resource, 0) for resource in resources}
+    for resource in get_resource_versions().observe(versions):
+        for callback in _change_listeners.get(resource, ()):
+            callback()
+    return tuple(versions[resource] for resource in resources)
+
+
+def bump_versions(*resources):
+    """
+    Mark resources as changed. Must be called in the transaction of the
+    write, before its commit, so the new version and the data it describes
+    become visible together.
+
+    Args:
+        resources: Names of the changed resources (FLATS, TOWERS, AMENITIES)
+    """
+    table = ResourceVersion.__table__
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(table).values([{'name': resource, 'version': 1} for resource in resources])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={'version': table.c.version + 1}
+    ))
+
+
+def versioned_etag(*resources, vary=None):
+    """
+    Decorator that serves a GET endpoint with a strong ETag.
+
+    The ETag is derived from the versions of the resources the response
+    depends on, the request path and query string, and the optional vary()
+    value. A request whose If-None-Match matches gets a 304 without the
+    view running, after one primary key lookup of the versions.
+
+    Args:
+        resources: Names of the resources the response is built from
+        vary: Optional callable returning extra request state the response
+            depends on (for example whether the caller is an admin)
+
+    Usage:
+        @flats_bp.route('', methods=['GET'])
+        @versioned_etag(FLATS, TOWERS)
+        def get_flats():
+            ...
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Read the versions before the view runs: a write committed while
+            # the view queries can only make the tag older than the data,
+            # which costs a refetch but never serves stale data as fresh
+            state = '|'.join([
+                ','.join(str(v) for v in read_versions(resources)),
+                request.full_path,
+                str(vary()) if vary is not None else ''
+            ])
+            etag = hashlib.sha256(state.encode('utf-8')).hexdigest()[:32]
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            # Let browsers keep the body but revalidate it on every use
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,43 @@
+"""Sparse fieldsets: the fields query parameter of list endpoints."""
+from .models import Flat, Booking, Tower
+
+
+# Field names each list endpoint accepts. Bookings also accept
+# 'flat.<name>' to nest only some fields of the flat.
+FLAT_FIELDS = tuple(Flat.FIELDS)
+BOOKING_FIELDS = tuple(Booking.FIELDS) + tuple(f'flat.{name}' for name in Flat.FIELDS)
+TOWER_FIELDS = tuple(name for name in Tower.FIELDS if name not in Tower.AMENITY_FIELDS)
+TOWER_AMENITY_FIELDS = tuple(Tower.FIELDS)
+
+
+def parse_fields(args, allowed):
+    """
+    Read the fields query parameter of a list request.
+
+    Args:
+        args: The request query arguments
+        allowed: Field names the endpoint can return
+
+    Returns:
+        Tuple of the requested field names in request order, or None when
+        the client did not ask for a fieldset (all fields)
+
+    Raises:
+        ValueError: If a field is unknown or no field is named
+    """
+    raw = args.get('fields')
+    if raw is None:
+        return None
+
+    fields = []
+    for name in raw.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in allowed:
+            raise ValueError(f'Unknown field: {name}')
+        fields.append(name)
+
+    if not fields:
+        raise ValueError('Fields must name at least one field')
+    return tuple(fields)
@@ -0,0 +1,252 @@
+"""In-memory columnar snapshot of the flat catalog for filtering without SQL."""
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; searches then always go to the database
+    np = None
+
+
+def _created_at_micros(values):
+    """Convert ISO timestamps (or None) to int64 microseconds, NaT for None."""
+    return np.array([value or 'NaT' for value in values], dtype='datetime64[us]').astype(np.int64)
+
+
+class _Snapshot:
+    """
+    Immutable column arrays of every flat, in ID order.
+
+    rows holds the serialized flat (Flat.to_dict) at the same position as its
+    values in the arrays, so a boolean mask or index array selects both.
+    """
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: row['id'])
+        self.built_at = time.monotonic()
+
+        def column(name, dtype, missing=0):
+            return np.array([missing if row[name] is None else row[name] for row in self.rows], dtype=dtype)
+
+        self.id = column('id', np.int64)
+        self.tower_id = column('tower_id', np.int64)
+        self.bedrooms = column('bedrooms', np.int64)
+        self.bathrooms = column('bathrooms', np.int64)
+        self.floor = column('floor', np.int64)
+        self.area_sqft = column('area_sqft', np.float64, np.nan)
+        self.rent = column('rent', np.float64, np.nan)
+        self.is_available = column('is_available', bool, False)
+        self.created_at = _created_at_micros(row['created_at'] for row in self.rows)
+        self.has_created_at = np.array([row['created_at'] is not None for row in self.rows], dtype=bool)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.rent_per_sqft = np.where(self.area_sqft > 0, self.rent / self.area_sqft, np.nan)
+
+    def sort_column(self, field):
+        """
+        Get the values, presence mask and cursor converters of a sort field.
+
+        Returns:
+            Tuple of (values array, mask of rows having a value,
+            decode(cursor value) -> array scalar, encode(row index) -> cursor
+            value or None for rows without one), or None if the field is not
+            supported
+        """
+        if field == 'rent':
+            return (self.rent, ~np.isnan(self.rent),
+                    lambda value: float(Decimal(value)), lambda i: str(self.rows[i]['rent']))
+        if field == 'area_sqft':
+            return (self.area_sqft, ~np.isnan(self.area_sqft),
+                    int, lambda i: self.rows[i]['area_sqft'])
+        if field == 'floor':
+            return (self.floor, np.ones(len(self.rows), dtype=bool),
+                    int, lambda i: self.rows[i]['floor'])
+        if field == 'rent_per_sqft':
+            return (self.rent_per_sqft, ~np.isnan(self.rent_per_sqft),
+                    float, lambda i: None if np.isnan(self.rent_per_sqft[i]) else float(self.rent_per_sqft[i]))
+        if field == 'created_at':
+            return (self.created_at, self.has_created_at,
+                    lambda value: _created_at_micros([datetime.fromisoformat(value).isoformat()])[0],
+                    lambda i: self.rows[i]['created_at'])
+        return None
+
+
+class FlatCatalog:
+    """
+    Column-store copy of the flats table answering searches with numpy masks.
+
+    Every filter of FlatService.search_flats is a vectorized comparison over
+    the column arrays, so a search costs no database round trip. Searches the
+    catalog cannot answer (text queries, unknown sorts) return None and the
+    caller falls back to SQL.
+
+    The snapshot is built on first use and patched per tower by patch(),
+    which FlatService.notify_flats_changed() calls after every committed
+    write. Like the search cache it lives in one process, so it is also
+    rebuilt after ttl seconds to pick up writes made by other instances.
+    Snapshots are never modified in place: builds swap in a new one, so
+    readers need no lock.
+
+    Args:
+        loader: Callable taking a set of tower IDs (or None for all flats)
+            and returning the serialized flats of those towers
+        ttl: Seconds after which the snapshot is rebuilt from the database
+    """
+
+    def __init__(self, loader, ttl=300):
+        self._loader = loader
+        self.ttl = ttl
+        self._snapshot = None
+        # Serializes builds and patches, so a patch always applies on top of
+        # any rebuild that started before the write it reflects
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.patches = 0
+
+    def snapshot(self):
+        """Return the current snapshot, rebuilding it if missing or expired."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.ttl:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.built_at >= self.ttl:
+                snapshot = _Snapshot(self._loader(None))
+                self._snapshot = snapshot
+                self.rebuilds += 1
+        return snapshot
+
+    def patch(self, tower_ids):
+        """
+        Reload the flats of the given towers into the snapshot.
+
+        Does nothing before the first build. Reloads every flat when no tower
+        is given.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            if not tower_ids:
+                self._snapshot = _Snapshot(self._loader(None))
+                self.rebuilds += 1
+                return
+
+            affected = set(tower_ids)
+            kept = [row for row in snapshot.rows if row['tower_id'] not in affected]
+            patched = _Snapshot(kept + self._loader(affected))
+            # A patch does not refresh the flats of other towers
+            patched.built_at = snapshot.built_at
+            self._snapshot = patched
+            self.patches += 1
+
+    def invalidate(self):
+        """
+        Drop the snapshot, so the next search rebuilds it.
+
+        Cheap enough to call from any request: the rebuild happens lazily in
+        the first search that needs the snapshot, as after the ttl expires.
+        """
+        with self._lock:
+            self._snapshot = None
+
+    def search(self, limit=None, after=None, sort=None, tower_id=None, bedrooms=None,
+               min_rent=None, max_rent=None, include_unavailable=False,
+               min_area=None, max_area=None, min_floor=None, max_floor=None,
+               min_bathrooms=None, max_bathrooms=None, q=None):
+        """
+        Search the snapshot with the semantics of FlatService.search_flats.
+
+        The arguments and page keys are those of search_flats, which
+        validates them before calling this.
+
+        Returns:
+            Tuple of (list of flat dicts, next page key or None), or None if
+            the search needs the database
+        """
+        if q:
+            return None
+
+        snapshot = self.snapshot()
+        mask = np.ones(len(snapshot.rows), dtype=bool)
+
+        if not include_unavailable:
+            mask &= snapshot.is_available
+        if tower_id is not None:
+            mask &= snapshot.tower_id == tower_id
+        if bedrooms is not None:
+            mask &= snapshot.bedrooms == bedrooms
+        if min_rent is not None:
+            mask &= snapshot.rent >= float(min_rent)
+        if max_rent is not None:
+            mask &= snapshot.rent <= float(max_rent)
+        # NaN areas compare False, matching SQL NULL semantics
+        if min_area is not None:
+            mask &= snapshot.area_sqft >= min_area
+        if max_area is not None:
+            mask &= snapshot.area_sqft <= max_area
+        if min_floor is not None:
+            mask &= snapshot.floor >= min_floor
+        if max_floor is not None:
+            mask &= snapshot.floor <= max_floor
+        if min_bathrooms is not None:
+            mask &= snapshot.bathrooms >= min_bathrooms
+        if max_bathrooms is not None:
+            mask &= snapshot.bathrooms <= max_bathrooms
+
+        if sort is None:
+            if after is not None:
+                mask &= snapshot.id > after[0]
+            # Snapshot rows are in ID order already
+            indexes = np.flatnonzero(mask)
+            encode_key = lambda i: (int(snapshot.id[i]),)
+        else:
+            descending = sort.startswith('-')
+            column = snapshot.sort_column(sort.lstrip('-'))
+            if column is None:
+                return None
+            values, present, decode, encode = column
+
+            # Rows without a value come last in ID order, as NULLS LAST in SQL
+            missing = mask & ~present
+            mask &= present
+            if after is not None:
+                last_id = after[2]
+                if after[1] is None:
+                    mask[:] = False
+                    missing &= (snapshot.id < last_id) if descending else (snapshot.id > last_id)
+                elif descending:
+                    value = decode(after[1])
+                    mask &= (values < value) | ((values == value) & (snapshot.id < last_id))
+                else:
+                    value = decode(after[1])
+                    mask &= (values > value) | ((values == value) & (snapshot.id > last_id))
+
+            indexes = np.flatnonzero(mask)
+            # lexsort orders by the last key first, with the ID as tie-breaker
+            if descending:
+                order = np.lexsort((-snapshot.id[indexes], -values[indexes]))
+            else:
+                order = np.lexsort((snapshot.id[indexes], values[indexes]))
+            missing = np.flatnonzero(missing)
+            indexes = np.concatenate([indexes[order], missing[::-1] if descending else missing])
+            encode_key = lambda i: (sort, encode(i), int(snapshot.id[i]))
+
+        if limit is None or len(indexes) <= limit:
+            return [snapshot.rows[i] for i in indexes], None
+
+        page = indexes[:limit]
+        return [snapshot.rows[i] for i in page], encode_key(page[-1])
+
+    def stats(self):
+        """Return the snapshot size and build counters as a dict."""
+        snapshot = self._snapshot
+        return {
+            'size': len(snapshot.rows) if snapshot is not None else 0,
+            'ttl': self.ttl,
+            'rebuilds': self.rebuilds,
+            'patches': self.patches
+        }
@@ -0,0 +1,158 @@
+"""Helpers for parsing and validating streamed flat import files."""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from .models.flat import RENT_LIMIT
+
+
+# Validated rows written per upsert statement (and per transaction)
+IMPORT_CHUNK_SIZE = 1000
+
+# Most row errors listed in an import report; later ones are only counted
+MAX_IMPORT_ERRORS = 1000
+
+# Largest value of an INTEGER column
+MAX_INT = 2 ** 31 - 1
+
+CSV_TYPES = ('text/csv',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def iter_import_records(stream, mimetype):
+    """
+    Parse an import body incrementally into records.
+
+    The body is read line by line, so memory does not grow with its size.
+
+    Args:
+        stream: Binary file-like request body
+        mimetype: Content type of the body, CSV or NDJSON
+
+    Returns:
+        Iterator of (line number, record dict or None, parse error or None)
+
+    Raises:
+        ValueError: If the content type is not supported
+    """
+    if mimetype in CSV_TYPES:
+        return _iter_csv(stream)
+    if mimetype in NDJSON_TYPES:
+        return _iter_ndjson(stream)
+    raise ValueError('Content type must be text/csv or application/x-ndjson')
+
+
+def _iter_csv(stream):
+    """Yield the rows of a CSV body with a header line as records."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for record in reader:
+        # Values past the header columns are collected under the None key
+        if None in record:
+            yield reader.line_num, None, 'Row has more values than the header'
+        else:
+            yield reader.line_num, record, None
+
+
+def _iter_ndjson(stream):
+    """Yield the JSON object on each non-blank line of an NDJSON body."""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Invalid JSON'
+            continue
+        if isinstance(record, dict):
+            yield line_number, record, None
+        else:
+            yield line_number, None, 'Must be a JSON object'
+
+
+def _to_int(value):
+    """Read a non-negative integer from a JSON number or CSV string, else None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str) and value.strip().isdecimal():
+        try:
+            value = int(value)
+        except ValueError:
+            # Longer than Python's integer string conversion limit
+            return None
+    if isinstance(value, int) and 0 <= value <= MAX_INT:
+        return value
+    return None
+
+
+def _to_decimal(value):
+    """Read a non-negative amount from a JSON number or CSV string, else None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() and 0 <= amount < RENT_LIMIT else None
+
+
+def _to_bool(value):
+    """Read a boolean from a JSON boolean or CSV string, else None."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return {'true': True, '1': True, 'yes': True,
+                'false': False, '0': False, 'no': False}.get(value.strip().lower())
+    return None
+
+
+def validate_flat_record(record):
+    """
+    Validate an import record and convert it to flats column values.
+
+    Blank CSV cells count as missing. is_available defaults to true.
+
+    Args:
+        record: Dict with tower_id, unit_number, floor, bedrooms, bathrooms and
+            rent (required), area_sqft and is_available (optional)
+
+    Returns:
+        Tuple of (column dict, None) or (None, dict of errors per field)
+    """
+    def value(name):
+        raw = record.get(name)
+        return None if isinstance(raw, str) and not raw.strip() else raw
+
+    errors = {}
+    row = {}
+    for name in ('tower_id', 'floor', 'bedrooms', 'bathrooms'):
+        row[name] = _to_int(value(name))
+        if row[name] is None:
+            errors[name] = 'Required' if value(name) is None else 'Must be a non-negative integer'
+
+    unit_number = value('unit_number')
+    row['unit_number'] = str(unit_number).strip() if unit_number is not None else None
+    if not row['unit_number']:
+        errors['unit_number'] = 'Required'
+    elif len(row['unit_number']) > 20:
+        errors['unit_number'] = 'Must be at most 20 characters'
+
+    row['rent'] = _to_decimal(value('rent'))
+    if row['rent'] is None:
+        errors['rent'] = 'Required' if value('rent') is None else 'Must be a non-negative number'
+
+    row['area_sqft'] = None
+    if value('area_sqft') is not None:
+        row['area_sqft'] = _to_int(value('area_sqft'))
+        if row['area_sqft'] is None:
+            errors['area_sqft'] = 'Must be a non-negative integer'
+
+    row['is_available'] = True
+    if value('is_available') is not None:
+        row['is_available'] = _to_bool(value('is_available'))
+        if row['is_available'] is None:
+            errors['is_available'] = 'Must be a boolean'
+
+    if errors:
+        return None, errors
+    return row, None
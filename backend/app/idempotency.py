@@ -0,0 +1,161 @@
+"""Idempotency-Key support for write endpoints, backed by the idempotency_keys table."""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from .models import IdempotencyKey
+from . import db
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _request_hash():
+    """Hash the method, path with query string and body of the current request."""
+    digest = hashlib.sha256()
+    for part in (request.method, request.full_path):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _error(status, code, message):
+    """Build an error response in the API's format."""
+    return jsonify({
+        'error': {
+            'code': code,
+            'message': message
+        }
+    }), status
+
+
+def _claim(owner, key, request_hash):
+    """
+    Record that this request is processing the key.
+
+    The primary key makes the claim atomic across threads and instances:
+    only one request can insert the row, the others see it. Expired records
+    are purged first, so an expired key can be claimed again. A claim whose
+    lock has run out without a stored response belongs to a request that
+    died; a conditional UPDATE lets exactly one retry take it over.
+
+    Returns:
+        None if the key was claimed, otherwise the existing IdempotencyKey
+        (or None if it was released in the meantime, as if still in progress)
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    locked_until = now + timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+    existing = db.session.get(IdempotencyKey, (owner, key))
+    if existing is not None and existing.created_at >= cutoff:
+        if existing.status_code is not None or existing.locked_until is None or existing.locked_until > now:
+            return existing
+        taken = db.session.execute(update(IdempotencyKey).where(
+            IdempotencyKey.owner == owner, IdempotencyKey.key == key,
+            IdempotencyKey.status_code.is_(None),
+            IdempotencyKey.locked_until == existing.locked_until
+        ).values(
+            request_hash=request_hash, created_at=now, locked_until=locked_until
+        ).execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        if taken:
+            return None
+        return db.session.get(IdempotencyKey, (owner, key)) or IdempotencyKey(request_hash=request_hash)
+
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+    db.session.add(IdempotencyKey(owner=owner, key=key, request_hash=request_hash, locked_until=locked_until))
+    try:
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+        return db.session.get(IdempotencyKey, (owner, key)) or IdempotencyKey(request_hash=request_hash)
+
+
+def _finish(owner, key, response):
+    """Store the response under the claimed key, or release the key if it must not be replayed."""
+    match = (IdempotencyKey.owner == owner, IdempotencyKey.key == key)
+    # Server errors and streamed bodies are not stored; the client may retry them
+    if response.status_code >= 500 or response.is_streamed:
+        db.session.execute(delete(IdempotencyKey).where(*match))
+    else:
+        db.session.execute(update(IdempotencyKey).where(*match).values(
+            status_code=response.status_code,
+            content_type=response.content_type,
+            response_body=response.get_data(as_text=True)
+        ))
+    db.session.commit()
+
+
+def idempotent():
+    """
+    Decorator making a write endpoint safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs the endpoint and stores its response.
+    A retry with the same key, method, path and body gets the stored
+    response back (with an Idempotent-Replayed: true header) without running
+    the endpoint again, for IDEMPOTENCY_KEY_TTL seconds. Keys are per JWT
+    identity, and the store is the database, so this holds across threads,
+    gunicorn workers and instances. A request holds its key for
+    IDEMPOTENCY_LOCK_TIMEOUT seconds; if it has not finished by then (its
+    worker crashed), a retry runs the endpoint again. Requests without the
+    header are not affected. Must be used after @jwt_required() or @admin_required().
+
+    Responses:
+        400: Key longer than 255 characters
+        409: The first request with the key is still being processed (and
+             within IDEMPOTENCY_LOCK_TIMEOUT)
+        422: The key was used with a different request
+
+    Usage:
+        @bookings_bp.route('', methods=['POST'])
+        @jwt_required()
+        @idempotent()
+        def create_booking():
+            ...
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return fn(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error(400, 'VALIDATION_ERROR',
+                              f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters')
+
+            owner = str(get_jwt_identity())
+            request_hash = _request_hash()
+            stored = _claim(owner, key, request_hash)
+            if stored is not None:
+                if stored.status_code is None:
+                    return _error(409, 'IDEMPOTENCY_IN_PROGRESS',
+                                  f'A request with this {IDEMPOTENCY_HEADER} is still being processed')
+                if stored.request_hash != request_hash:
+                    return _error(422, 'IDEMPOTENCY_KEY_REUSED',
+                                  f'{IDEMPOTENCY_HEADER} was already used for a different request')
+                response = current_app.response_class(stored.response_body, status=stored.status_code,
+                                                      content_type=stored.content_type)
+                response.headers[REPLAYED_HEADER] = 'true'
+                return response
+
+            try:
+                response = make_response(fn(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                db.session.execute(delete(IdempotencyKey).where(
+                    IdempotencyKey.owner == owner, IdempotencyKey.key == key
+                ))
+                db.session.commit()
+                raise
+            _finish(owner, key, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,28 @@
+"""Flask JSON provider that encodes responses with orjson when it is installed."""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is used instead
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider using orjson for compact dumps, the standard encoder otherwise.
+
+    Output matches DefaultJSONProvider apart from whitespace and non-ASCII
+    characters being written as UTF-8 instead of escapes: keys are sorted
+    the same way, and datetimes, Decimals and other types orjson does not
+    encode like Flask go through the same default() hook. Pretty-printed
+    output (debug mode) and custom dump arguments use the standard encoder.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'separators'}:
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
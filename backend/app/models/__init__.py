@@ -2,9 +2,13 @@
 from .user import User, UserRole
 from .tower import Tower
 from .flat import Flat
+from . import flat_search  # registers the full-text search index DDL
 from .amenity import Amenity, AmenityType
 from .booking import Booking, BookingStatus
 from .lease import Lease, LeaseStatus
+from .waitlist import WaitlistEntry
+from .idempotency_key import IdempotencyKey
+from .resource_version import ResourceVersion
 
 __all__ = [
     'User', 'UserRole',
@@ -12,5 +16,8 @@ __all__ = [
     'Flat',
     'Amenity', 'AmenityType',
     'Booking', 'BookingStatus',
-    'Lease', 'LeaseStatus'
+    'Lease', 'LeaseStatus',
+    'WaitlistEntry',
+    'IdempotencyKey',
+    'ResourceVersion'
 ]
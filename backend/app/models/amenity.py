@@ -27,5 +27,5 @@ class Amenity(db.Model):
             'type': self.type.value,
             'description': self.description,
             'hours': self.hours,
-            'fee': float(self.fee) if self.fee else None
+            'fee': float(self.fee) if self.fee is not None else None
         }
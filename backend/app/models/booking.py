@@ -20,16 +20,41 @@ class Booking(db.Model):
     requested_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # A user can have only one pending booking per flat. Enums are stored by
+    # name, hence 'PENDING'.
+    __table_args__ = (
+        db.Index('uq_bookings_pending_user_flat', 'user_id', 'flat_id', unique=True,
+                 postgresql_where=db.text("status = 'PENDING'"),
+                 sqlite_where=db.text("status = 'PENDING'")),
+    )
+    
     # Relationships
     lease = db.relationship('Lease', backref='booking', uselist=False)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'flat_id': self.flat_id,
-            'flat': self.flat.to_dict() if self.flat else None,
-            'status': self.status.value,
-            'requested_date': self.requested_date.isoformat() if self.requested_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    # Serializer per to_dict() field; 'flat' nests the full flat
+    FIELDS = {
+        'id': lambda booking: booking.id,
+        'user_id': lambda booking: booking.user_id,
+        'flat_id': lambda booking: booking.flat_id,
+        'flat': lambda booking: booking.flat.to_dict() if booking.flat else None,
+        'status': lambda booking: booking.status.value,
+        'requested_date': lambda booking: booking.requested_date.isoformat() if booking.requested_date else None,
+        'created_at': lambda booking: booking.created_at.isoformat() if booking.created_at else None
+    }
+    
+    def to_dict(self, fields=None):
+        """
+        Serialize the booking.
+        
+        Args:
+            fields: Names of the FIELDS to include, or None for all of them.
+                'flat.<name>' entries nest only those fields of the flat.
+        """
+        if fields is None:
+            return {name: serialize(self) for name, serialize in self.FIELDS.items()}
+        
+        result = {name: self.FIELDS[name](self) for name in fields if name in self.FIELDS}
+        flat_fields = [name[len('flat.'):] for name in fields if name.startswith('flat.')]
+        if flat_fields and 'flat' not in result:
+            result['flat'] = self.flat.to_dict(flat_fields) if self.flat else None
+        return result
@@ -2,6 +2,10 @@ from datetime import datetime
 from .. import db
 
 
+# Rents are NUMERIC(10, 2), so they must stay below this
+RENT_LIMIT = 10 ** 8
+
+
 class Flat(db.Model):
     """Flat model representing an apartment unit."""
     __tablename__ = 'flats'
@@ -17,25 +21,66 @@ class Flat(db.Model):
     is_available = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Unique constraint: unit number must be unique within a tower
+    # Unique constraint: unit number must be unique within a tower.
+    # The partial indexes cover the public search filters and sort orders,
+    # which always restrict to available flats (see FlatService.get_flat_rows).
     __table_args__ = (
         db.UniqueConstraint('tower_id', 'unit_number', name='unique_unit_per_tower'),
+        db.Index('ix_flats_available_tower_bedrooms_rent', 'tower_id', 'bedrooms', 'rent',
+                 postgresql_where=db.text('is_available = true'),
+                 sqlite_where=db.text('is_available = 1')),
+        db.Index('ix_flats_available_bedrooms_rent', 'bedrooms', 'rent',
+                 postgresql_where=db.text('is_available = true'),
+                 sqlite_where=db.text('is_available = 1')),
+        db.Index('ix_flats_available_rent_id', 'rent', 'id',
+                 postgresql_where=db.text('is_available = true'),
+                 sqlite_where=db.text('is_available = 1')),
+        db.Index('ix_flats_available_area_sqft', 'area_sqft', 'id',
+                 postgresql_where=db.text('is_available = true'),
+                 sqlite_where=db.text('is_available = 1')),
+        db.Index('ix_flats_available_floor', 'floor', 'id',
+                 postgresql_where=db.text('is_available = true'),
+                 sqlite_where=db.text('is_available = 1')),
+        db.Index('ix_flats_available_created_at', 'created_at', 'id',
+                 postgresql_where=db.text('is_available = true'),
+                 sqlite_where=db.text('is_available = 1')),
     )
     
     # Relationships
     bookings = db.relationship('Booking', backref='flat', lazy=True)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'tower_id': self.tower_id,
-            'tower_name': self.tower.name if self.tower else None,
-            'unit_number': self.unit_number,
-            'floor': self.floor,
-            'bedrooms': self.bedrooms,
-            'bathrooms': self.bathrooms,
-            'area_sqft': self.area_sqft,
-            'rent': float(self.rent) if self.rent else None,
-            'is_available': self.is_available,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    # Serializer per to_dict() field. Each one reads only the attributes its
+    # field needs, so a sparse fieldset never touches unloaded columns.
+    FIELDS = {
+        'id': lambda flat: flat.id,
+        'tower_id': lambda flat: flat.tower_id,
+        'tower_name': lambda flat: flat.tower.name if flat.tower else None,
+        'unit_number': lambda flat: flat.unit_number,
+        'floor': lambda flat: flat.floor,
+        'bedrooms': lambda flat: flat.bedrooms,
+        'bathrooms': lambda flat: flat.bathrooms,
+        'area_sqft': lambda flat: flat.area_sqft,
+        'rent': lambda flat: float(flat.rent) if flat.rent is not None else None,
+        'is_available': lambda flat: flat.is_available,
+        'created_at': lambda flat: flat.created_at.isoformat() if flat.created_at else None
+    }
+    
+    def to_dict(self, fields=None):
+        """
+        Serialize the flat.
+        
+        Args:
+            fields: Names of the FIELDS to include, or None for all of them
+        """
+        return {name: self.FIELDS[name](self) for name in (fields or self.FIELDS)}
+
+
+# Monthly rent per square foot, NULL when the area is unknown. The sort in
+# FlatService uses this exact expression so it can be read off the index.
+RENT_PER_SQFT = db.cast(Flat.__table__.c.rent, db.Float).op('/')(
+    db.cast(db.func.nullif(Flat.__table__.c.area_sqft, db.literal_column('0')), db.Float)
+)
+
+db.Index('ix_flats_available_rent_per_sqft', RENT_PER_SQFT, Flat.__table__.c.id,
+         postgresql_where=db.text('is_available = true'),
+         sqlite_where=db.text('is_available = 1'))
@@ -0,0 +1,149 @@
+"""
+Full-text search index over flats, their unit number and their tower's
+name and address.
+
+The index is kept in sync by database triggers, so every write path (ORM
+flushes, bulk inserts, upserts, tower renames) updates it without service
+code having to remember to. It is created together with the flats table.
+
+- PostgreSQL: flat_search table holding a weighted tsvector per flat with a
+  GIN index (unit number weighted A, tower name B, tower address C).
+- SQLite: flat_search_fts FTS5 virtual table with the flat ID as rowid.
+"""
+from sqlalchemy import DDL, event
+from sqlalchemy.sql import table, column
+
+from .flat import Flat
+
+
+# Lightweight handles for querying the search tables, which are created by
+# the DDL below rather than by the model metadata
+flat_search = table('flat_search', column('flat_id'), column('document'))
+flat_search_fts = table('flat_search_fts', column('rowid'))
+
+
+POSTGRESQL_CREATE = [
+    """
+    CREATE OR REPLACE FUNCTION flat_search_document(unit_number text, tower_name text, tower_address text)
+    RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(unit_number, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(tower_name, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(tower_address, '')), 'C')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS flat_search (
+        flat_id INTEGER PRIMARY KEY REFERENCES flats(id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_flat_search_document ON flat_search USING GIN (document)",
+    """
+    CREATE OR REPLACE FUNCTION flat_search_refresh_flat() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO flat_search (flat_id, document)
+        SELECT NEW.id, flat_search_document(NEW.unit_number, towers.name, towers.address)
+        FROM towers WHERE towers.id = NEW.tower_id
+        ON CONFLICT (flat_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS flats_search_refresh ON flats",
+    """
+    CREATE TRIGGER flats_search_refresh AFTER INSERT OR UPDATE OF unit_number, tower_id ON flats
+    FOR EACH ROW EXECUTE FUNCTION flat_search_refresh_flat()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION flat_search_refresh_tower() RETURNS trigger AS $$
+    BEGIN
+        UPDATE flat_search
+        SET document = flat_search_document(flats.unit_number, NEW.name, NEW.address)
+        FROM flats
+        WHERE flats.id = flat_search.flat_id AND flats.tower_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS towers_search_refresh ON towers",
+    """
+    CREATE TRIGGER towers_search_refresh AFTER UPDATE OF name, address ON towers
+    FOR EACH ROW EXECUTE FUNCTION flat_search_refresh_tower()
+    """,
+    # Index flats that existed before the search table
+    """
+    INSERT INTO flat_search (flat_id, document)
+    SELECT flats.id, flat_search_document(flats.unit_number, towers.name, towers.address)
+    FROM flats JOIN towers ON towers.id = flats.tower_id
+    ON CONFLICT (flat_id) DO NOTHING
+    """,
+]
+
+POSTGRESQL_DROP = [
+    "DROP TRIGGER IF EXISTS towers_search_refresh ON towers",
+    "DROP TABLE IF EXISTS flat_search",
+    "DROP FUNCTION IF EXISTS flat_search_refresh_tower()",
+    "DROP FUNCTION IF EXISTS flat_search_refresh_flat()",
+]
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS flat_search_fts
+    USING fts5(unit_number, tower_name, tower_address, tokenize = 'unicode61')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flats_search_insert AFTER INSERT ON flats BEGIN
+        INSERT INTO flat_search_fts (rowid, unit_number, tower_name, tower_address)
+        SELECT new.id, new.unit_number, towers.name, coalesce(towers.address, '')
+        FROM towers WHERE towers.id = new.tower_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flats_search_update AFTER UPDATE OF unit_number, tower_id ON flats BEGIN
+        DELETE FROM flat_search_fts WHERE rowid = old.id;
+        INSERT INTO flat_search_fts (rowid, unit_number, tower_name, tower_address)
+        SELECT new.id, new.unit_number, towers.name, coalesce(towers.address, '')
+        FROM towers WHERE towers.id = new.tower_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flats_search_delete AFTER DELETE ON flats BEGIN
+        DELETE FROM flat_search_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS towers_search_update AFTER UPDATE OF name, address ON towers BEGIN
+        UPDATE flat_search_fts SET tower_name = new.name, tower_address = coalesce(new.address, '')
+        WHERE rowid IN (SELECT id FROM flats WHERE tower_id = new.id);
+    END
+    """,
+    # Index flats that existed before the search table
+    """
+    INSERT INTO flat_search_fts (rowid, unit_number, tower_name, tower_address)
+    SELECT flats.id, flats.unit_number, towers.name, coalesce(towers.address, '')
+    FROM flats JOIN towers ON towers.id = flats.tower_id
+    WHERE flats.id NOT IN (SELECT rowid FROM flat_search_fts)
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS towers_search_update",
+    "DROP TABLE IF EXISTS flat_search_fts",
+]
+
+
+def create_search_index(connection):
+    """Create the search index and its triggers on an existing database."""
+    statements = {'postgresql': POSTGRESQL_CREATE, 'sqlite': SQLITE_CREATE}
+    for statement in statements.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+for _statement in POSTGRESQL_CREATE:
+    event.listen(Flat.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in POSTGRESQL_DROP:
+    event.listen(Flat.__table__, 'before_drop', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in SQLITE_CREATE:
+    event.listen(Flat.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in SQLITE_DROP:
+    event.listen(Flat.__table__, 'before_drop', DDL(_statement).execute_if(dialect='sqlite'))
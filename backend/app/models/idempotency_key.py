@@ -0,0 +1,22 @@
+from datetime import datetime
+from .. import db
+
+
+class IdempotencyKey(db.Model):
+    """Stored response of a write request, replayed for retries with the same Idempotency-Key."""
+    __tablename__ = 'idempotency_keys'
+    
+    # Keys are scoped to the JWT identity, so clients cannot collide with or
+    # read each other's responses
+    owner = db.Column(db.String(64), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    # SHA-256 of the method, path and body the key was first used with
+    request_hash = db.Column(db.String(64), nullable=False)
+    # NULL while the first request is still being processed
+    status_code = db.Column(db.Integer)
+    # Until when the processing request holds the key; past it, the request
+    # is assumed to have died and a retry may claim the key again
+    locked_until = db.Column(db.DateTime)
+    content_type = db.Column(db.String(100))
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -24,6 +24,6 @@ class Lease(db.Model):
             'booking_id': self.booking_id,
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
-            'monthly_rent': float(self.monthly_rent) if self.monthly_rent else None,
+            'monthly_rent': float(self.monthly_rent) if self.monthly_rent is not None else None,
             'status': self.status.value
         }
@@ -0,0 +1,9 @@
+from .. import db
+
+
+class ResourceVersion(db.Model):
+    """Version counter of a catalog resource, shared by every process serving the API."""
+    __tablename__ = 'resource_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
@@ -20,18 +20,32 @@ class Tower(db.Model):
     
     # Relationships
     flats = db.relationship('Flat', backref='tower', lazy=True)
-    amenities = db.relationship('Amenity', secondary=tower_amenities, lazy='subquery',
+    # Loaded on access only; TowerService eager-loads them with selectinload
+    # when the caller asks for amenities
+    amenities = db.relationship('Amenity', secondary=tower_amenities, lazy='select',
                                 backref=db.backref('towers', lazy=True))
     
-    def to_dict(self, include_amenities=False):
-        result = {
-            'id': self.id,
-            'name': self.name,
-            'address': self.address,
-            'total_floors': self.total_floors,
-            'flats_per_floor': self.flats_per_floor
-        }
-        if include_amenities:
-            result['amenities'] = [amenity.to_dict() for amenity in self.amenities]
-            result['amenity_ids'] = [amenity.id for amenity in self.amenities]
-        return result
+    # Serializer per to_dict() field; the amenity fields need the amenities loaded
+    FIELDS = {
+        'id': lambda tower: tower.id,
+        'name': lambda tower: tower.name,
+        'address': lambda tower: tower.address,
+        'total_floors': lambda tower: tower.total_floors,
+        'flats_per_floor': lambda tower: tower.flats_per_floor,
+        'amenities': lambda tower: [amenity.to_dict() for amenity in tower.amenities],
+        'amenity_ids': lambda tower: [amenity.id for amenity in tower.amenities]
+    }
+    AMENITY_FIELDS = ('amenities', 'amenity_ids')
+    
+    def to_dict(self, include_amenities=False, fields=None):
+        """
+        Serialize the tower.
+        
+        Args:
+            include_amenities: If True, include the amenity fields
+            fields: Names of the FIELDS to include, or None for all of them
+                (amenity fields only with include_amenities)
+        """
+        if fields is None:
+            fields = [name for name in self.FIELDS if include_amenities or name not in self.AMENITY_FIELDS]
+        return {name: self.FIELDS[name](self) for name in fields}
@@ -0,0 +1,32 @@
+from datetime import datetime
+from .. import db
+
+
+class WaitlistEntry(db.Model):
+    """Waitlist entry queuing a user for a flat that is not available."""
+    __tablename__ = 'waitlist_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    flat_id = db.Column(db.Integer, db.ForeignKey('flats.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Increases in joining order within a flat; gaps are left by entries
+    # that are promoted or leave, so the rank is the count of lower positions
+    position = db.Column(db.Integer, nullable=False)
+    requested_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # The (flat_id, position) index serves the head lookup, the next position
+    # and the rank count; a user queues once per flat
+    __table_args__ = (
+        db.UniqueConstraint('flat_id', 'position', name='unique_waitlist_position'),
+        db.UniqueConstraint('flat_id', 'user_id', name='unique_waitlist_user'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'flat_id': self.flat_id,
+            'user_id': self.user_id,
+            'requested_date': self.requested_date.isoformat() if self.requested_date else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,82 @@
+"""Helpers for keyset (cursor) pagination of list endpoints."""
+import base64
+import json
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(key):
+    """
+    Encode a keyset position as an opaque cursor string.
+
+    Args:
+        key: Tuple of JSON-serializable values identifying the last row of a page
+
+    Returns:
+        URL-safe cursor string, or None if key is None
+    """
+    if key is None:
+        return None
+    raw = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Cursor string from a previous page
+
+    Returns:
+        Tuple of keyset values
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(key, list) or not key:
+        raise ValueError('Invalid cursor')
+    return tuple(key)
+
+
+def parse_page_args(args):
+    """
+    Read the limit and cursor query parameters of a list request.
+
+    Args:
+        args: The request query arguments
+
+    Returns:
+        Tuple of (limit, after) where after is the decoded cursor key or None.
+        limit is None when the client did not ask for pagination.
+
+    Raises:
+        ValueError: If limit or cursor is invalid
+    """
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+
+    if limit is None and cursor is None:
+        return None, None
+
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('Limit must be a positive integer')
+        if limit < 1:
+            raise ValueError('Limit must be a positive integer')
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    after = decode_cursor(cursor) if cursor else None
+    return limit, after
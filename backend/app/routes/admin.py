@@ -1,9 +1,17 @@
 """Admin routes for managing towers, flats, amenities, bookings, and tenants."""
+import math
 from flask import Blueprint, request, jsonify
 
 from ..decorators import admin_required
-from ..services.tower_service import TowerService
-from ..services.flat_service import FlatService
+from ..idempotency import idempotent
+from ..services.tower_service import TowerService, MAX_GRID_UNITS
+from ..services.flat_service import FlatService, get_search_cache
+from ..pagination import parse_page_args, encode_cursor
+from ..streaming import wants_stream, stream_json_array
+from ..fieldsets import parse_fields, FLAT_FIELDS, BOOKING_FIELDS, TOWER_AMENITY_FIELDS
+from ..batch import parse_ids, parse_actions
+from ..flat_import import iter_import_records, MAX_INT
+from ..models.flat import RENT_LIMIT
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -18,15 +26,30 @@ def get_towers():
     """
     Get all towers with their amenities.
     
+    Query parameters:
+        - fields: Comma-separated tower fields to return (default all)
+    
     Returns:
         200: List of all towers with amenities
+        400: Unknown field
     """
-    towers = TowerService.get_all_towers()
-    return jsonify([tower.to_dict(include_amenities=True) for tower in towers]), 200
+    try:
+        fields = parse_fields(request.args, TOWER_AMENITY_FIELDS)
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e)
+            }
+        }), 400
+    
+    towers = TowerService.get_all_towers(include_amenities=True, fields=fields)
+    return jsonify([tower.to_dict(include_amenities=True, fields=fields) for tower in towers]), 200
 
 
 @admin_bp.route('/towers', methods=['POST'])
 @admin_required()
+@idempotent()
 def create_tower():
     """
     Create a new tower.
@@ -37,9 +60,16 @@ def create_tower():
         - total_floors: integer (required)
         - flats_per_floor: integer (optional, default 4)
         - amenity_ids: array of integers (optional)
+        - units: array of flats_per_floor unit templates (optional). When
+          given, every flat of the tower is created with unit numbers
+          <floor><position>, the position padded to 2 digits (3 past 99
+          flats per floor). Each template has bedrooms, bathrooms
+          and rent (required), area_sqft and rent_increment (per floor above
+          the first, optional). At most 10000 flats can be created this way,
+          and the rent of the top floor must stay below 100000000.
     
     Returns:
-        201: Tower created successfully
+        201: Tower created successfully (with flats_created when units are given)
         400: Validation error
     """
     data = request.get_json()
@@ -57,6 +87,7 @@ def create_tower():
     total_floors = data.get('total_floors')
     flats_per_floor = data.get('flats_per_floor', 4)
     amenity_ids = data.get('amenity_ids', [])
+    units = data.get('units')
     
     # Validate required fields
     if not name:
@@ -95,7 +126,18 @@ def create_tower():
             }
         }), 400
     
-    tower, error = TowerService.create_tower(name, address, total_floors, flats_per_floor, amenity_ids)
+    if units is not None:
+        errors = _validate_unit_templates(units, total_floors, flats_per_floor)
+        if errors:
+            return jsonify({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'Invalid unit templates',
+                    'details': {'units': errors}
+                }
+            }), 400
+    
+    tower, error = TowerService.create_tower(name, address, total_floors, flats_per_floor, amenity_ids, units)
     
     if error:
         return jsonify({
@@ -105,7 +147,51 @@ def create_tower():
             }
         }), 400
     
-    return jsonify(tower.to_dict(include_amenities=True)), 201
+    result = tower.to_dict(include_amenities=True)
+    if units:
+        result['flats_created'] = total_floors * flats_per_floor
+    return jsonify(result), 201
+
+
+def _validate_unit_templates(units, total_floors, flats_per_floor):
+    """
+    Validate the unit templates of a tower creation request.
+    
+    Returns:
+        Error message, or dict of error details per template index, or None
+    """
+    if total_floors * flats_per_floor > MAX_GRID_UNITS:
+        return f'At most {MAX_GRID_UNITS} flats can be created from unit templates'
+    if not isinstance(units, list) or len(units) != flats_per_floor:
+        return f'Must be an array of {flats_per_floor} unit templates, one per position on a floor'
+    
+    errors = {}
+    for index, unit in enumerate(units):
+        if not isinstance(unit, dict):
+            errors[index] = 'Must be an object'
+            continue
+        details = {}
+        for key, required in (('bedrooms', True), ('bathrooms', True), ('area_sqft', False)):
+            value = unit.get(key)
+            if value is None and not required:
+                continue
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= MAX_INT:
+                details[key] = 'Must be a non-negative integer'
+        for key, required in (('rent', True), ('rent_increment', False)):
+            value = unit.get(key)
+            if value is None and not required:
+                continue
+            if (not isinstance(value, (int, float)) or isinstance(value, bool)
+                    or not math.isfinite(value) or value < 0):
+                details[key] = 'Must be a non-negative number'
+        if 'rent' not in details and 'rent_increment' not in details:
+            # The top floor has the highest rent; rents are NUMERIC(10, 2)
+            top_rent = unit['rent'] + (unit.get('rent_increment') or 0) * (total_floors - 1)
+            if top_rent >= RENT_LIMIT:
+                details['rent'] = f'Rent of the top floor must be below {RENT_LIMIT}'
+        if details:
+            errors[index] = details
+    return errors or None
 
 
 @admin_bp.route('/towers/<int:tower_id>', methods=['GET'])
@@ -121,7 +207,7 @@ def get_tower(tower_id):
         200: Tower details with amenities
         404: Tower not found
     """
-    tower = TowerService.get_tower_by_id(tower_id)
+    tower = TowerService.get_tower_by_id(tower_id, include_amenities=True)
     
     if tower is None:
         return jsonify({
@@ -136,6 +222,7 @@ def get_tower(tower_id):
 
 @admin_bp.route('/towers/<int:tower_id>', methods=['PUT'])
 @admin_required()
+@idempotent()
 def update_tower(tower_id):
     """
     Update an existing tower.
@@ -215,6 +302,7 @@ def update_tower(tower_id):
 
 @admin_bp.route('/towers/<int:tower_id>', methods=['DELETE'])
 @admin_required()
+@idempotent()
 def delete_tower(tower_id):
     """
     Delete a tower.
@@ -265,15 +353,47 @@ def get_all_flats():
     """
     Get all flats (including unavailable).
     
+    Query parameters:
+        - limit: Page size (integer, enables pagination)
+        - cursor: Opaque cursor from the previous page's next_cursor
+        - stream: true to stream the full list in ID order instead of
+          building it in memory (ignored when paginating)
+        - fields: Comma-separated flat fields to return (default all)
+    
     Returns:
-        200: List of all flats
+        200: List of all flats, or when paginating
+             {"items": [...], "next_cursor": string or null}
+        400: Invalid pagination parameters or unknown field
     """
-    flats = FlatService.get_all_flats()
-    return jsonify([flat.to_dict() for flat in flats]), 200
+    try:
+        limit, after = parse_page_args(request.args)
+        fields = parse_fields(request.args, FLAT_FIELDS)
+        if limit is not None:
+            flats, next_key = FlatService.get_all_flats_page(limit, after=after, fields=fields)
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e)
+            }
+        }), 400
+    
+    if limit is not None:
+        return jsonify({
+            'items': [flat.to_dict(fields) for flat in flats],
+            'next_cursor': encode_cursor(next_key)
+        }), 200
+    
+    if wants_stream(request.args):
+        return stream_json_array(FlatService.iter_all_flats(fields=fields), lambda flat: flat.to_dict(fields))
+    
+    flats = FlatService.get_all_flats(fields=fields)
+    return jsonify([flat.to_dict(fields) for flat in flats]), 200
 
 
 @admin_bp.route('/flats', methods=['POST'])
 @admin_required()
+@idempotent()
 def create_flat():
     """
     Create a new flat.
@@ -419,6 +539,128 @@ def create_flat():
     return jsonify(flat.to_dict()), 201
 
 
+@admin_bp.route('/flats/import', methods=['POST'])
+@admin_required()
+def import_flats():
+    """
+    Create or update flats from a CSV or NDJSON file.
+    
+    The body is read and written in chunks as it streams in. Each row is
+    upserted on (tower_id, unit_number); an existing flat keeps its
+    availability.
+    
+    Request body (Content-Type text/csv with a header line, or
+    application/x-ndjson with one object per line), per row:
+        - tower_id, unit_number, floor, bedrooms, bathrooms, rent (required)
+        - area_sqft, is_available (optional)
+    
+    Returns:
+        200: Import report with processed, imported, superseded and failed
+             counts and the errors of the failed rows by line number
+        400: Unsupported content type, or the import stopped on a database
+             error (details hold the report up to that point)
+    """
+    try:
+        records = iter_import_records(request.stream, request.mimetype)
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e)
+            }
+        }), 400
+    
+    report, error = FlatService.import_flats(records)
+    
+    if error:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': error,
+                'details': report
+            }
+        }), 400
+    
+    return jsonify(report), 200
+
+
+@admin_bp.route('/flats/rent-adjustment', methods=['POST'])
+@admin_required()
+@idempotent()
+def adjust_rents():
+    """
+    Change the rent of every flat matching a filter in one statement.
+    
+    Request body:
+        - percent: number (percentage change, greater than -100) or
+        - amount: number (absolute change per flat); exactly one is required.
+          New rents must stay below 100000000
+        - tower_id, bedrooms, min_floor, max_floor: integers (optional filters)
+        - is_available: boolean (optional filter, default all flats)
+        - dry_run: boolean (optional, default false) to only return the totals
+    
+    Returns:
+        200: matched flat count, total rent before and after, dry_run
+        400: Validation error
+    """
+    data = request.get_json(silent=True)
+    
+    if not data:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': 'Request body is required'
+            }
+        }), 400
+    
+    errors = {}
+    for key in ('percent', 'amount'):
+        value = data.get(key)
+        if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+            errors[key] = 'Must be a number'
+        elif value is not None and not (math.isfinite(value) and abs(value) < RENT_LIMIT):
+            errors[key] = f'Must be a finite number between -{RENT_LIMIT} and {RENT_LIMIT}'
+    if 'percent' not in errors and isinstance(data.get('percent'), (int, float)) and data['percent'] <= -100:
+        errors['percent'] = 'Must be greater than -100'
+    for key in ('tower_id', 'bedrooms', 'min_floor', 'max_floor'):
+        value = data.get(key)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            errors[key] = 'Must be an integer'
+    for key in ('is_available', 'dry_run'):
+        if data.get(key) is not None and not isinstance(data[key], bool):
+            errors[key] = 'Must be a boolean'
+    
+    if errors:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': 'Invalid rent adjustment',
+                'details': errors
+            }
+        }), 400
+    
+    summary, error = FlatService.adjust_rents(
+        percent=data.get('percent'),
+        amount=data.get('amount'),
+        dry_run=data.get('dry_run', False),
+        tower_id=data.get('tower_id'),
+        bedrooms=data.get('bedrooms'),
+        min_floor=data.get('min_floor'),
+        max_floor=data.get('max_floor'),
+        is_available=data.get('is_available')
+    )
+    
+    if error:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': error
+            }
+        }), 400
+    
+    return jsonify(summary), 200
+
+
 @admin_bp.route('/flats/<int:flat_id>', methods=['GET'])
 @admin_required()
 def get_flat(flat_id):
@@ -447,6 +689,7 @@ def get_flat(flat_id):
 
 @admin_bp.route('/flats/<int:flat_id>', methods=['PUT'])
 @admin_required()
+@idempotent()
 def update_flat(flat_id):
     """
     Update an existing flat.
@@ -574,6 +817,7 @@ def update_flat(flat_id):
 
 @admin_bp.route('/flats/<int:flat_id>', methods=['DELETE'])
 @admin_required()
+@idempotent()
 def delete_flat(flat_id):
     """
     Delete a flat.
@@ -628,6 +872,7 @@ def get_amenities():
 
 @admin_bp.route('/amenities', methods=['POST'])
 @admin_required()
+@idempotent()
 def create_amenity():
     """
     Create a new amenity.
@@ -732,6 +977,7 @@ def get_amenity(amenity_id):
 
 @admin_bp.route('/amenities/<int:amenity_id>', methods=['PUT'])
 @admin_required()
+@idempotent()
 def update_amenity(amenity_id):
     """
     Update an existing amenity.
@@ -806,6 +1052,7 @@ def update_amenity(amenity_id):
 
 @admin_bp.route('/amenities/<int:amenity_id>', methods=['DELETE'])
 @admin_required()
+@idempotent()
 def delete_amenity(amenity_id):
     """
     Delete an amenity.
@@ -850,11 +1097,41 @@ def get_all_bookings():
     """
     Get all bookings.
     
+    Query parameters:
+        - stream: true to stream the list instead of building it in memory
+        - fields: Comma-separated booking fields to return (default all);
+          flat.<name> nests only that field of the flat
+        - ids: Comma-separated booking IDs (up to 100) to fetch in one request
+    
     Returns:
-        200: List of all bookings
+        200: List of all bookings, or for ids
+             {"items": [...in ids order], "missing": [ids not found]}
+        400: Unknown field or invalid ids
     """
-    bookings = BookingService.get_all_bookings()
-    return jsonify([booking.to_dict() for booking in bookings]), 200
+    try:
+        fields = parse_fields(request.args, BOOKING_FIELDS)
+        ids = parse_ids(request.args)
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e)
+            }
+        }), 400
+    
+    if ids is not None:
+        bookings, missing = BookingService.get_bookings_by_ids(ids, fields=fields)
+        return jsonify({
+            'items': [booking.to_dict(fields) for booking in bookings],
+            'missing': missing
+        }), 200
+    
+    if wants_stream(request.args):
+        return stream_json_array(BookingService.iter_all_bookings(fields=fields),
+                                 lambda booking: booking.to_dict(fields))
+    
+    bookings = BookingService.get_all_bookings(fields=fields)
+    return jsonify([booking.to_dict(fields) for booking in bookings]), 200
 
 
 @admin_bp.route('/bookings/<int:booking_id>', methods=['GET'])
@@ -885,19 +1162,29 @@ def get_booking(booking_id):
 
 @admin_bp.route('/bookings/<int:booking_id>/approve', methods=['PUT'])
 @admin_required()
+@idempotent()
 def approve_booking(booking_id):
     """
-    Approve a pending booking.
+    Approve a pending booking and decline the other pending bookings for
+    its flat.
     
     Path parameters:
         - booking_id: The ID of the booking
     
+    Query parameters:
+        - waitlist: true to also queue the users of the declined bookings on
+          the flat's waitlist
+    
     Returns:
-        200: Booking approved successfully
+        200: Booking approved successfully, with its lease and the number of
+             competing bookings declined (declined_bookings)
         400: Cannot approve booking (not pending)
         404: Booking not found
+        409: The flat was leased by another approval, or a concurrent
+             approval got in the way (retry)
     """
-    booking, error = BookingService.approve_booking(booking_id)
+    waitlist = request.args.get('waitlist', '').lower() in ('1', 'true', 'yes')
+    booking, error = BookingService.approve_booking(booking_id, waitlist=waitlist)
     
     if error:
         if "not found" in error.lower():
@@ -907,6 +1194,13 @@ def approve_booking(booking_id):
                     'message': error
                 }
             }), 404
+        if "no longer available" in error.lower() or "concurrent" in error.lower():
+            return jsonify({
+                'error': {
+                    'code': 'RESOURCE_CONFLICT',
+                    'message': error
+                }
+            }), 409
         return jsonify({
             'error': {
                 'code': 'VALIDATION_ERROR',
@@ -918,12 +1212,14 @@ def approve_booking(booking_id):
     response = booking.to_dict()
     if booking.lease:
         response['lease'] = booking.lease.to_dict()
+    response['declined_bookings'] = booking.declined_competing
     
     return jsonify(response), 200
 
 
 @admin_bp.route('/bookings/<int:booking_id>/decline', methods=['PUT'])
 @admin_required()
+@idempotent()
 def decline_booking(booking_id):
     """
     Decline a pending booking.
@@ -956,6 +1252,76 @@ def decline_booking(booking_id):
     return jsonify(booking.to_dict()), 200
 
 
+@admin_bp.route('/bookings/batch', methods=['POST'])
+@admin_required()
+@idempotent()
+def process_bookings():
+    """
+    Approve or decline many pending bookings at once.
+    
+    All items are processed in one transaction with a constant number of
+    statements. Items that cannot be processed are reported and do not stop
+    the others.
+    
+    Request body:
+        - items: array of {"id": booking ID, "action": "approve" | "decline"}
+          (up to 500)
+    
+    Query parameters:
+        - waitlist: true to queue the users of the competing bookings
+          declined by the approvals on the flats' waitlists
+    
+    Returns:
+        200: {"results": [...]} in item order; each result has id, action and
+             status (plus lease_id and declined_competing for approvals)
+             and/or error. An approval beaten to its flat by an earlier item
+             has an error and status declined.
+        400: Validation error
+        409: A booking changed while the batch ran, or it deadlocked with a
+             concurrent batch; nothing was written (retry)
+    """
+    data = request.get_json(silent=True)
+    
+    if not data:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': 'Request body is required'
+            }
+        }), 400
+    
+    try:
+        items = parse_actions(data.get('items'), ('approve', 'decline'))
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e),
+                'details': {'items': str(e)}
+            }
+        }), 400
+    
+    waitlist = request.args.get('waitlist', '').lower() in ('1', 'true', 'yes')
+    results, error = BookingService.process_bookings(items, waitlist=waitlist)
+    
+    if error:
+        if "concurrent" in error.lower():
+            return jsonify({
+                'error': {
+                    'code': 'RESOURCE_CONFLICT',
+                    'message': error
+                }
+            }), 409
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': error
+            }
+        }), 400
+    
+    return jsonify({'results': results}), 200
+
+
 # ============================================================================
 # Tenant Management Routes
 # ============================================================================
@@ -969,9 +1335,15 @@ def get_tenants():
     """
     Get all users with active leases.
     
+    Query parameters:
+        - stream: true to stream the list instead of building it in memory
+    
     Returns:
         200: List of tenants with active leases
     """
+    if wants_stream(request.args):
+        return stream_json_array(TenantService.iter_tenants(), lambda tenant: tenant.to_dict())
+    
     tenants = TenantService.get_tenants()
     return jsonify([tenant.to_dict() for tenant in tenants]), 200
 
@@ -1004,15 +1376,18 @@ def get_tenant(user_id):
 
 @admin_bp.route('/leases/<int:lease_id>', methods=['DELETE'])
 @admin_required()
+@idempotent()
 def terminate_lease(lease_id):
     """
     Terminate an active lease.
     
+    The first user on the flat's waitlist gets a pending booking for it.
+    
     Path parameters:
         - lease_id: The ID of the lease to terminate
     
     Returns:
-        200: Lease terminated successfully
+        200: Lease terminated successfully, with the promoted booking (or null)
         400: Cannot terminate lease (not active)
         404: Lease not found
     """
@@ -1035,7 +1410,8 @@ def terminate_lease(lease_id):
     
     return jsonify({
         'message': 'Lease terminated successfully',
-        'lease': lease.to_dict()
+        'lease': lease.to_dict(),
+        'promoted_booking': lease.promoted_booking.to_dict() if lease.promoted_booking else None
     }), 200
 
 
@@ -1060,6 +1436,36 @@ def get_occupancy_report():
     return jsonify(report), 200
 
 
+@admin_bp.route('/towers/<int:tower_id>/grid', methods=['GET'])
+@admin_required()
+def get_tower_grid(tower_id):
+    """
+    Get the occupancy grid of a tower.
+    
+    Path parameters:
+        - tower_id: The ID of the tower
+    
+    Returns:
+        200: {"tower_id", "first_floor", "floors", "flats_per_floor",
+             "legend", "rows", "flat_ids", "counts"} where rows holds one
+             string per floor (lowest first) with a V (vacant), O (occupied),
+             P (pending) or - (no flat) code per position, and flat_ids the
+             matching flat IDs
+        404: Tower not found
+    """
+    grid = ReportService.get_tower_grid(tower_id)
+    
+    if grid is None:
+        return jsonify({
+            'error': {
+                'code': 'RESOURCE_NOT_FOUND',
+                'message': 'Tower not found'
+            }
+        }), 404
+    
+    return jsonify(grid), 200
+
+
 @admin_bp.route('/reports/bookings', methods=['GET'])
 @admin_required()
 def get_booking_report():
@@ -1092,3 +1498,50 @@ def get_payment_report():
     """
     report = ReportService.get_payment_report()
     return jsonify(report), 200
+
+
+@admin_bp.route('/reports/flat-search-cache', methods=['GET'])
+@admin_required()
+def get_flat_search_cache_report():
+    """
+    Get hit, miss and eviction counters of this process's flat search cache.
+    
+    Returns:
+        200: Cache statistics
+    """
+    return jsonify(get_search_cache().stats()), 200
+
+
+# ============================================================================
+# Export Routes
+# ============================================================================
+
+from ..services.export_service import ExportService
+from ..streaming import stream_csv
+
+
+@admin_bp.route('/export/<name>.csv', methods=['GET'])
+@admin_required()
+def export_csv(name):
+    """
+    Download flats, bookings, tenants or leases as a CSV file.
+    
+    The file is streamed as rows come off the database cursor, and is
+    gzip-compressed on the fly when the client accepts gzip.
+    
+    Returns:
+        200: CSV file with a header line
+        404: Unknown export
+    """
+    export = ExportService.get_export(name)
+    
+    if export is None:
+        return jsonify({
+            'error': {
+                'code': 'RESOURCE_NOT_FOUND',
+                'message': f'Unknown export: {name}'
+            }
+        }), 404
+    
+    columns, rows = export
+    return stream_csv(columns, rows, f'{name}.csv', gzip='gzip' in request.accept_encodings)
@@ -2,11 +2,13 @@
 from flask import Blueprint, request, jsonify
 
 from ..services.amenity_service import AmenityService
+from ..etag import versioned_etag, AMENITIES
 
 amenities_bp = Blueprint('amenities', __name__, url_prefix='/api/amenities')
 
 
 @amenities_bp.route('', methods=['GET'])
+@versioned_etag(AMENITIES)
 def get_amenities():
     """
     Get list of all amenities.
@@ -16,6 +18,7 @@ def get_amenities():
     
     Returns:
         200: List of amenities
+        304: Not modified since the ETag sent in If-None-Match
     """
     amenity_type = request.args.get('type')
     
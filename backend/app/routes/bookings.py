@@ -3,12 +3,15 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from ..services.booking_service import BookingService
+from ..idempotency import idempotent
+from ..fieldsets import parse_fields, BOOKING_FIELDS
 
 bookings_bp = Blueprint('bookings', __name__, url_prefix='/api/bookings')
 
 
 @bookings_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent()
 def create_booking():
     """
     Create a new booking request.
@@ -92,14 +95,30 @@ def get_user_bookings():
     """
     Get all bookings for the authenticated user.
     
+    Query parameters:
+        - fields: Comma-separated booking fields to return (default all).
+          flat.<name> nests only that field of the flat, e.g.
+          id,status,flat.unit_number,flat.rent
+    
     Returns:
         200: List of user's bookings
+        400: Unknown field
     """
     user_id = get_jwt_identity()
     
-    bookings = BookingService.get_user_bookings(user_id)
+    try:
+        fields = parse_fields(request.args, BOOKING_FIELDS)
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e)
+            }
+        }), 400
+    
+    bookings = BookingService.get_user_bookings(user_id, fields=fields)
     
-    return jsonify([booking.to_dict() for booking in bookings]), 200
+    return jsonify([booking.to_dict(fields) for booking in bookings]), 200
 
 
 @bookings_bp.route('/<int:booking_id>', methods=['GET'])
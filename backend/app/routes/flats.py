@@ -1,9 +1,14 @@
 """Flat routes for browsing available apartments."""
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt, verify_jwt_in_request
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
 
-from ..services.flat_service import FlatService
+from ..services.flat_service import FlatService, DEFAULT_RENT_BUCKETS
+from ..services.waitlist_service import WaitlistService
 from ..models.user import UserRole
+from ..pagination import parse_page_args, encode_cursor
+from ..fieldsets import parse_fields, FLAT_FIELDS
+from ..batch import parse_ids
+from ..etag import versioned_etag, FLATS, TOWERS
 
 flats_bp = Blueprint('flats', __name__, url_prefix='/api/flats')
 
@@ -18,7 +23,32 @@ def is_admin_user():
         return False
 
 
+def parse_search_filters():
+    """
+    Read the flat search filters from the query string.
+    
+    Returns:
+        Dict of filter keyword arguments for FlatService search methods
+    """
+    return {
+        'tower_id': request.args.get('tower_id', type=int),
+        'bedrooms': request.args.get('bedrooms', type=int),
+        'min_rent': request.args.get('min_rent', type=float),
+        'max_rent': request.args.get('max_rent', type=float),
+        'min_area': request.args.get('min_area', type=int),
+        'max_area': request.args.get('max_area', type=int),
+        'min_floor': request.args.get('min_floor', type=int),
+        'max_floor': request.args.get('max_floor', type=int),
+        'min_bathrooms': request.args.get('min_bathrooms', type=int),
+        'max_bathrooms': request.args.get('max_bathrooms', type=int),
+        'q': request.args.get('q', '').strip() or None,
+        # Check if user is admin to include unavailable flats
+        'include_unavailable': is_admin_user()
+    }
+
+
 @flats_bp.route('', methods=['GET'])
+@versioned_etag(FLATS, TOWERS, vary=is_admin_user)
 def get_flats():
     """
     Get list of flats with optional filters.
@@ -28,29 +58,93 @@ def get_flats():
         - bedrooms: Filter by number of bedrooms (integer)
         - min_rent: Filter by minimum rent (number)
         - max_rent: Filter by maximum rent (number)
+        - min_area, max_area: Filter by area in square feet (integer)
+        - min_floor, max_floor: Filter by floor (integer)
+        - min_bathrooms, max_bathrooms: Filter by number of bathrooms (integer)
+        - q: Free-text search over unit number, tower name and tower address
+          (prefix match on every word); "3 bed" or "2br" filters on bedrooms
+        - sort: rent, area_sqft, floor, rent_per_sqft, created_at or relevance,
+          prefixed with - for descending order. Text searches are ordered by
+          relevance by default. Flats without a value for the sort field
+          (no recorded area for area-based sorts) come last, in both
+          directions.
+        - fields: Comma-separated flat fields to return (default all), e.g.
+          id,unit_number,rent,tower_name
+        - limit: Page size (integer, enables pagination)
+        - cursor: Opaque cursor from the previous page's next_cursor
+        - ids: Comma-separated flat IDs (up to 100) to fetch in one request,
+          including unavailable flats; other filters are ignored
     
     Returns:
-        200: List of flats matching filters
+        200: List of flats matching filters, or when paginating
+             {"items": [...], "next_cursor": string or null}, or for ids
+             {"items": [...in ids order], "missing": [ids not found]}
+        304: Not modified since the ETag sent in If-None-Match
         400: Invalid filter parameters
     """
-    # Parse query parameters
-    tower_id = request.args.get('tower_id', type=int)
-    bedrooms = request.args.get('bedrooms', type=int)
-    min_rent = request.args.get('min_rent', type=float)
-    max_rent = request.args.get('max_rent', type=float)
+    filters = parse_search_filters()
+    sort = request.args.get('sort') or None
+    
+    try:
+        fields = parse_fields(request.args, FLAT_FIELDS)
+        ids = parse_ids(request.args)
+        if ids is not None:
+            flats, missing = FlatService.get_flats_by_ids(ids, fields=fields)
+            return jsonify({'items': flats, 'missing': missing}), 200
+        
+        limit, after = parse_page_args(request.args)
+        flats, next_key = FlatService.search_flats(limit=limit, after=after, sort=sort, fields=fields, **filters)
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e)
+            }
+        }), 400
+    
+    if limit is not None:
+        return jsonify({'items': flats, 'next_cursor': encode_cursor(next_key)}), 200
+    
+    return jsonify(flats), 200
+
+
+@flats_bp.route('/facets', methods=['GET'])
+@versioned_etag(FLATS, TOWERS, vary=is_admin_user)
+def get_flat_facets():
+    """
+    Get flat counts per bedrooms, tower and rent bucket for the search filters.
+    
+    Query parameters:
+        - tower_id, bedrooms, min/max_rent, min/max_area, min/max_floor,
+          min/max_bathrooms, q: Same filters as GET /api/flats
+        - rent_buckets: Comma-separated ascending rent boundaries
+          (default 1000,1500,2000,2500,3000). A bucket includes its
+          min_rent and excludes its max_rent.
+    
+    Returns:
+        200: {"total", "bedrooms": [...], "towers": [...], "rent": [...]}
+        304: Not modified since the ETag sent in If-None-Match
+        400: Invalid rent buckets
+    """
+    rent_buckets = DEFAULT_RENT_BUCKETS
     
-    # Check if user is admin to include unavailable flats
-    include_unavailable = is_admin_user()
+    if request.args.get('rent_buckets'):
+        try:
+            rent_buckets = [float(bound) for bound in request.args['rent_buckets'].split(',')]
+        except ValueError:
+            rent_buckets = None
+        if not rent_buckets or len(rent_buckets) > 20 or rent_buckets != sorted(set(rent_buckets)):
+            return jsonify({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'rent_buckets must be up to 20 ascending numbers',
+                    'details': {'rent_buckets': 'Must be up to 20 ascending numbers'}
+                }
+            }), 400
     
-    flats = FlatService.get_flats(
-        tower_id=tower_id,
-        bedrooms=bedrooms,
-        min_rent=min_rent,
-        max_rent=max_rent,
-        include_unavailable=include_unavailable
-    )
+    facets = FlatService.get_facets(rent_buckets=rent_buckets, **parse_search_filters())
     
-    return jsonify([flat.to_dict() for flat in flats]), 200
+    return jsonify(facets), 200
 
 
 @flats_bp.route('/<int:flat_id>', methods=['GET'])
@@ -78,3 +172,111 @@ def get_flat(flat_id):
         }), 404
     
     return jsonify(flat.to_dict()), 200
+
+
+@flats_bp.route('/<int:flat_id>/waitlist', methods=['POST'])
+@jwt_required()
+def join_waitlist(flat_id):
+    """
+    Join the waitlist of a flat that is not available.
+    
+    When the flat's lease ends, the first user on the waitlist gets a
+    pending booking for it.
+    
+    Path parameters:
+        - flat_id: The ID of the flat
+    
+    Request body:
+        - requested_date: string in YYYY-MM-DD format (required)
+    
+    Returns:
+        201: Waitlist entry with the user's place in the queue (position)
+        400: Validation error or flat available for booking
+        404: Flat not found
+        409: Already on the waitlist, leasing the flat or holding a pending
+             booking for it
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    requested_date = data.get('requested_date')
+    
+    if requested_date is None:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': 'requested_date is required',
+                'details': {'requested_date': 'Required'}
+            }
+        }), 400
+    
+    entry, error = WaitlistService.join_waitlist(user_id, flat_id, requested_date)
+    
+    if error:
+        if 'not found' in error.lower():
+            return jsonify({
+                'error': {
+                    'code': 'RESOURCE_NOT_FOUND',
+                    'message': error
+                }
+            }), 404
+        if 'already' in error.lower():
+            return jsonify({
+                'error': {
+                    'code': 'RESOURCE_CONFLICT',
+                    'message': error
+                }
+            }), 409
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': error
+            }
+        }), 400
+    
+    response = entry.to_dict()
+    response['position'] = WaitlistService.get_position(user_id, flat_id)
+    return jsonify(response), 201
+
+
+@flats_bp.route('/<int:flat_id>/waitlist', methods=['GET'])
+@jwt_required()
+def get_waitlist_position(flat_id):
+    """
+    Get the authenticated user's place in the waitlist of a flat.
+    
+    Returns:
+        200: flat_id and position (1 is next in line)
+        404: Not on the waitlist
+    """
+    position = WaitlistService.get_position(get_jwt_identity(), flat_id)
+    
+    if position is None:
+        return jsonify({
+            'error': {
+                'code': 'RESOURCE_NOT_FOUND',
+                'message': 'You are not on the waitlist for this flat'
+            }
+        }), 404
+    
+    return jsonify({'flat_id': flat_id, 'position': position}), 200
+
+
+@flats_bp.route('/<int:flat_id>/waitlist', methods=['DELETE'])
+@jwt_required()
+def leave_waitlist(flat_id):
+    """
+    Leave the waitlist of a flat.
+    
+    Returns:
+        200: Left the waitlist
+        404: Not on the waitlist
+    """
+    if not WaitlistService.leave_waitlist(get_jwt_identity(), flat_id):
+        return jsonify({
+            'error': {
+                'code': 'RESOURCE_NOT_FOUND',
+                'message': 'You are not on the waitlist for this flat'
+            }
+        }), 404
+    
+    return jsonify({'message': 'Left the waitlist successfully'}), 200
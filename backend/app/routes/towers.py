@@ -1,24 +1,54 @@
 """Public tower routes for listing towers."""
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
 
 from ..services.tower_service import TowerService
+from ..etag import versioned_etag, TOWERS, AMENITIES
+from ..fieldsets import parse_fields, TOWER_FIELDS
+from ..batch import parse_ids
 
 towers_bp = Blueprint('towers', __name__, url_prefix='/api/towers')
 
 
 @towers_bp.route('', methods=['GET'])
+@versioned_etag(TOWERS)
 def get_towers():
     """
     Get list of all towers (public endpoint for filtering).
     
+    Query parameters:
+        - fields: Comma-separated tower fields to return (default all)
+        - ids: Comma-separated tower IDs (up to 100) to fetch in one request
+    
     Returns:
-        200: List of towers
+        200: List of towers, or for ids
+             {"items": [...in ids order], "missing": [ids not found]}
+        304: Not modified since the ETag sent in If-None-Match
+        400: Unknown field or invalid ids
     """
-    towers = TowerService.get_all_towers()
-    return jsonify([tower.to_dict() for tower in towers]), 200
+    try:
+        fields = parse_fields(request.args, TOWER_FIELDS)
+        ids = parse_ids(request.args)
+    except ValueError as e:
+        return jsonify({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': str(e)
+            }
+        }), 400
+    
+    if ids is not None:
+        towers, missing = TowerService.get_towers_by_ids(ids, fields=fields)
+        return jsonify({
+            'items': [tower.to_dict(fields=fields) for tower in towers],
+            'missing': missing
+        }), 200
+    
+    towers = TowerService.get_all_towers(fields=fields)
+    return jsonify([tower.to_dict(fields=fields) for tower in towers]), 200
 
 
 @towers_bp.route('/<int:tower_id>', methods=['GET'])
+@versioned_etag(TOWERS, AMENITIES)
 def get_tower(tower_id):
     """
     Get a specific tower with its amenities (public endpoint).
@@ -28,9 +58,10 @@ def get_tower(tower_id):
     
     Returns:
         200: Tower details with amenities
+        304: Not modified since the ETag sent in If-None-Match
         404: Tower not found
     """
-    tower = TowerService.get_tower_by_id(tower_id)
+    tower = TowerService.get_tower_by_id(tower_id, include_amenities=True)
     
     if tower is None:
         return jsonify({
@@ -1,5 +1,6 @@
 """Amenity service for handling amenity-related business logic."""
 from ..models.amenity import Amenity, AmenityType
+from ..etag import bump_versions, AMENITIES
 from .. import db
 
 
@@ -69,6 +70,7 @@ class AmenityService:
         )
         
         db.session.add(amenity)
+        bump_versions(AMENITIES)
         db.session.commit()
         
         return amenity, None
@@ -115,6 +117,7 @@ class AmenityService:
         if fee is not None:
             amenity.fee = fee
         
+        bump_versions(AMENITIES)
         db.session.commit()
         
         return amenity, None
@@ -136,6 +139,7 @@ class AmenityService:
             return False, 'Amenity not found'
         
         db.session.delete(amenity)
+        bump_versions(AMENITIES)
         db.session.commit()
         
         return True, None
@@ -1,11 +1,40 @@
 """Booking service for handling booking-related business logic."""
+from collections import Counter
 from datetime import datetime, date
 from ..models.booking import Booking, BookingStatus
 from ..models.flat import Flat
 from ..models.lease import Lease, LeaseStatus
+from sqlalchemy import and_, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import joinedload, load_only
+from .flat_service import FlatService
+from .waitlist_service import WaitlistService
+from ..etag import bump_versions, FLATS
+from ..streaming import STREAM_BATCH_SIZE
+from ..batch import order_by_ids
 from .. import db
 
 
+# The partial unique index allowing one pending booking per user and flat
+PENDING_BOOKING_INDEX = 'uq_bookings_pending_user_flat'
+
+# Error for approvals that lost a race (such as a deadlock) with concurrent writes
+CONCURRENT_CHANGE = 'Bookings were changed by a concurrent request, please retry'
+
+
+def is_pending_duplicate(error):
+    """
+    Tell whether an IntegrityError comes from the pending booking index.
+    
+    PostgreSQL reports the name of the violated constraint; SQLite only
+    names the columns of the unique index.
+    """
+    diag = getattr(error.orig, 'diag', None)
+    if diag is not None:
+        return diag.constraint_name == PENDING_BOOKING_INDEX
+    return str(error.orig) == 'UNIQUE constraint failed: bookings.user_id, bookings.flat_id'
+
+
 class BookingService:
     """Service class for booking operations."""
     
@@ -25,25 +54,6 @@ class BookingService:
         # Convert user_id to int if it's a string
         user_id = int(user_id)
         
-        # Check if flat exists
-        flat = db.session.get(Flat, flat_id)
-        if flat is None:
-            return None, 'Flat not found'
-        
-        # Check if flat is available
-        if not flat.is_available:
-            return None, 'Flat is not available for booking'
-        
-        # Check for duplicate pending booking
-        existing_booking = Booking.query.filter(
-            Booking.user_id == user_id,
-            Booking.flat_id == flat_id,
-            Booking.status == BookingStatus.PENDING
-        ).first()
-        
-        if existing_booking:
-            return None, 'You already have a pending booking for this flat'
-        
         # Parse requested_date if it's a string
         if isinstance(requested_date, str):
             try:
@@ -51,33 +61,74 @@ class BookingService:
             except ValueError:
                 return None, 'Invalid date format. Use YYYY-MM-DD'
         
-        # Create the booking
-        booking = Booking(
-            user_id=user_id,
-            flat_id=flat_id,
-            requested_date=requested_date,
-            status=BookingStatus.PENDING
-        )
+        # A single INSERT .. SELECT creates the booking only if the flat
+        # exists and is available. The partial unique index on pending
+        # bookings rejects a duplicate, even from a concurrent request.
+        available_flat = select(
+            literal(user_id), Flat.id, literal(requested_date, Booking.requested_date.type),
+            literal(BookingStatus.PENDING, Booking.status.type), literal(datetime.utcnow(), Booking.created_at.type)
+        ).where(Flat.id == flat_id, Flat.is_available == True)
+        
+        try:
+            booking = db.session.scalars(
+                insert(Booking).from_select(
+                    ['user_id', 'flat_id', 'requested_date', 'status', 'created_at'], available_flat
+                ).returning(Booking)
+            ).first()
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_pending_duplicate(e):
+                return None, 'You already have a pending booking for this flat'
+            # Such as a foreign key failure for a user deleted since login
+            return None, 'Booking could not be created'
+        
+        if booking is None:
+            # Nothing was inserted: find out why
+            db.session.rollback()
+            if db.session.get(Flat, flat_id) is None:
+                return None, 'Flat not found'
+            return None, 'Flat is not available for booking'
         
-        db.session.add(booking)
         db.session.commit()
         
         return booking, None
     
     @staticmethod
-    def get_user_bookings(user_id):
+    def get_user_bookings(user_id, fields=None):
         """
         Get all bookings for a specific user.
         
         Args:
             user_id: The ID of the user
+            fields: Booking.to_dict() field names to load, or None for all
         
         Returns:
             List of Booking objects
         """
         # Convert user_id to int if it's a string
         user_id = int(user_id)
-        return Booking.query.filter(Booking.user_id == user_id).order_by(Booking.created_at.desc()).all()
+        return Booking.query.options(
+            *BookingService._load_options(fields)
+        ).filter(Booking.user_id == user_id).order_by(Booking.created_at.desc()).all()
+    
+    @staticmethod
+    def get_bookings_by_ids(ids, fields=None):
+        """
+        Get the bookings for a list of IDs (admin only) with one IN query.
+        
+        The flat and its tower are joined in the same query.
+        
+        Args:
+            ids: Booking IDs in the order they should be returned
+            fields: Booking.to_dict() field names to load, or None for all
+        
+        Returns:
+            Tuple of (list of Booking objects in ids order, list of IDs not found)
+        """
+        bookings = db.session.execute(
+            select(Booking).options(*BookingService._load_options(fields)).where(Booking.id.in_(ids))
+        ).scalars().all()
+        return order_by_ids(bookings, ids)
     
     @staticmethod
     def get_booking_by_id(booking_id, user_id=None):
@@ -104,25 +155,87 @@ class BookingService:
 
     
     @staticmethod
-    def get_all_bookings():
+    def get_all_bookings(fields=None):
         """
         Get all bookings (admin only).
         
+        Args:
+            fields: Booking.to_dict() field names to load, or None for all
+        
         Returns:
-            List of all Booking objects
+            List of all Booking objects, newest first
         """
-        return Booking.query.order_by(Booking.created_at.desc()).all()
+        return db.session.execute(BookingService._all_bookings_query(fields)).scalars().all()
     
     @staticmethod
-    def approve_booking(booking_id):
+    def iter_all_bookings(batch_size=STREAM_BATCH_SIZE, fields=None):
+        """
+        Iterate over all bookings (admin only) without loading them all.
+        
+        Rows are fetched batch_size at a time from a server-side cursor.
+        
+        Args:
+            batch_size: Rows per fetch
+            fields: Booking.to_dict() field names to load, or None for all
+        
+        Returns:
+            Iterable of Booking objects, newest first
+        """
+        return db.session.execute(
+            BookingService._all_bookings_query(fields).execution_options(yield_per=batch_size)
+        ).scalars()
+    
+    @staticmethod
+    def _all_bookings_query(fields=None):
+        """Select all bookings newest first with the loader options for fields."""
+        return select(Booking).options(
+            *BookingService._load_options(fields)
+        ).order_by(Booking.created_at.desc(), Booking.id.desc())
+    
+    @staticmethod
+    def _load_options(fields=None):
+        """
+        Build the loader options for serializing bookings with to_dict(fields).
+        
+        The flat (and its tower) is joined only when the fields include 'flat'
+        or 'flat.<name>' entries, and then loads only the nested flat fields.
+        
+        Args:
+            fields: Booking.to_dict() field names, or None for all
+        
+        Returns:
+            List of loader options
+        """
+        if fields is None:
+            return [joinedload(Booking.flat).joinedload(Flat.tower)]
+        
+        columns = [getattr(Booking, name) for name in fields if name in Booking.FIELDS and name not in ('id', 'flat')]
+        options = [load_only(Booking.id, *columns)]
+        
+        flat_fields = [name[len('flat.'):] for name in fields if name.startswith('flat.')]
+        if 'flat' in fields:
+            options.append(joinedload(Booking.flat).joinedload(Flat.tower))
+        elif flat_fields:
+            options.append(joinedload(Booking.flat).options(*FlatService._load_options(flat_fields)))
+        return options
+    
+    @staticmethod
+    def approve_booking(booking_id, waitlist=False):
         """
         Approve a pending booking and create a lease.
         
+        The other pending bookings for the flat are declined in the same
+        transaction, since the flat is no longer available to them.
+        
         Args:
             booking_id: The ID of the booking to approve
+            waitlist: If True, also queue the users of the declined bookings
+                on the flat's waitlist, in the order they booked
         
         Returns:
-            Tuple of (Booking, error_message)
+            Tuple of (Booking, error_message). The booking's
+            declined_competing attribute holds the number of competing
+            bookings declined.
         """
         booking = db.session.get(Booking, booking_id)
         
@@ -132,22 +245,70 @@ class BookingService:
         if booking.status != BookingStatus.PENDING:
             return None, f'Cannot approve booking with status: {booking.status.value}'
         
+        try:
+            return BookingService._approve(booking, waitlist)
+        except OperationalError:
+            # Such as a deadlock with a concurrent write to the bookings
+            db.session.rollback()
+            return None, CONCURRENT_CHANGE
+    
+    @staticmethod
+    def _approve(booking, waitlist):
+        """Claim the flat of a pending booking and lease it; see approve_booking."""
+        # Claim the flat with a compare-and-set UPDATE before locking any
+        # booking, so every approval takes the flat's row lock first and
+        # concurrent approvals for the flat queue on it instead of
+        # deadlocking on each other's bookings. Once this transaction
+        # commits, a concurrent approval matches no row and fails instead of
+        # creating a second lease.
+        claimed = db.session.execute(
+            update(Flat).where(Flat.id == booking.flat_id, Flat.is_available == True)
+            .values(is_available=False).returning(Flat.rent, Flat.tower_id)
+        ).first()
+        if claimed is None:
+            db.session.rollback()
+            booking = db.session.get(Booking, booking.id)
+            if booking is not None and booking.status != BookingStatus.PENDING:
+                return None, f'Cannot approve booking with status: {booking.status.value}'
+            return None, 'Flat is no longer available'
+        rent, tower_id = claimed
+        
+        # Lock the booking, which may have changed since it was read
+        booking = db.session.get(Booking, booking.id, with_for_update=True, populate_existing=True)
+        if booking.status != BookingStatus.PENDING:
+            db.session.rollback()
+            return None, f'Cannot approve booking with status: {booking.status.value}'
+        
         # Update booking status
         booking.status = BookingStatus.APPROVED
         
+        competing = and_(
+            Booking.flat_id == booking.flat_id,
+            Booking.status == BookingStatus.PENDING,
+            Booking.id != booking.id
+        )
+        if waitlist:
+            # The claim above holds the flat's row lock
+            WaitlistService.queue_bookings(competing)
+        
+        # Decline the competing requests for the flat with one UPDATE
+        booking.declined_competing = db.session.execute(
+            update(Booking).where(competing)
+            .values(status=BookingStatus.DECLINED).execution_options(synchronize_session=False)
+        ).rowcount
+        
         # Create lease record
         lease = Lease(
             booking_id=booking.id,
             start_date=booking.requested_date,
-            monthly_rent=booking.flat.rent,
+            monthly_rent=rent,
             status=LeaseStatus.ACTIVE
         )
         db.session.add(lease)
         
-        # Mark flat as unavailable
-        booking.flat.is_available = False
-        
+        bump_versions(FLATS)
         db.session.commit()
+        FlatService.notify_flats_changed(tower_id)
         
         return booking, None
     
@@ -176,3 +337,139 @@ class BookingService:
         db.session.commit()
         
         return booking, None
+    
+    @staticmethod
+    def process_bookings(items, waitlist=False):
+        """
+        Approve and decline many pending bookings in one transaction.
+        
+        The statement count does not depend on the number of items: one
+        SELECT of the bookings, one compare-and-set UPDATE claiming the flats
+        (as in approve_booking, before any booking is locked), one UPDATE
+        per target status, one INSERT queuing the competing bookings when waitlist is
+        set, one UPDATE declining the other pending bookings of the leased
+        flats and one bulk INSERT of the leases. Within the batch, the first
+        approval of a flat wins and later ones conflict. If a booking stops
+        being pending while the batch runs, or the batch deadlocks with a
+        concurrent one, nothing is written and the error says to retry.
+        
+        Args:
+            items: List of (booking_id, action) tuples, action being
+                'approve' or 'decline'
+            waitlist: If True, queue the users of the competing bookings on
+                the waitlists of the leased flats, as in approve_booking
+        
+        Returns:
+            Tuple of (list of outcome dicts in item order, error message or
+            None). Each outcome has id and action, plus status (the new
+            booking status) and/or error. Approvals also have lease_id and
+            declined_competing, the count of other pending bookings of the
+            flat that were declined. An approval that lost its flat to an
+            earlier one in the batch has both an error and status 'declined',
+            as it is declined with the flat's other competing bookings.
+        """
+        ids = {booking_id for booking_id, _ in items}
+        try:
+            bookings = {row.id: row for row in db.session.execute(
+                select(Booking.id, Booking.status, Booking.flat_id, Booking.requested_date)
+                .where(Booking.id.in_(ids))
+            )}
+            
+            outcomes = []
+            seen = set()
+            approvals = {}  # flat_id -> outcome of the approval claiming it
+            declines = []
+            for booking_id, action in items:
+                outcome = {'id': booking_id, 'action': action}
+                outcomes.append(outcome)
+                booking = bookings.get(booking_id)
+                if booking_id in seen:
+                    outcome['error'] = 'Booking appears more than once in the batch'
+                elif booking is None:
+                    outcome['error'] = 'Booking not found'
+                elif booking.status != BookingStatus.PENDING:
+                    outcome['error'] = f'Cannot {action} booking with status: {booking.status.value}'
+                elif action == 'decline':
+                    declines.append(outcome)
+                elif booking.flat_id in approvals:
+                    outcome['error'] = 'Flat is no longer available'
+                else:
+                    approvals[booking.flat_id] = outcome
+                seen.add(booking_id)
+            
+            claimed = {}
+            if approvals:
+                claimed = {row.id: row for row in db.session.execute(
+                    update(Flat).where(Flat.id.in_(approvals), Flat.is_available == True)
+                    .values(is_available=False).returning(Flat.id, Flat.rent, Flat.tower_id)
+                    .execution_options(synchronize_session=False)
+                )}
+            for flat_id, outcome in approvals.items():
+                if flat_id not in claimed:
+                    outcome['error'] = 'Flat is no longer available'
+            approved = [outcome for flat_id, outcome in approvals.items() if flat_id in claimed]
+            
+            for status, group in ((BookingStatus.APPROVED, approved), (BookingStatus.DECLINED, declines)):
+                if group:
+                    # Locks the bookings; one that changed since it was read
+                    # is no longer pending and fails the whole batch
+                    updated = db.session.execute(
+                        update(Booking).where(
+                            Booking.id.in_([outcome['id'] for outcome in group]),
+                            Booking.status == BookingStatus.PENDING
+                        ).values(status=status).returning(Booking.id)
+                        .execution_options(synchronize_session=False)
+                    ).all()
+                    if len(updated) != len(group):
+                        db.session.rollback()
+                        return None, CONCURRENT_CHANGE
+                for outcome in group:
+                    outcome['status'] = status.value
+            
+            competing = Counter()
+            if approved:
+                competing_bookings = and_(
+                    Booking.flat_id.in_([bookings[outcome['id']].flat_id for outcome in approved]),
+                    Booking.status == BookingStatus.PENDING
+                )
+                if waitlist:
+                    # The claim above holds the row locks of the flats
+                    WaitlistService.queue_bookings(competing_bookings)
+                declined = db.session.execute(
+                    update(Booking).where(competing_bookings)
+                    .values(status=BookingStatus.DECLINED).returning(Booking.id, Booking.flat_id)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                competing.update(row.flat_id for row in declined)
+                declined_ids = {row.id for row in declined}
+                # Approvals that lost their flat within the batch were among them
+                for outcome in outcomes:
+                    if outcome['id'] in declined_ids and 'error' in outcome:
+                        outcome['status'] = BookingStatus.DECLINED.value
+            for outcome in approved:
+                outcome['declined_competing'] = competing[bookings[outcome['id']].flat_id]
+            
+            if approved:
+                leases = db.session.execute(insert(Lease).returning(Lease.id, Lease.booking_id), [{
+                    'booking_id': outcome['id'],
+                    'start_date': bookings[outcome['id']].requested_date,
+                    'monthly_rent': claimed[bookings[outcome['id']].flat_id].rent,
+                    'status': LeaseStatus.ACTIVE
+                } for outcome in approved])
+                lease_ids = {row.booking_id: row.id for row in leases}
+                for outcome in approved:
+                    outcome['lease_id'] = lease_ids[outcome['id']]
+                bump_versions(FLATS)
+            
+            db.session.commit()
+        except OperationalError:
+            # Such as a deadlock with a concurrent batch claiming the same flats
+            db.session.rollback()
+            return None, CONCURRENT_CHANGE
+        except Exception as e:
+            db.session.rollback()
+            return None, str(e)
+        
+        if claimed:
+            FlatService.notify_flats_changed(*{row.tower_id for row in claimed.values()})
+        return outcomes, None
@@ -0,0 +1,89 @@
+"""Export service for building the CSV exports of the admin reports."""
+from sqlalchemy import select
+from ..models.user import User
+from ..models.booking import Booking
+from ..models.lease import Lease, LeaseStatus
+from ..models.flat import Flat
+from ..models.tower import Tower
+from ..streaming import STREAM_BATCH_SIZE
+from .. import db
+
+
+class ExportService:
+    """Service class for CSV exports."""
+    
+    @staticmethod
+    def _flats_query():
+        """Select every flat with its tower name."""
+        return select(
+            Flat.id, Flat.tower_id, Tower.name.label('tower_name'), Flat.unit_number, Flat.floor,
+            Flat.bedrooms, Flat.bathrooms, Flat.area_sqft, Flat.rent, Flat.is_available, Flat.created_at
+        ).join(Tower, Flat.tower_id == Tower.id).order_by(Flat.id)
+    
+    @staticmethod
+    def _bookings_query():
+        """Select every booking with its user, flat and tower."""
+        return select(
+            Booking.id, Booking.status, Booking.requested_date, Booking.created_at,
+            Booking.user_id, User.email.label('user_email'), User.name.label('user_name'),
+            Booking.flat_id, Flat.unit_number, Flat.tower_id, Tower.name.label('tower_name')
+        ).join(User, Booking.user_id == User.id).join(
+            Flat, Booking.flat_id == Flat.id
+        ).join(Tower, Flat.tower_id == Tower.id).order_by(Booking.id)
+    
+    @staticmethod
+    def _tenants_query():
+        """Select one row per active lease with its tenant, flat and tower."""
+        return select(
+            User.id.label('user_id'), User.name, User.email, User.phone,
+            Lease.id.label('lease_id'), Lease.start_date, Lease.monthly_rent,
+            Flat.id.label('flat_id'), Flat.unit_number, Tower.name.label('tower_name')
+        ).join(Booking, Lease.booking_id == Booking.id).join(
+            User, Booking.user_id == User.id
+        ).join(Flat, Booking.flat_id == Flat.id).join(
+            Tower, Flat.tower_id == Tower.id
+        ).where(Lease.status == LeaseStatus.ACTIVE).order_by(User.id, Lease.id)
+    
+    @staticmethod
+    def _leases_query():
+        """Select every lease with its tenant, flat and tower."""
+        return select(
+            Lease.id, Lease.status, Lease.start_date, Lease.end_date, Lease.monthly_rent, Lease.booking_id,
+            Booking.user_id, User.email.label('user_email'),
+            Booking.flat_id, Flat.unit_number, Tower.name.label('tower_name')
+        ).join(Booking, Lease.booking_id == Booking.id).join(
+            User, Booking.user_id == User.id
+        ).join(Flat, Booking.flat_id == Flat.id).join(
+            Tower, Flat.tower_id == Tower.id
+        ).order_by(Lease.id)
+    
+    # Export name -> method building its query
+    EXPORTS = {
+        'flats': '_flats_query',
+        'bookings': '_bookings_query',
+        'tenants': '_tenants_query',
+        'leases': '_leases_query'
+    }
+    
+    @staticmethod
+    def get_export(name, batch_size=STREAM_BATCH_SIZE):
+        """
+        Run the query of an export as a stream of rows.
+        
+        Related columns are joined in SQL and rows are fetched batch_size at
+        a time from a server-side cursor, without building ORM objects.
+        
+        Args:
+            name: Export name (flats, bookings, tenants or leases)
+            batch_size: Rows per fetch
+        
+        Returns:
+            Tuple of (list of column names, iterable of row tuples), or None
+            if there is no such export
+        """
+        if name not in ExportService.EXPORTS:
+            return None
+        
+        query = getattr(ExportService, ExportService.EXPORTS[name])()
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        return list(result.keys()), result
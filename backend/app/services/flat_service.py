@@ -1,48 +1,610 @@
 """Flat service for handling flat-related business logic."""
-from sqlalchemy.exc import IntegrityError
-from ..models.flat import Flat
+import re
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import Numeric, and_, case, func, literal, literal_column, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import aliased, joinedload, load_only
+from ..cache import TTLCache
+from ..etag import bump_versions, on_version_change, FLATS
+from ..flat_catalog import FlatCatalog, np
+from ..streaming import STREAM_BATCH_SIZE
+from ..serializers import flat_serializer
+from ..batch import MAX_ID, order_by_ids
+from ..flat_import import IMPORT_CHUNK_SIZE, MAX_IMPORT_ERRORS, validate_flat_record
+from ..models.flat import Flat, RENT_LIMIT, RENT_PER_SQFT
+from ..models.flat_search import flat_search, flat_search_fts
 from ..models.tower import Tower
 from .. import db
 
 
+# Default rent boundaries for the rent facet
+DEFAULT_RENT_BUCKETS = (1000, 1500, 2000, 2500, 3000)
+
+
+# A sortable flat field: the ORDER BY expression, whether it can be NULL
+# (such rows sort last in both directions) and converters for the value kept
+# in cursors
+SortKey = namedtuple('SortKey', ['expression', 'nullable', 'encode', 'decode'])
+
+SORT_KEYS = {
+    'rent': SortKey(Flat.rent, False, str, Decimal),
+    'area_sqft': SortKey(Flat.area_sqft, True, int, int),
+    'floor': SortKey(Flat.floor, False, int, int),
+    # NULL when the area is unknown or 0
+    'rent_per_sqft': SortKey(RENT_PER_SQFT, True, float, float),
+    'created_at': SortKey(Flat.created_at, True, datetime.isoformat, datetime.fromisoformat),
+}
+
+# Free-text search: phrases such as "3 bed", "2br" or "3 bedrooms" become a
+# bedrooms filter, the remaining words are matched against the search index
+BEDROOM_PHRASE = re.compile(r'\b(\d+)\s*(?:bed(?:room)?s?|br|bhk)\b', re.IGNORECASE)
+SEARCH_TERM = re.compile(r'[^\W_]+')
+
+
+def parse_text_query(q):
+    """
+    Split a free-text search into index terms and an optional bedroom count.
+    
+    Args:
+        q: The search text, e.g. "Ocean View 3 bed"
+    
+    Returns:
+        Tuple of (list of lower-case terms, bedrooms or None)
+    """
+    bedrooms = None
+    match = BEDROOM_PHRASE.search(q)
+    if match:
+        bedrooms = int(match.group(1))
+        q = q[:match.start()] + ' ' + q[match.end():]
+    return SEARCH_TERM.findall(q.lower()), bedrooms
+
+
+def get_search_cache():
+    """
+    Get the flat search cache of the current app, creating it on first use.
+    
+    Returns:
+        TTLCache keyed on normalized search filters
+    """
+    cache = current_app.extensions.get('flat_search_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('flat_search_cache', TTLCache(
+            maxsize=current_app.config.get('FLAT_SEARCH_CACHE_SIZE', 256),
+            ttl=current_app.config.get('FLAT_SEARCH_CACHE_TTL', 30)
+        ))
+    return cache
+
+
+def get_flat_catalog():
+    """
+    Get the columnar flat catalog of the current app, creating it on first use.
+    
+    Returns:
+        FlatCatalog, or None when FLAT_CATALOG_ENABLED is off or numpy is not
+        installed
+    """
+    if np is None or not current_app.config.get('FLAT_CATALOG_ENABLED'):
+        return None
+    
+    catalog = current_app.extensions.get('flat_catalog')
+    if catalog is None:
+        catalog = current_app.extensions.setdefault('flat_catalog', FlatCatalog(
+            FlatService._catalog_rows,
+            ttl=current_app.config.get('FLAT_CATALOG_TTL', 300)
+        ))
+    return catalog
+
+
+def drop_local_flat_copies():
+    """
+    Drop the cached searches and columnar catalog of this process.
+    
+    Runs when a request sees a flats version written by another worker or
+    instance, whose commit could not invalidate this process's copies. The
+    catalog is only marked stale; the next search rebuilds it.
+    """
+    get_search_cache().invalidate()
+    catalog = get_flat_catalog()
+    if catalog is not None:
+        catalog.invalidate()
+
+
+on_version_change(FLATS, drop_local_flat_copies)
+
+
 class FlatService:
     """Service class for flat operations."""
     
     @staticmethod
-    def get_flats(tower_id=None, bedrooms=None, min_rent=None, max_rent=None, include_unavailable=False):
+    def _search_filters(tower_id=None, bedrooms=None, min_rent=None, max_rent=None, include_unavailable=False,
+                        min_area=None, max_area=None, min_floor=None, max_floor=None,
+                        min_bathrooms=None, max_bathrooms=None, q=None):
         """
-        Get flats with optional filters.
-        
-        Args:
-            tower_id: Filter by tower ID
-            bedrooms: Filter by number of bedrooms
-            min_rent: Filter by minimum rent
-            max_rent: Filter by maximum rent
-            include_unavailable: If True, include unavailable flats (admin only)
+        Build the WHERE criteria shared by flat searches and facet counts.
         
-        Returns:
-            List of Flat objects matching the filters
+        The text terms of q are matched by _join_text_search(); only its
+        bedroom phrase is applied here, unless bedrooms is given explicitly.
         """
-        query = Flat.query
+        criteria = []
+        
+        if q and bedrooms is None:
+            bedrooms = parse_text_query(q)[1]
         
         # Only show available flats for non-admin users
         if not include_unavailable:
-            query = query.filter(Flat.is_available == True)
+            criteria.append(Flat.is_available == True)
         
         # Apply filters
         if tower_id is not None:
-            query = query.filter(Flat.tower_id == tower_id)
+            criteria.append(Flat.tower_id == tower_id)
         
         if bedrooms is not None:
-            query = query.filter(Flat.bedrooms == bedrooms)
+            criteria.append(Flat.bedrooms == bedrooms)
         
         if min_rent is not None:
-            query = query.filter(Flat.rent >= min_rent)
+            criteria.append(Flat.rent >= min_rent)
         
         if max_rent is not None:
-            query = query.filter(Flat.rent <= max_rent)
+            criteria.append(Flat.rent <= max_rent)
+        
+        if min_area is not None:
+            criteria.append(Flat.area_sqft >= min_area)
+        
+        if max_area is not None:
+            criteria.append(Flat.area_sqft <= max_area)
+        
+        if min_floor is not None:
+            criteria.append(Flat.floor >= min_floor)
+        
+        if max_floor is not None:
+            criteria.append(Flat.floor <= max_floor)
+        
+        if min_bathrooms is not None:
+            criteria.append(Flat.bathrooms >= min_bathrooms)
+        
+        if max_bathrooms is not None:
+            criteria.append(Flat.bathrooms <= max_bathrooms)
+        
+        return criteria
+    
+    @staticmethod
+    def _text_match(terms):
+        """
+        Build the full-text match of the terms for the current database.
+        
+        Terms are matched as prefixes, so "oce" finds "Ocean".
+        
+        Returns:
+            Tuple of (search table, join condition, match criterion, rank
+            expression). Lower ranks are better matches.
+        
+        Raises:
+            ValueError: If the database has no supported text index
+        """
+        dialect = db.engine.dialect.name
+        
+        if dialect == 'postgresql':
+            tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+            return (
+                flat_search,
+                flat_search.c.flat_id == Flat.id,
+                flat_search.c.document.op('@@')(tsquery),
+                -func.ts_rank(flat_search.c.document, tsquery)
+            )
+        
+        if dialect == 'sqlite':
+            fts = literal_column('flat_search_fts')
+            return (
+                flat_search_fts,
+                flat_search_fts.c.rowid == Flat.id,
+                fts.op('MATCH')(' '.join(f'"{term}"*' for term in terms)),
+                # Column weights: unit_number, tower_name, tower_address
+                func.bm25(fts, literal_column('10.0'), literal_column('5.0'), literal_column('1.0'))
+            )
+        
+        raise ValueError('Text search is not supported on this database')
+    
+    @staticmethod
+    def _join_text_search(query, q):
+        """Restrict a flat query or select to flats matching the text terms of q."""
+        terms = parse_text_query(q)[0] if q else []
+        if not terms:
+            return query
+        
+        search_table, onclause, match, _ = FlatService._text_match(terms)
+        return query.join(search_table, and_(onclause, match))
+    
+    @staticmethod
+    def _load_options(fields=None):
+        """
+        Build the loader options for serializing flats with to_dict(fields).
+        
+        Args:
+            fields: Flat.FIELDS names that will be serialized, or None for all
+        
+        Returns:
+            List of options loading only the columns behind those fields
+        """
+        # Load the tower in the same query so to_dict() does not issue one
+        # lazy SELECT per flat for tower_name
+        if fields is None:
+            return [joinedload(Flat.tower)]
+        
+        columns = [getattr(Flat, name) for name in fields if name not in ('id', 'tower_name')]
+        options = [load_only(Flat.id, *columns)]
+        if 'tower_name' in fields:
+            options.append(joinedload(Flat.tower).load_only(Tower.name))
+        return options
+    
+    @staticmethod
+    def _default_sort(sort, q):
+        """Sort text searches by relevance unless another order is requested."""
+        if sort is None and q and parse_text_query(q)[0]:
+            return 'relevance'
+        return sort
+    
+    @staticmethod
+    def _sort_spec(sort, q=None):
+        """
+        Resolve a sort parameter such as 'rent' or '-rent'.
+        
+        'relevance' orders text searches by match rank and needs q.
+        
+        Returns:
+            Tuple of (SortKey, descending flag)
+        
+        Raises:
+            ValueError: If the sort field is not supported
+        """
+        descending = sort.startswith('-')
+        if sort.lstrip('-') == 'relevance':
+            terms = parse_text_query(q)[0] if q else []
+            if not terms:
+                raise ValueError('Sorting by relevance requires a text query (q)')
+            return SortKey(FlatService._text_match(terms)[3], False, float, float), descending
+        
+        sort_key = SORT_KEYS.get(sort.lstrip('-'))
+        if sort_key is None:
+            raise ValueError(f'Invalid sort. Must be one of: {", ".join(SORT_KEYS)} (prefix - for descending)')
+        return sort_key, descending
+    
+    @staticmethod
+    def _apply_sort(query, sort, q=None):
+        """Order a flat query by the sort parameter, with the ID as tie-breaker."""
+        if sort is None:
+            return query.order_by(Flat.id)
+        
+        sort_key, descending = FlatService._sort_spec(sort, q)
+        order = sort_key.expression.desc() if descending else sort_key.expression.asc()
+        if sort_key.nullable:
+            order = order.nulls_last()
+        return query.order_by(order, Flat.id.desc() if descending else Flat.id)
+    
+    @staticmethod
+    def _check_page_key(after, sort=None, q=None):
+        """
+        Validate a page key produced by _keyset_page for the same sort.
+        
+        Page keys are (id,) when unsorted and (sort, value, id) when sorted.
+        The value is None once a page ends among the flats without one.
+        
+        Raises:
+            ValueError: If the key is malformed or belongs to another sort
+        """
+        last_id = after[-1]
+        # IDs past the INTEGER range would overflow the database driver
+        if not isinstance(last_id, int) or isinstance(last_id, bool) or not 0 <= last_id <= MAX_ID:
+            raise ValueError('Invalid cursor')
+        if sort is None:
+            if len(after) != 1:
+                raise ValueError('Invalid cursor')
+            return
+        
+        if len(after) != 3 or after[0] != sort:
+            raise ValueError('Invalid cursor')
+        sort_key, _ = FlatService._sort_spec(sort, q)
+        if after[1] is None and sort_key.nullable:
+            return
+        try:
+            value = sort_key.decode(after[1])
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValueError('Invalid cursor')
+        # Cursors only hold values of stored flats: integer columns fit 32
+        # bits and rents NUMERIC(10, 2)
+        if isinstance(value, int) and not -MAX_ID <= value <= MAX_ID:
+            raise ValueError('Invalid cursor')
+        if isinstance(value, Decimal) and not (value.is_finite() and abs(value) < RENT_LIMIT):
+            raise ValueError('Invalid cursor')
+    
+    @staticmethod
+    def _keyset_page(query, limit, after=None, sort=None, q=None, entities=True):
+        """
+        Fetch one page of a flat query in sort order.
+        
+        Seeks past the sort value and ID of the last row of the previous page
+        instead of using OFFSET, so every page costs the same regardless of
+        its depth.
+        
+        Args:
+            entities: True for a query of Flat objects, False for a query of
+                columns. Column rows end with the flat ID, then the sort
+                value when sorted.
+        
+        Returns:
+            Tuple of (list of Flat objects or rows, next page key or None)
+        
+        Raises:
+            ValueError: If after is not a key produced by this method
+        """
+        if after is not None:
+            FlatService._check_page_key(after, sort, q)
+        
+        if sort is None:
+            if after is not None:
+                query = query.filter(Flat.id > after[0])
+            rows = FlatService._apply_sort(query.add_columns(Flat.id), sort).limit(limit + 1).all()
+            items = [row[0] for row in rows] if entities else rows
+            if len(rows) > limit:
+                return items[:limit], (rows[limit - 1][-1],)
+            return items, None
+        
+        sort_key, descending = FlatService._sort_spec(sort, q)
+        if after is not None:
+            value, last_id = after[1], after[2]
+            expression = sort_key.expression
+            if value is None:
+                # The previous page ended among the flats without a value,
+                # which come last in ID order
+                query = query.filter(expression.is_(None), Flat.id < last_id if descending else Flat.id > last_id)
+            else:
+                value = sort_key.decode(value)
+                # Written as a range on the sort value plus a tie-break on the
+                # ID rather than a row-value comparison, so every database can
+                # seek the (value, id) index to the start of the page
+                if descending:
+                    seek = and_(expression <= value, or_(expression < value, Flat.id < last_id))
+                else:
+                    seek = and_(expression >= value, or_(expression > value, Flat.id > last_id))
+                query = query.filter(or_(seek, expression.is_(None)) if sort_key.nullable else seek)
+        
+        rows = FlatService._apply_sort(query.add_columns(Flat.id, sort_key.expression), sort, q).limit(limit + 1).all()
+        items = [row[0] for row in rows] if entities else rows
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            value = sort_key.encode(last[-1]) if last[-1] is not None else None
+            return items[:limit], (sort, value, last[-2])
+        return items, None
+    
+    @staticmethod
+    def get_flat_rows(limit=None, after=None, sort=None, fields=None, **filters):
+        """
+        Get serialized flats matching the filters straight from result rows.
+        
+        Selects plain columns and serializes them with the precompiled flat
+        row serializer, giving what Flat.to_dict(fields) would without
+        building Flat objects.
+        
+        Args:
+            limit: Page size, or None for the full list
+            after: Key of the last flat of the previous page (from the cursor)
+            sort: One of rent, area_sqft, floor, rent_per_sqft, created_at or
+                relevance, prefixed with - for descending order. Text searches
+                default to relevance. Flats without a value for the sort field
+                (such as a recorded area) come last. Pages are ordered by ID
+                when None.
+            fields: Tuple of Flat.FIELDS names, or None for all of them
+            filters: Search filters:
+                - tower_id, bedrooms: exact match
+                - min_rent, max_rent, min_area, max_area, min_floor,
+                  max_floor, min_bathrooms, max_bathrooms: inclusive bounds
+                - include_unavailable: If True, include unavailable flats
+                  (admin only)
+                - q: Free text matched against unit number, tower name and
+                  tower address; a phrase like "3 bed" filters on bedrooms
+        
+        Returns:
+            Tuple of (list of flat dicts, next page key or None)
+        
+        Raises:
+            ValueError: If sort or after is invalid
+        """
+        q = filters.get('q')
+        sort = FlatService._default_sort(sort, q)
+        serializer = flat_serializer(fields)
+        
+        query = db.session.query(*serializer.columns).select_from(Flat)
+        if 'tower_name' in serializer.keys:
+            query = query.outerjoin(Tower, Tower.id == Flat.tower_id)
+        query = FlatService._join_text_search(query.filter(*FlatService._search_filters(**filters)), q)
+        
+        if limit is None:
+            if sort is not None:
+                query = FlatService._apply_sort(query, sort, q)
+            return serializer(query.all()), None
+        
+        rows, next_key = FlatService._keyset_page(query, limit, after, sort, q, entities=False)
+        return serializer(rows), next_key
+    
+    @staticmethod
+    def search_flats(limit=None, after=None, sort=None, fields=None, **filters):
+        """
+        Get serialized flats matching the filters through the search cache.
+        
+        Results are cached per normalized filter, sort and page and dropped by
+        notify_flats_changed() whenever a write changes the matching flats.
+        Misses are answered from the columnar catalog when it is enabled and
+        from database rows (get_flat_rows) otherwise.
+        
+        Args:
+            limit: Page size, or None for the full list
+            after: Key of the last flat of the previous page (from the cursor)
+            sort: Sort order as in get_flat_rows
+            fields: Flat.FIELDS names to return, or None for all of them
+            filters: Search filters as in get_flat_rows
+        
+        Returns:
+            Tuple of (list of flat dicts, next page key or None)
+        
+        Raises:
+            ValueError: If sort or after is invalid
+        """
+        q = filters.get('q')
+        effective_sort = FlatService._default_sort(sort, q)
+        if effective_sort is not None:
+            FlatService._sort_spec(effective_sort, q)
+        if after is not None:
+            FlatService._check_page_key(after, effective_sort, q)
+        
+        # The tower comes first so notify_flats_changed() can match on it
+        key = (
+            filters.get('tower_id'),
+            tuple(sorted(
+                (name, float(value) if name.endswith('_rent') else value)
+                for name, value in filters.items()
+                if value is not None and name != 'tower_id'
+            )),
+            sort,
+            limit,
+            after,
+            fields
+        )
+        
+        def load():
+            catalog = get_flat_catalog()
+            if catalog is not None:
+                result = catalog.search(limit=limit, after=after, sort=sort, **filters)
+                if result is not None:
+                    rows, next_key = result
+                    if fields is not None:
+                        rows = [{name: row[name] for name in fields} for row in rows]
+                    return rows, next_key
+            
+            return FlatService.get_flat_rows(limit, after, sort, fields, **filters)
+        
+        return get_search_cache().get_or_load(key, load)
+    
+    @staticmethod
+    def notify_flats_changed(*tower_ids):
+        """
+        Record a committed change to flats of the given towers.
+        
+        Drops the cached searches that may include those flats (searches
+        without a tower filter span every tower and are always dropped),
+        and reloads those towers into the columnar catalog. Every write path
+        that changes flats must call this after its commit, and
+        bump_versions(FLATS) before it.
+        
+        Args:
+            tower_ids: IDs of the towers whose flats changed
+        """
+        affected = set(tower_ids)
+        get_search_cache().invalidate(lambda key: key[0] is None or key[0] in affected)
+        catalog = get_flat_catalog()
+        if catalog is not None:
+            catalog.patch(affected)
+    
+    @staticmethod
+    def _catalog_rows(tower_ids=None):
+        """
+        Load serialized flats for the columnar catalog.
+        
+        Args:
+            tower_ids: Set of tower IDs to load, or None for every flat
+        
+        Returns:
+            List of flat dicts, available or not
+        """
+        query = Flat.query.options(joinedload(Flat.tower))
+        if tower_ids is not None:
+            query = query.filter(Flat.tower_id.in_(tower_ids))
+        return [flat.to_dict() for flat in query]
+    
+    @staticmethod
+    def get_facets(rent_buckets=DEFAULT_RENT_BUCKETS, **filters):
+        """
+        Count the flats matching the filters per bedrooms, tower and rent bucket.
+        
+        All three facets come from one GROUP BY over (bedrooms, tower,
+        rent bucket) that returns plain tuples; no Flat objects are loaded.
         
-        return query.all()
+        Args:
+            rent_buckets: Ascending rent boundaries. N boundaries give N + 1
+                buckets: below the first, between each pair, and from the last up.
+            filters: Search filters as in get_flat_rows
+        
+        Returns:
+            Dict with the total count and the bedrooms, towers and rent facets
+        """
+        bucket = case(
+            *[(Flat.rent < bound, index) for index, bound in enumerate(rent_buckets)],
+            else_=len(rent_buckets)
+        ).label('rent_bucket')
+        
+        stmt = FlatService._join_text_search(
+            select(Flat.bedrooms, Flat.tower_id, Tower.name, bucket, func.count(Flat.id))
+            .join(Tower, Tower.id == Flat.tower_id),
+            filters.get('q')
+        )
+        rows = db.session.execute(
+            stmt.where(*FlatService._search_filters(**filters))
+            .group_by(Flat.bedrooms, Flat.tower_id, Tower.name, bucket)
+        ).all()
+        
+        bedroom_counts = {}
+        tower_counts = {}
+        bucket_counts = [0] * (len(rent_buckets) + 1)
+        for flat_bedrooms, flat_tower_id, tower_name, rent_bucket, count in rows:
+            bedroom_counts[flat_bedrooms] = bedroom_counts.get(flat_bedrooms, 0) + count
+            tower_entry = tower_counts.setdefault(flat_tower_id, {
+                'tower_id': flat_tower_id,
+                'tower_name': tower_name,
+                'count': 0
+            })
+            tower_entry['count'] += count
+            bucket_counts[rent_bucket] += count
+        
+        bounds = [None] + [float(bound) for bound in rent_buckets] + [None]
+        return {
+            'total': sum(bucket_counts),
+            'bedrooms': [
+                {'bedrooms': value, 'count': bedroom_counts[value]}
+                for value in sorted(bedroom_counts)
+            ],
+            'towers': [tower_counts[key] for key in sorted(tower_counts)],
+            'rent': [
+                {'min_rent': bounds[index], 'max_rent': bounds[index + 1], 'count': count}
+                for index, count in enumerate(bucket_counts)
+            ]
+        }
+    
+    @staticmethod
+    def get_flats_by_ids(ids, fields=None):
+        """
+        Get serialized flats for a list of IDs with one IN query.
+        
+        Like the flat detail endpoint, unavailable flats are included so
+        users can see flats they have booked.
+        
+        Args:
+            ids: Flat IDs in the order they should be returned
+            fields: Tuple of Flat.FIELDS names, or None for all of them
+        
+        Returns:
+            Tuple of (list of flat dicts in ids order, list of IDs not found)
+        """
+        serializer = flat_serializer(fields)
+        query = db.session.query(*serializer.columns).select_from(Flat)
+        if 'tower_name' in serializer.keys:
+            query = query.outerjoin(Tower, Tower.id == Flat.tower_id)
+        # The trailing ID orders the rows even when fields leaves out 'id'
+        rows = query.add_columns(Flat.id).filter(Flat.id.in_(ids)).all()
+        
+        rows, missing = order_by_ids(rows, ids, key=lambda row: row[-1])
+        return serializer(rows), missing
     
     @staticmethod
     def get_flat_by_id(flat_id, include_unavailable=False):
@@ -68,14 +630,56 @@ class FlatService:
         return flat
     
     @staticmethod
-    def get_all_flats():
+    def get_all_flats(fields=None):
         """
         Get all flats (admin only).
         
+        Args:
+            fields: Flat.FIELDS names to load, or None to load every column
+                and the tower
+        
         Returns:
             List of all Flat objects
         """
-        return Flat.query.all()
+        return Flat.query.options(*FlatService._load_options(fields)).all()
+    
+    @staticmethod
+    def iter_all_flats(batch_size=STREAM_BATCH_SIZE, fields=None):
+        """
+        Iterate over all flats (admin only) in ID order without loading them all.
+        
+        Rows are fetched batch_size at a time from a server-side cursor, with
+        the tower joined in the same query.
+        
+        Args:
+            batch_size: Rows per fetch
+            fields: Flat.FIELDS names to load, as in get_all_flats
+        
+        Returns:
+            Iterable of Flat objects
+        """
+        return db.session.execute(
+            select(Flat)
+            .options(*FlatService._load_options(fields))
+            .order_by(Flat.id)
+            .execution_options(yield_per=batch_size)
+        ).scalars()
+    
+    @staticmethod
+    def get_all_flats_page(limit, after=None, fields=None):
+        """
+        Get one page of all flats (admin only), ordered by ID.
+        
+        Args:
+            limit: Maximum number of flats to return
+            after: Key of the last flat of the previous page (from the cursor)
+            fields: Flat.FIELDS names to load, as in get_all_flats
+        
+        Returns:
+            Tuple of (list of Flat objects, next page key or None)
+        """
+        query = Flat.query.options(*FlatService._load_options(fields))
+        return FlatService._keyset_page(query, limit, after)
     
     @staticmethod
     def create_flat(tower_id, unit_number, floor, bedrooms, bathrooms, rent, area_sqft=None, is_available=True):
@@ -112,7 +716,9 @@ class FlatService:
                 is_available=is_available
             )
             db.session.add(flat)
+            bump_versions(FLATS)
             db.session.commit()
+            FlatService.notify_flats_changed(tower_id)
             return flat, None
         except IntegrityError:
             db.session.rollback()
@@ -121,6 +727,112 @@ class FlatService:
             db.session.rollback()
             return None, str(e)
     
+    @staticmethod
+    def import_flats(records, chunk_size=IMPORT_CHUNK_SIZE):
+        """
+        Insert or update flats from a stream of import records.
+        
+        Records are validated and upserted on (tower_id, unit_number)
+        chunk_size at a time, with one statement and one commit per chunk, so
+        at most one chunk is held in memory. An existing flat takes the
+        imported floor, rooms, area and rent but keeps its availability,
+        which bookings and leases own. Within a chunk the last record for a
+        unit wins.
+        
+        Args:
+            records: Iterable of (line number, record dict or None, parse
+                error or None), as from flat_import.iter_import_records()
+            chunk_size: Rows per upsert statement
+        
+        Returns:
+            Tuple of (report dict, error message or None). The report counts
+            the processed, imported, superseded (replaced by a later record
+            for the same unit in their chunk) and failed records, which add
+            up to processed, and lists the first MAX_IMPORT_ERRORS failures
+            as {'line', 'errors'}. On an error the chunks imported before it
+            stay committed.
+        """
+        report = {'processed': 0, 'imported': 0, 'superseded': 0, 'failed': 0, 'errors': []}
+        known_towers, missing_towers, changed_towers = set(), set(), set()
+        
+        def fail(line, errors):
+            report['failed'] += 1
+            if len(report['errors']) < MAX_IMPORT_ERRORS:
+                report['errors'].append({'line': line, 'errors': errors})
+        
+        def write(chunk):
+            unseen = {row['tower_id'] for _, row in chunk} - known_towers - missing_towers
+            if unseen:
+                found = set(db.session.execute(select(Tower.id).where(Tower.id.in_(unseen))).scalars())
+                known_towers.update(found)
+                missing_towers.update(unseen - found)
+            
+            rows = []
+            for line, row in chunk:
+                if row['tower_id'] in missing_towers:
+                    fail(line, {'tower_id': 'Tower not found'})
+                else:
+                    rows.append(row)
+            if rows:
+                db.session.execute(FlatService._upsert_statement(), rows)
+                bump_versions(FLATS)
+                db.session.commit()
+                report['imported'] += len(rows)
+                changed_towers.update(row['tower_id'] for row in rows)
+        
+        error = None
+        chunk = {}
+        try:
+            for line, record, parse_error in records:
+                report['processed'] += 1
+                if parse_error is not None:
+                    fail(line, {'row': parse_error})
+                    continue
+                row, errors = validate_flat_record(record)
+                if errors:
+                    fail(line, errors)
+                    continue
+                
+                key = (row['tower_id'], row['unit_number'])
+                if key in chunk:
+                    report['superseded'] += 1
+                chunk[key] = (line, row)
+                if len(chunk) >= chunk_size:
+                    write(chunk.values())
+                    chunk = {}
+            if chunk:
+                write(chunk.values())
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+        finally:
+            if changed_towers:
+                FlatService.notify_flats_changed(*changed_towers)
+        
+        report['errors_truncated'] = report['failed'] > len(report['errors'])
+        return report, error
+    
+    @staticmethod
+    def _upsert_statement():
+        """
+        Build an INSERT of flats rows that updates the flat already holding
+        the unit number in its tower (unique_unit_per_tower).
+        """
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            statement = postgresql.insert(Flat.__table__)
+            conflict = {'constraint': 'unique_unit_per_tower'}
+        elif dialect == 'sqlite':
+            statement = sqlite.insert(Flat.__table__)
+            conflict = {'index_elements': ['tower_id', 'unit_number']}
+        else:
+            raise NotImplementedError(f'Flat import is not supported on {dialect}')
+        
+        updated = ('floor', 'bedrooms', 'bathrooms', 'area_sqft', 'rent')
+        return statement.on_conflict_do_update(
+            set_={name: statement.excluded[name] for name in updated}, **conflict
+        )
+    
     @staticmethod
     def update_flat(flat_id, tower_id=None, unit_number=None, floor=None, bedrooms=None, 
                     bathrooms=None, rent=None, area_sqft=None, is_available=None):
@@ -152,6 +864,8 @@ class FlatService:
             if tower is None:
                 return None, "Tower not found"
         
+        previous_tower_id = flat.tower_id
+        
         try:
             if tower_id is not None:
                 flat.tower_id = tower_id
@@ -170,7 +884,9 @@ class FlatService:
             if is_available is not None:
                 flat.is_available = is_available
             
+            bump_versions(FLATS)
             db.session.commit()
+            FlatService.notify_flats_changed(previous_tower_id, flat.tower_id)
             return flat, None
         except IntegrityError:
             db.session.rollback()
@@ -179,6 +895,115 @@ class FlatService:
             db.session.rollback()
             return None, str(e)
     
+    @staticmethod
+    def adjust_rents(percent=None, amount=None, dry_run=False, tower_id=None, bedrooms=None,
+                     min_floor=None, max_floor=None, is_available=None):
+        """
+        Change the rent of every flat matching the filters with one UPDATE.
+        
+        Exactly one of percent and amount is applied. New rents are rounded
+        to cents and never go below zero; an adjustment taking any rent to
+        RENT_LIMIT or more is rejected without writing. The totals of a dry run come from
+        one aggregate query, and no flat is loaded as an object either way.
+        When applied, the totals describe exactly the rows the UPDATE wrote,
+        even with concurrent writes: on PostgreSQL the UPDATE returns the old
+        and new rent of each flat, elsewhere the totals are read under the
+        database write lock the UPDATE holds.
+        
+        Args:
+            percent: Percentage change, e.g. 3.5 or -10 (greater than -100)
+            amount: Absolute change added to each rent, e.g. 50 or -25
+            dry_run: If True, only compute the totals
+            tower_id: Only flats of this tower (optional)
+            bedrooms: Only flats with this many bedrooms (optional)
+            min_floor: Lowest floor (optional)
+            max_floor: Highest floor (optional)
+            is_available: Only available (True) or unavailable (False) flats
+                (optional, default all)
+        
+        Returns:
+            Tuple of (dict with matched, rent_before, rent_after and dry_run,
+            error message or None)
+        """
+        if (percent is None) == (amount is None):
+            return None, 'Exactly one of percent or amount is required'
+        
+        if percent is not None:
+            factor = literal(1 + Decimal(str(percent)) / 100, Numeric(12, 6))
+            new_rent = func.round(Flat.rent * factor, 2)
+        else:
+            new_rent = Flat.rent + literal(Decimal(str(amount)), Numeric(10, 2))
+        new_rent = case((new_rent < 0, literal(Decimal(0), Numeric(10, 2))), else_=new_rent)
+        
+        criteria = FlatService._search_filters(tower_id=tower_id, bedrooms=bedrooms, include_unavailable=True,
+                                               min_floor=min_floor, max_floor=max_floor)
+        if is_available is not None:
+            criteria.append(Flat.is_available == is_available)
+        
+        totals = select(func.count(Flat.id), func.coalesce(func.sum(Flat.rent), 0),
+                        func.coalesce(func.sum(new_rent), 0), func.max(new_rent)).where(*criteria)
+        too_high = f'New rents must be below {RENT_LIMIT}'
+        try:
+            if dry_run:
+                matched, before, after, highest = db.session.execute(totals).one()
+                db.session.rollback()
+                if highest is not None and highest >= RENT_LIMIT:
+                    return None, too_high
+                return FlatService._rent_summary(matched, before, after, dry_run), None
+            
+            if db.engine.dialect.name == 'postgresql':
+                # RETURNING only sees new values; a self-join exposes the old
+                # rent. A rent past NUMERIC(10, 2) fails the UPDATE itself.
+                old = aliased(Flat)
+                changed = db.session.execute(
+                    update(Flat).where(Flat.id == old.id, *criteria).values(rent=new_rent)
+                    .returning(Flat.tower_id, old.rent, Flat.rent).execution_options(synchronize_session=False)
+                ).all()
+                matched = len(changed)
+                before, after = sum(row[1] for row in changed), sum(row[2] for row in changed)
+                tower_ids = {row.tower_id for row in changed}
+                bump_versions(FLATS)
+            else:
+                # SQLite RETURNING cannot read a joined table. Any write takes
+                # the database write lock until commit, so bumping the version
+                # first keeps other writers out between the totals and the UPDATE.
+                bump_versions(FLATS)
+                matched, before, after, highest = db.session.execute(totals).one()
+                # SQLite does not enforce the column's precision
+                if highest is not None and highest >= RENT_LIMIT:
+                    db.session.rollback()
+                    return None, too_high
+                tower_ids = set(db.session.execute(
+                    update(Flat).where(*criteria).values(rent=new_rent)
+                    .returning(Flat.tower_id).execution_options(synchronize_session=False)
+                ).scalars())
+            
+            summary = FlatService._rent_summary(matched, before, after, dry_run)
+            if not matched:
+                db.session.rollback()
+                return summary, None
+            
+            db.session.commit()
+            FlatService.notify_flats_changed(*tower_ids)
+            return summary, None
+        except DataError:
+            # Numeric overflow on PostgreSQL
+            db.session.rollback()
+            return None, too_high
+        except Exception as e:
+            db.session.rollback()
+            return None, str(e)
+    
+    @staticmethod
+    def _rent_summary(matched, before, after, dry_run):
+        """Build the result of adjust_rents from the count and rent totals."""
+        return {
+            'matched': matched,
+            'rent_before': round(float(before), 2),
+            'rent_after': round(float(after), 2),
+            'dry_run': dry_run
+        }
+    
     @staticmethod
     def delete_flat(flat_id):
         """
@@ -195,9 +1020,13 @@ class FlatService:
         if flat is None:
             return False, "Flat not found"
         
+        tower_id = flat.tower_id
+        
         try:
             db.session.delete(flat)
+            bump_versions(FLATS)
             db.session.commit()
+            FlatService.notify_flats_changed(tower_id)
             return True, None
         except Exception as e:
             db.session.rollback()
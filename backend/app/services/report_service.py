@@ -1,6 +1,6 @@
 """Report service for generating admin reports."""
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import and_, func, select
 from ..models.tower import Tower
 from ..models.flat import Flat
 from ..models.booking import Booking, BookingStatus
@@ -8,9 +8,87 @@ from ..models.lease import Lease, LeaseStatus
 from .. import db
 
 
+# Cell codes of the tower occupancy grid
+GRID_LEGEND = {
+    'V': 'vacant',
+    'O': 'occupied',
+    'P': 'pending',
+    '-': 'no flat'
+}
+
+
 class ReportService:
     """Service class for generating reports."""
     
+    @staticmethod
+    def get_tower_grid(tower_id):
+        """
+        Get the occupancy of every flat of a tower as a floor-by-position grid.
+        
+        One aggregate query returns the tower dimensions and, per flat, its
+        floor, position on the floor and pending booking count. Flats are
+        placed on their floor in unit number order. A flat is occupied when
+        it is not available, pending when it is available with pending
+        bookings, and vacant otherwise. The grid grows past total_floors or
+        flats_per_floor if the tower holds flats outside them.
+        
+        Args:
+            tower_id: The ID of the tower
+        
+        Returns:
+            Dict with the grid dimensions, one code string per floor (rows,
+            lowest floor first), the flat IDs per cell and counts per state,
+            or None if the tower does not exist
+        """
+        position = func.row_number().over(partition_by=Flat.floor, order_by=(Flat.unit_number, Flat.id))
+        rows = db.session.execute(
+            select(
+                Tower.total_floors, Tower.flats_per_floor,
+                Flat.id, Flat.floor, Flat.is_available, func.count(Booking.id), position
+            )
+            .select_from(Tower)
+            .outerjoin(Flat, Flat.tower_id == Tower.id)
+            .outerjoin(Booking, and_(Booking.flat_id == Flat.id, Booking.status == BookingStatus.PENDING))
+            .where(Tower.id == tower_id)
+            .group_by(Tower.id, Tower.total_floors, Tower.flats_per_floor,
+                      Flat.id, Flat.floor, Flat.is_available, Flat.unit_number)
+        ).all()
+        
+        if not rows:
+            return None
+        
+        total_floors, flats_per_floor = rows[0][0], rows[0][1]
+        flats = [row[2:] for row in rows if row[2] is not None]
+        
+        first_floor = min([1] + [floor for _, floor, _, _, _ in flats])
+        last_floor = max([total_floors] + [floor for _, floor, _, _, _ in flats])
+        width = max([flats_per_floor] + [pos for _, _, _, _, pos in flats])
+        
+        codes = [['-'] * width for _ in range(first_floor, last_floor + 1)]
+        flat_ids = [[None] * width for _ in range(first_floor, last_floor + 1)]
+        counts = {'vacant': 0, 'occupied': 0, 'pending': 0}
+        for flat_id, floor, is_available, pending, pos in flats:
+            if not is_available:
+                code = 'O'
+            elif pending:
+                code = 'P'
+            else:
+                code = 'V'
+            codes[floor - first_floor][pos - 1] = code
+            flat_ids[floor - first_floor][pos - 1] = flat_id
+            counts[GRID_LEGEND[code]] += 1
+        
+        return {
+            'tower_id': tower_id,
+            'first_floor': first_floor,
+            'floors': last_floor - first_floor + 1,
+            'flats_per_floor': width,
+            'legend': GRID_LEGEND,
+            'rows': [''.join(row) for row in codes],
+            'flat_ids': flat_ids,
+            'counts': counts
+        }
+    
     @staticmethod
     def get_occupancy_report():
         """
@@ -1,8 +1,13 @@
 """Tenant service for handling tenant-related business logic."""
+from sqlalchemy import select
 from ..models.user import User
 from ..models.booking import Booking, BookingStatus
 from ..models.lease import Lease, LeaseStatus
 from ..models.flat import Flat
+from .flat_service import FlatService
+from ..etag import bump_versions, FLATS
+from .waitlist_service import WaitlistService
+from ..streaming import STREAM_BATCH_SIZE
 from .. import db
 
 
@@ -17,16 +22,32 @@ class TenantService:
         Returns:
             List of User objects with active leases
         """
-        # Query users who have at least one active lease
-        tenants = db.session.query(User).join(
+        return db.session.execute(TenantService._tenants_query()).scalars().all()
+    
+    @staticmethod
+    def iter_tenants(batch_size=STREAM_BATCH_SIZE):
+        """
+        Iterate over users with active leases without loading them all.
+        
+        Rows are fetched batch_size at a time from a server-side cursor.
+        
+        Returns:
+            Iterable of User objects, in ID order
+        """
+        return db.session.execute(
+            TenantService._tenants_query().order_by(User.id).execution_options(yield_per=batch_size)
+        ).scalars()
+    
+    @staticmethod
+    def _tenants_query():
+        """Select the users who have at least one active lease."""
+        return select(User).join(
             Booking, User.id == Booking.user_id
         ).join(
             Lease, Booking.id == Lease.booking_id
         ).filter(
             Lease.status == LeaseStatus.ACTIVE
-        ).distinct().all()
-        
-        return tenants
+        ).distinct()
     
     @staticmethod
     def get_tenant_by_id(user_id):
@@ -99,11 +120,15 @@ class TenantService:
         """
         Terminate an active lease and mark the flat as available.
         
+        If the flat has a waitlist, its head is promoted to a pending
+        booking in the same transaction.
+        
         Args:
             lease_id: The ID of the lease to terminate
         
         Returns:
-            Tuple of (Lease, error_message)
+            Tuple of (Lease, error_message). The lease's promoted_booking
+            attribute holds the Booking created from the waitlist, or None.
         """
         lease = db.session.get(Lease, lease_id)
         
@@ -116,12 +141,18 @@ class TenantService:
         # Update lease status
         lease.status = LeaseStatus.TERMINATED
         
-        # Mark flat as available
+        # Mark flat as available and hand it to the next user waiting for it
+        lease.promoted_booking = None
         booking = db.session.get(Booking, lease.booking_id)
         if booking and booking.flat:
+            # Flushed before the waitlist is read, locking the flat row
             booking.flat.is_available = True
+            lease.promoted_booking = WaitlistService.promote_next(booking.flat_id)
+            bump_versions(FLATS)
         
         db.session.commit()
+        if booking and booking.flat:
+            FlatService.notify_flats_changed(booking.flat.tower_id)
         
         return lease, None
     
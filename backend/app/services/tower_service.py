@@ -1,43 +1,91 @@
 """Tower service for handling tower-related business logic."""
+from decimal import Decimal
+from sqlalchemy import insert
+from sqlalchemy.orm import load_only, selectinload
 from ..models.tower import Tower
 from ..models.flat import Flat
 from ..models.amenity import Amenity
+from .flat_service import FlatService
+from ..etag import bump_versions, TOWERS, FLATS
+from ..batch import order_by_ids
 from .. import db
 
 
+# Most flats one tower creation request may generate from unit templates
+MAX_GRID_UNITS = 10000
+
+
 class TowerService:
     """Service class for tower operations."""
     
     @staticmethod
-    def get_all_towers(include_amenities=False):
+    def get_all_towers(include_amenities=False, fields=None):
         """
         Get all towers.
         
         Args:
-            include_amenities: If True, include amenity details
+            include_amenities: If True, load the amenities of all towers with
+                one extra query
+            fields: Tower.FIELDS names to load, or None to load every column.
+                With fields, the amenities are loaded when an amenity field is
+                named.
         
         Returns:
             List of Tower objects
         """
-        return Tower.query.all()
+        return Tower.query.options(*TowerService._load_options(fields, include_amenities)).all()
+    
+    @staticmethod
+    def get_towers_by_ids(ids, fields=None):
+        """
+        Get the towers for a list of IDs with one IN query.
+        
+        Args:
+            ids: Tower IDs in the order they should be returned
+            fields: Tower.FIELDS names to load, as in get_all_towers
+        
+        Returns:
+            Tuple of (list of Tower objects in ids order, list of IDs not found)
+        """
+        towers = Tower.query.options(*TowerService._load_options(fields)).filter(Tower.id.in_(ids)).all()
+        return order_by_ids(towers, ids)
+    
+    @staticmethod
+    def _load_options(fields=None, include_amenities=False):
+        """
+        Build the loader options for serializing towers with to_dict(fields).
+        
+        The amenities of every loaded tower come from a single SELECT ... IN
+        query, and only when they will be serialized.
+        """
+        options = []
+        if fields is not None:
+            columns = [getattr(Tower, name) for name in fields if name != 'id' and name not in Tower.AMENITY_FIELDS]
+            options.append(load_only(Tower.id, *columns))
+            include_amenities = any(name in Tower.AMENITY_FIELDS for name in fields)
+        
+        if include_amenities:
+            options.append(selectinload(Tower.amenities))
+        return options
     
     @staticmethod
-    def get_tower_by_id(tower_id):
+    def get_tower_by_id(tower_id, include_amenities=False):
         """
         Get a tower by its ID.
         
         Args:
             tower_id: The ID of the tower
+            include_amenities: If True, load the amenities in the same call
         
         Returns:
             Tower object or None if not found
         """
-        return Tower.query.get(tower_id)
+        return db.session.get(Tower, tower_id, options=TowerService._load_options(include_amenities=include_amenities))
     
     @staticmethod
-    def create_tower(name, address, total_floors, flats_per_floor=4, amenity_ids=None):
+    def create_tower(name, address, total_floors, flats_per_floor=4, amenity_ids=None, units=None):
         """
-        Create a new tower.
+        Create a new tower, optionally with all of its flats.
         
         Args:
             name: Tower name
@@ -45,6 +93,9 @@ class TowerService:
             total_floors: Total number of floors
             flats_per_floor: Number of flats per floor (default 4)
             amenity_ids: List of amenity IDs to assign to the tower
+            units: List of flats_per_floor unit templates, one per position on
+                a floor, to create every flat of the tower (optional). See
+                flat_grid() for the template keys.
         
         Returns:
             Tuple of (Tower object, error message or None)
@@ -63,12 +114,71 @@ class TowerService:
                 tower.amenities = amenities
             
             db.session.add(tower)
+            if units:
+                # The flats need the tower ID. A Core insert sends them all as
+                # one executemany (ORM bulk inserts split batches on NULLs).
+                db.session.flush()
+                db.session.execute(insert(Flat.__table__), TowerService.flat_grid(tower.id, total_floors, units))
+            if units:
+                bump_versions(TOWERS, FLATS)
+            else:
+                bump_versions(TOWERS)
             db.session.commit()
+            if units:
+                FlatService.notify_flats_changed(tower.id)
             return tower, None
         except Exception as e:
             db.session.rollback()
             return None, str(e)
     
+    @staticmethod
+    def unit_number(floor, position, flats_per_floor):
+        """
+        Return the unit number of a flat: the floor then its position (e.g. 1203).
+        
+        The position has 2 digits, or as many as flats_per_floor needs, so
+        unit numbers stay unique within the tower: with 120 flats per floor,
+        floor 1 position 101 is 1101 only if floor 11 position 1 is 11001.
+        """
+        return f'{floor}{position:0{max(2, len(str(flats_per_floor)))}d}'
+    
+    @staticmethod
+    def flat_grid(tower_id, total_floors, units):
+        """
+        Generate the flat rows of a tower from per-position unit templates.
+        
+        Each template describes the flat at that position (starting at 1) on
+        every floor from 1 to total_floors:
+            - bedrooms, bathrooms, rent: required
+            - area_sqft: optional
+            - rent_increment: optional amount added to the rent per floor
+              above the first
+        
+        Args:
+            tower_id: ID of the tower
+            total_floors: Number of floors
+            units: List of unit templates, one per position on a floor
+        
+        Returns:
+            List of Flat column dicts, floor by floor
+        """
+        rows = []
+        flats_per_floor = len(units)
+        for floor in range(1, total_floors + 1):
+            for position, unit in enumerate(units, start=1):
+                rent = Decimal(str(unit['rent'])) + Decimal(str(unit.get('rent_increment') or 0)) * (floor - 1)
+                rows.append({
+                    'tower_id': tower_id,
+                    'unit_number': TowerService.unit_number(floor, position, flats_per_floor),
+                    'floor': floor,
+                    'bedrooms': unit['bedrooms'],
+                    'bathrooms': unit['bathrooms'],
+                    'rent': rent,
+                    'area_sqft': unit.get('area_sqft'),
+                    'is_available': True
+                })
+        return rows
+    
     @staticmethod
     def update_tower(tower_id, name=None, address=None, total_floors=None, flats_per_floor=None, amenity_ids=None):
         """
@@ -90,6 +200,11 @@ class TowerService:
         if tower is None:
             return None, "Tower not found"
         
+        # Flat listings embed the tower name, and flat text search matches
+        # the tower name and address
+        flats_changed = (name is not None and name != tower.name) or (
+            address is not None and address != tower.address)
+        
         try:
             if name is not None:
                 tower.name = name
@@ -103,7 +218,13 @@ class TowerService:
                 amenities = Amenity.query.filter(Amenity.id.in_(amenity_ids)).all()
                 tower.amenities = amenities
             
+            if flats_changed:
+                bump_versions(TOWERS, FLATS)
+            else:
+                bump_versions(TOWERS)
             db.session.commit()
+            if flats_changed:
+                FlatService.notify_flats_changed(tower_id)
             return tower, None
         except Exception as e:
             db.session.rollback()
@@ -132,6 +253,7 @@ class TowerService:
         
         try:
             db.session.delete(tower)
+            bump_versions(TOWERS)
             db.session.commit()
             return True, None
         except Exception as e:
@@ -0,0 +1,216 @@
+"""Waitlist service for queuing users for flats that are not available."""
+from datetime import datetime, date
+from sqlalchemy import delete, func, insert, literal, select
+from ..models.booking import Booking, BookingStatus
+from ..models.flat import Flat
+from ..models.lease import Lease, LeaseStatus
+from ..models.waitlist import WaitlistEntry
+from .. import db
+
+
+class WaitlistService:
+    """Service class for waitlist operations."""
+    
+    @staticmethod
+    def join_waitlist(user_id, flat_id, requested_date):
+        """
+        Add a user to the end of the waitlist of an unavailable flat.
+        
+        Args:
+            user_id: The ID of the user joining
+            flat_id: The ID of the flat
+            requested_date: The requested move-in date
+        
+        Returns:
+            Tuple of (WaitlistEntry, error_message)
+        """
+        user_id = int(user_id)
+        
+        if isinstance(requested_date, str):
+            try:
+                requested_date = datetime.strptime(requested_date, '%Y-%m-%d').date()
+            except ValueError:
+                return None, 'Invalid date format. Use YYYY-MM-DD'
+        
+        # Lock the flat row: approvals claim it before queuing their declined
+        # bookings, so joins and queuing take positions one at a time
+        flat = db.session.get(Flat, flat_id, with_for_update=True)
+        if flat is None:
+            db.session.rollback()
+            return None, 'Flat not found'
+        
+        if flat.is_available:
+            db.session.rollback()
+            return None, 'Flat is available for booking'
+        
+        error = WaitlistService._join_conflict(user_id, flat_id)
+        if error:
+            db.session.rollback()
+            return None, error
+        
+        # The next position is read off the (flat_id, position) index
+        next_position = select(
+            func.coalesce(func.max(WaitlistEntry.position), 0) + 1
+        ).where(WaitlistEntry.flat_id == flat_id).scalar_subquery()
+        entry = WaitlistEntry(
+            flat_id=flat_id,
+            user_id=user_id,
+            position=next_position,
+            requested_date=requested_date
+        )
+        db.session.add(entry)
+        db.session.commit()
+        return entry, None
+    
+    @staticmethod
+    def _join_conflict(user_id, flat_id):
+        """
+        Check whether the user already leases, has booked or waits for the flat.
+        
+        Returns:
+            Error message, or None if the user may join the waitlist
+        """
+        leasing = select(Lease.id).join(Booking, Lease.booking_id == Booking.id).where(
+            Booking.flat_id == flat_id,
+            Booking.user_id == user_id,
+            Lease.status == LeaseStatus.ACTIVE
+        ).exists()
+        pending = select(Booking.id).where(
+            Booking.flat_id == flat_id,
+            Booking.user_id == user_id,
+            Booking.status == BookingStatus.PENDING
+        ).exists()
+        waiting = select(WaitlistEntry.id).where(
+            WaitlistEntry.flat_id == flat_id,
+            WaitlistEntry.user_id == user_id
+        ).exists()
+        row = db.session.execute(select(leasing, pending, waiting)).one()
+        if row[0]:
+            return 'You already lease this flat'
+        if row[1]:
+            return 'You already have a pending booking for this flat'
+        if row[2]:
+            return 'You are already on the waitlist for this flat'
+        return None
+    
+    @staticmethod
+    def get_position(user_id, flat_id):
+        """
+        Get a user's place in the waitlist of a flat.
+        
+        One COUNT over the flat's range of the (flat_id, position) index,
+        up to the user's entry.
+        
+        Args:
+            user_id: The ID of the user
+            flat_id: The ID of the flat
+        
+        Returns:
+            1-based place in the queue (1 is promoted next), or None if the
+            user is not on the waitlist
+        """
+        mine = select(WaitlistEntry.position).where(
+            WaitlistEntry.flat_id == flat_id,
+            WaitlistEntry.user_id == int(user_id)
+        ).scalar_subquery()
+        place = db.session.execute(
+            select(func.count()).select_from(WaitlistEntry).where(
+                WaitlistEntry.flat_id == flat_id,
+                WaitlistEntry.position <= mine
+            )
+        ).scalar()
+        return place or None
+    
+    @staticmethod
+    def leave_waitlist(user_id, flat_id):
+        """
+        Remove a user from the waitlist of a flat.
+        
+        Returns:
+            True if the user was on the waitlist
+        """
+        result = db.session.execute(
+            delete(WaitlistEntry).where(
+                WaitlistEntry.flat_id == flat_id,
+                WaitlistEntry.user_id == int(user_id)
+            )
+        )
+        db.session.commit()
+        return result.rowcount > 0
+    
+    @staticmethod
+    def queue_bookings(*criteria):
+        """
+        Append the users of the pending bookings matching criteria to the
+        waitlists of their flats, in the order they booked.
+        
+        One INSERT .. SELECT numbers the bookings of each flat after its
+        current last position. Runs in the caller's transaction, which must
+        hold the row lock of every flat involved (as the UPDATE claiming a
+        flat for approval does), so concurrent joins cannot take the same
+        positions. Users already waiting for a flat keep their place.
+        
+        Args:
+            criteria: SQL criteria on Booking selecting the bookings to queue
+        """
+        last_position = select(func.coalesce(func.max(WaitlistEntry.position), 0)).where(
+            WaitlistEntry.flat_id == Booking.flat_id
+        ).scalar_subquery()
+        already_waiting = select(WaitlistEntry.id).where(
+            WaitlistEntry.flat_id == Booking.flat_id,
+            WaitlistEntry.user_id == Booking.user_id
+        ).exists()
+        db.session.execute(insert(WaitlistEntry).from_select(
+            ['flat_id', 'user_id', 'requested_date', 'position', 'created_at'],
+            select(
+                Booking.flat_id, Booking.user_id, Booking.requested_date,
+                last_position + func.row_number().over(
+                    partition_by=Booking.flat_id, order_by=(Booking.created_at, Booking.id)
+                ),
+                literal(datetime.utcnow(), WaitlistEntry.created_at.type)
+            ).where(*criteria, ~already_waiting)
+        ))
+    
+    @staticmethod
+    def promote_next(flat_id):
+        """
+        Turn the head of a flat's waitlist into a pending booking.
+        
+        Runs in the caller's transaction, which must commit it and hold the
+        flat's row lock (as marking it available does): one DELETE ..
+        RETURNING pops the lowest position and one INSERT creates the
+        booking, whatever the queue length. Users who already hold a pending
+        booking for the flat are passed over and keep their place; while the
+        flat is locked no other pending booking for it can be created. The
+        move-in date is the one requested when joining, or today if that has
+        passed.
+        
+        Args:
+            flat_id: The ID of the flat that became available
+        
+        Returns:
+            The new Booking, or None if nobody on the waitlist can be promoted
+        """
+        has_pending = select(Booking.id).where(
+            Booking.flat_id == flat_id,
+            Booking.user_id == WaitlistEntry.user_id,
+            Booking.status == BookingStatus.PENDING
+        ).exists()
+        head = select(WaitlistEntry.id).where(
+            WaitlistEntry.flat_id == flat_id, ~has_pending
+        ).order_by(WaitlistEntry.position).limit(1).scalar_subquery()
+        promoted = db.session.execute(
+            delete(WaitlistEntry).where(WaitlistEntry.id == head)
+            .returning(WaitlistEntry.user_id, WaitlistEntry.requested_date)
+        ).first()
+        if promoted is None:
+            return None
+        
+        booking = Booking(
+            user_id=promoted.user_id,
+            flat_id=flat_id,
+            requested_date=max(promoted.requested_date, date.today()),
+            status=BookingStatus.PENDING
+        )
+        db.session.add(booking)
+        return booking
@@ -0,0 +1,164 @@
+"""Helpers for streaming large JSON list and CSV export responses."""
+import csv
+import enum
+import io
+import zlib
+from datetime import date
+from flask import current_app, stream_with_context
+
+
+# Rows fetched per round trip from the server-side cursor, and serialized
+# items per chunk written to the response
+STREAM_BATCH_SIZE = 500
+
+
+def wants_stream(args):
+    """
+    Check whether a list request asked for a streamed response.
+
+    Args:
+        args: The request query arguments
+
+    Returns:
+        True if the stream parameter is 1, true or yes
+    """
+    return args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def iter_json_array(items, serialize, batch_size=STREAM_BATCH_SIZE):
+    """
+    Serialize items as a JSON array, one chunk of batch_size items at a time.
+
+    Args:
+        items: Iterable of objects, typically a query with yield_per
+        serialize: Callable turning an item into a JSON-serializable value
+
+    Yields:
+        Strings that concatenate to the JSON array
+    """
+    dumps = current_app.json.dumps
+    separator = ''
+    batch = []
+
+    yield '['
+    for item in items:
+        batch.append(dumps(serialize(item)))
+        if len(batch) >= batch_size:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield ']'
+
+
+def stream_json_array(items, serialize, batch_size=STREAM_BATCH_SIZE):
+    """
+    Build a 200 response that streams items as a JSON array.
+
+    Only one batch of rows and serialized items is held in memory at a time,
+    so the response size does not bound the memory used. The request
+    context (and its database session) stays open until the last chunk is
+    written. Errors raised while streaming cannot change the status code
+    any more and end the response early.
+
+    Args:
+        items: Iterable of objects, typically a query with yield_per
+        serialize: Callable turning an item into a JSON-serializable value
+
+    Returns:
+        Streamed Flask response with mimetype application/json
+    """
+    return current_app.response_class(
+        stream_with_context(iter_json_array(items, serialize, batch_size)),
+        mimetype='application/json'
+    )
+
+
+# Leading characters that make spreadsheet applications evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    """
+    Format a column value as a CSV cell: enums by value, dates as ISO 8601, NULL as empty.
+
+    Strings that a spreadsheet would read as a formula (user-supplied names
+    and emails among them) are prefixed with a quote so they stay text.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(columns, rows, batch_size=STREAM_BATCH_SIZE):
+    """
+    Write rows as CSV with a header line, one chunk of batch_size rows at a time.
+
+    Args:
+        columns: Header names
+        rows: Iterable of row tuples, typically a result with yield_per
+
+    Yields:
+        Strings that concatenate to the CSV document
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """
+    Compress string chunks into a gzip stream as they are produced.
+
+    Yields:
+        Bytes that concatenate to the gzip file of the UTF-8 encoded chunks
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_csv(columns, rows, filename, gzip=False, batch_size=STREAM_BATCH_SIZE):
+    """
+    Build a 200 response that streams rows as a CSV file download.
+
+    Like stream_json_array(), only one batch of rows is held in memory.
+
+    Args:
+        columns: Header names
+        rows: Iterable of row tuples, typically a result with yield_per
+        filename: File name suggested to the client
+        gzip: If True, compress the body on the fly (Content-Encoding: gzip)
+
+    Returns:
+        Streamed Flask response with mimetype text/csv
+    """
+    chunks = iter_csv(columns, rows, batch_size)
+    response = current_app.response_class(
+        stream_with_context(gzip_chunks(chunks) if gzip else chunks),
+        mimetype='text/csv'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.vary.add('Accept-Encoding')
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
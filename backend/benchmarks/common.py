@@ -0,0 +1,127 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks create their own tables and drop them when they finish, so
+always point them at a scratch database, never at a real one.
+"""
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def create_benchmark_app(database_url=None):
+    """
+    Create an app bound to the benchmark database.
+
+    Args:
+        database_url: SQLAlchemy URL of a scratch database. Defaults to a
+            temporary SQLite file.
+
+    Returns:
+        Tuple of (Flask app, database URL)
+    """
+    if database_url is None:
+        handle, path = tempfile.mkstemp(suffix='.db', prefix='bench_')
+        os.close(handle)
+        database_url = f'sqlite:///{path}'
+
+    # Config reads DATABASE_URL at import time, so set it before importing the app
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+
+    return create_app('production'), database_url
+
+
+def seed_catalog(flat_count, tower_count=50, available_ratio=0.7, seed=42):
+    """
+    Bulk insert towers and flats for a benchmark run.
+
+    Must be called inside an app context. Flats are spread evenly across
+    towers with a deterministic mix of bedrooms, areas and rents.
+
+    Args:
+        flat_count: Number of flats to create
+        tower_count: Number of towers to spread them over
+        available_ratio: Fraction of flats marked available
+        seed: Random seed so runs are comparable
+    """
+    import random
+    from sqlalchemy import insert
+    from app import db
+    from app.models import Tower, Flat
+
+    rng = random.Random(seed)
+    flats_per_tower = max(1, flat_count // tower_count)
+    floors = max(1, flats_per_tower // 8)
+
+    db.session.execute(insert(Tower), [
+        {
+            'name': f'Benchmark Tower {t + 1}',
+            'address': f'{t + 1} Benchmark Avenue',
+            'total_floors': floors,
+            'flats_per_floor': 8
+        }
+        for t in range(tower_count)
+    ])
+    tower_ids = [row[0] for row in db.session.execute(db.select(Tower.id).order_by(Tower.id))]
+
+    rows = []
+    for i in range(flat_count):
+        tower_index, position = divmod(i, flats_per_tower)
+        floor, unit = divmod(position, 8)
+        bedrooms = rng.choice((1, 1, 2, 2, 2, 3, 3, 4))
+        area = 450 + bedrooms * 300 + rng.randint(0, 250)
+        rows.append({
+            'tower_id': tower_ids[min(tower_index, tower_count - 1)],
+            'unit_number': f'{floor + 1}{str(unit + 1).zfill(2)}-{i}',
+            'floor': floor + 1,
+            'bedrooms': bedrooms,
+            'bathrooms': max(1, bedrooms - rng.randint(0, 1)),
+            'area_sqft': area,
+            'rent': round(area * rng.uniform(1.4, 2.6), 2),
+            'is_available': rng.random() < available_ratio
+        })
+        if len(rows) == 5000:
+            db.session.execute(insert(Flat), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Flat), rows)
+    db.session.commit()
+    return tower_ids
+
+
+def time_call(fn, repeat):
+    """
+    Time repeated calls of fn.
+
+    Returns:
+        Dict with median and p95 latency in milliseconds
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'median_ms': samples[len(samples) // 2],
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    }
+
+
+def print_table(title, rows, columns):
+    """Print benchmark results as an aligned text table."""
+    print(f'\n{title}')
+    widths = [max(len(str(c)), *(len(_fmt(r[c])) for r in rows)) for c in columns]
+    print('  '.join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(_fmt(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _fmt(value):
+    return f'{value:.2f}' if isinstance(value, float) else str(value)
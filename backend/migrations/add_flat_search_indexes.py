@@ -0,0 +1,40 @@
+"""
+Database migration script to add the flat search indexes.
+Run this script to index the filters and sort orders used by flat search on
+existing databases. It is safe to re-run after new indexes are declared.
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import create_app, db
+from app.models import Flat
+
+
+# Indexes replaced by a declared one with more columns
+OBSOLETE_INDEXES = ('ix_flats_available_rent',)
+
+
+def add_flat_search_indexes():
+    """Create the indexes declared on the flats table that do not exist yet."""
+    app = create_app()
+    with app.app_context():
+        for name in OBSOLETE_INDEXES:
+            with db.engine.begin() as connection:
+                connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+            print(f"Index '{name}' is dropped from flats table.")
+        for index in sorted(Flat.__table__.indexes, key=lambda i: i.name):
+            try:
+                # checkfirst skips indexes that already exist, so the script can be re-run
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"Index '{index.name}' is in place on flats table.")
+            except Exception as e:
+                print(f"Error creating index '{index.name}': {e}")
+
+
+if __name__ == '__main__':
+    add_flat_search_indexes()
@@ -0,0 +1,31 @@
+"""
+Database migration script to add the flat full-text search index.
+Run this script to create the search index and the triggers keeping it in
+sync on existing databases, and to index the flats already stored.
+It is safe to re-run.
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.flat_search import create_search_index
+
+
+def add_flat_text_search():
+    """Create the flat search index, its triggers and backfill existing flats."""
+    app = create_app()
+    with app.app_context():
+        try:
+            create_search_index(db.session.connection())
+            db.session.commit()
+            print("Flat text search index is in place.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating flat text search index: {e}")
+
+
+if __name__ == '__main__':
+    add_flat_text_search()
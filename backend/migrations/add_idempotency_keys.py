@@ -0,0 +1,47 @@
+"""
+Database migration script to create the idempotency_keys table and add
+its locked_until column to tables created before it existed.
+Run this script to add Idempotency-Key support to existing databases. Safe to re-run.
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import IdempotencyKey
+from sqlalchemy import inspect, text
+
+
+def add_idempotency_keys_table():
+    """Create the idempotency_keys table if it does not exist, and its locked_until column."""
+    app = create_app()
+    with app.app_context():
+        try:
+            # checkfirst skips the table if it already exists
+            IdempotencyKey.__table__.create(bind=db.engine, checkfirst=True)
+            print("Table 'idempotency_keys' is in place.")
+        except Exception as e:
+            print(f"Error creating table 'idempotency_keys': {e}")
+            return
+        
+        columns = {column['name'] for column in inspect(db.engine).get_columns('idempotency_keys')}
+        if 'locked_until' in columns:
+            print("Column 'locked_until' already exists in idempotency_keys table.")
+            return
+        try:
+            db.session.execute(text("ALTER TABLE idempotency_keys ADD COLUMN locked_until TIMESTAMP"))
+            # Requests still marked in progress may be retried right away
+            db.session.execute(text("""
+                UPDATE idempotency_keys SET locked_until = created_at WHERE status_code IS NULL
+            """))
+            db.session.commit()
+            print("Column 'locked_until' added successfully to idempotency_keys table!")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error adding column: {e}")
+
+
+if __name__ == '__main__':
+    add_idempotency_keys_table()
@@ -0,0 +1,42 @@
+"""
+Database migration script to add the unique index on pending bookings.
+Run this script on existing databases so a user can hold only one pending
+booking per flat. Duplicates left by earlier races are declined first, keeping
+the newest pending booking of each user and flat. Safe to re-run.
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Booking
+from sqlalchemy import text
+
+
+def add_pending_booking_unique_index():
+    """Decline duplicate pending bookings, then create the partial unique index."""
+    app = create_app()
+    with app.app_context():
+        try:
+            result = db.session.execute(text("""
+                UPDATE bookings SET status = 'DECLINED'
+                WHERE status = 'PENDING' AND id NOT IN (
+                    SELECT MAX(id) FROM bookings WHERE status = 'PENDING' GROUP BY user_id, flat_id
+                )
+            """))
+            db.session.commit()
+            print(f"Declined {result.rowcount} duplicate pending booking(s).")
+            
+            for index in Booking.__table__.indexes:
+                # checkfirst skips an index that already exists
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"Index '{index.name}' is in place on bookings table.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error adding index: {e}")
+
+
+if __name__ == '__main__':
+    add_pending_booking_unique_index()
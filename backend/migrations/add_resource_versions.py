@@ -0,0 +1,28 @@
+"""
+Database migration script to create the resource_versions table.
+Run this script to share ETag versions across instances on existing databases. Safe to re-run.
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import ResourceVersion
+
+
+def add_resource_versions_table():
+    """Create the resource_versions table if it does not exist."""
+    app = create_app()
+    with app.app_context():
+        try:
+            # checkfirst skips the table if it already exists
+            ResourceVersion.__table__.create(bind=db.engine, checkfirst=True)
+            print("Table 'resource_versions' is in place.")
+        except Exception as e:
+            print(f"Error creating table 'resource_versions': {e}")
+
+
+if __name__ == '__main__':
+    add_resource_versions_table()
@@ -0,0 +1,28 @@
+"""
+Database migration script to create the waitlist_entries table.
+Run this script to add flat waitlists to existing databases. Safe to re-run.
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import WaitlistEntry
+
+
+def add_waitlist_table():
+    """Create the waitlist_entries table if it does not exist."""
+    app = create_app()
+    with app.app_context():
+        try:
+            # checkfirst skips the table if it already exists
+            WaitlistEntry.__table__.create(bind=db.engine, checkfirst=True)
+            print("Table 'waitlist_entries' is in place.")
+        except Exception as e:
+            print(f"Error creating table 'waitlist_entries': {e}")
+
+
+if __name__ == '__main__':
+    add_waitlist_table()
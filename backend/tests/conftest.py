@@ -1,5 +1,6 @@
 """Pytest configuration and fixtures."""
 import pytest
+from sqlalchemy import event
 from app import create_app, db
 
 
@@ -25,3 +26,28 @@ def client(app):
 def runner(app):
     """Create test CLI runner."""
     return app.test_cli_runner()
+
+
+@pytest.fixture
+def query_counter(app):
+    """
+    Record the SQL statements executed against the test database.
+    
+    The ETag version lookup that precedes every catalog GET is not recorded,
+    so counts reflect the work of the endpoint itself.
+    
+    Usage:
+        query_counter.clear()
+        client.get('/api/flats')
+        assert len(query_counter) == 1
+    """
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith('SELECT resource_versions.'):
+            statements.append(statement)
+    
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
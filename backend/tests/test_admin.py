@@ -0,0 +1,491 @@
+"""Tests for admin list endpoints."""
+import csv
+import gzip
+import io
+import json
+import pytest
+from sqlalchemy.exc import OperationalError
+from app.models import Flat, User
+from app import db
+from app.streaming import iter_json_array
+from app.flat_import import iter_import_records
+from app.services.flat_service import FlatService
+from app.services.waitlist_service import WaitlistService
+from tests.test_flats import create_test_flats, get_admin_token
+from tests.test_bookings import register_and_get_token
+from tests.test_catalog import create_towers_with_amenities
+
+
+def create_bookings_with_lease(client, app):
+    """Helper to book two flats as a user and approve one of them."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    admin_token = get_admin_token(app)
+    user_token = register_and_get_token(client)
+    with app.app_context():
+        flat_ids = [flat.id for flat in Flat.query.order_by(Flat.id).limit(2)]
+    
+    booking_ids = []
+    for flat_id in flat_ids:
+        response = client.post('/api/bookings',
+            data=json.dumps({'flat_id': flat_id, 'requested_date': '2025-02-01'}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {user_token}'}
+        )
+        booking_ids.append(json.loads(response.data)['id'])
+    
+    client.put(f'/api/admin/bookings/{booking_ids[0]}/approve',
+               headers={'Authorization': f'Bearer {admin_token}'})
+    return admin_token
+
+
+@pytest.mark.parametrize('path', ['/api/admin/flats', '/api/admin/bookings', '/api/admin/tenants'])
+def test_admin_list_streaming_matches_buffered(client, app, path):
+    """Test that stream=true returns the same JSON as the buffered response."""
+    admin_token = create_bookings_with_lease(client, app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    
+    buffered = client.get(path, headers=headers)
+    streamed = client.get(f'{path}?stream=true', headers=headers)
+    
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.mimetype == 'application/json'
+    expected = json.loads(buffered.data)
+    assert expected
+    assert sorted(json.loads(streamed.data), key=lambda item: item['id']) == \
+        sorted(expected, key=lambda item: item['id'])
+
+
+def test_iter_json_array_chunks(app):
+    """Test that items are written in batches that join into a JSON array."""
+    with app.app_context():
+        chunks = list(iter_json_array(range(5), lambda n: {'n': n}, batch_size=2))
+        empty = ''.join(iter_json_array([], lambda n: n))
+    
+    assert len(chunks) == 5
+    assert json.loads(''.join(chunks)) == [{'n': n} for n in range(5)]
+    assert json.loads(empty) == []
+
+
+def test_tower_lists_sparse_fields(client, app, query_counter):
+    """Test fields= on the tower lists, loading amenities only when asked."""
+    create_test_flats(app, tower_count=2, flats_per_tower=1)
+    admin_token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/towers?fields=id,name').data)
+    
+    assert data == [{'id': 1, 'name': 'Tower 1'}, {'id': 2, 'name': 'Tower 2'}]
+    assert len(query_counter) == 1
+    
+    data = json.loads(client.get('/api/admin/towers?fields=name,amenity_ids', headers=headers).data)
+    
+    assert data == [{'name': 'Tower 1', 'amenity_ids': []}, {'name': 'Tower 2', 'amenity_ids': []}]
+    assert client.get('/api/towers?fields=amenities').status_code == 400
+
+
+def test_batch_fetch_towers_and_bookings(client, app, query_counter):
+    """Test ids= on the tower and admin booking lists."""
+    admin_token = create_bookings_with_lease(client, app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    
+    data = json.loads(client.get('/api/towers?ids=2,7,1&fields=name').data)
+    
+    assert data == {'items': [{'name': 'Tower 2'}, {'name': 'Tower 1'}], 'missing': [7]}
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/admin/bookings?ids=2,3,1', headers=headers).data)
+    
+    assert [booking['id'] for booking in data['items']] == [2, 1]
+    assert data['items'][0]['flat']['tower_name'] == 'Tower 1'
+    assert data['missing'] == [3]
+    # One query loads the bookings with their flats and towers
+    assert len(query_counter) == 1
+
+
+def test_admin_towers_query_count_is_constant(client, app, query_counter):
+    """Test that the admin tower list loads every tower's amenities in one query."""
+    admin_token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    create_towers_with_amenities(app, tower_count=5)
+    db.session.expunge_all()
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/admin/towers', headers=headers).data)
+    
+    assert len(data) == 5
+    assert all(tower['amenity_ids'] == [1, 2] for tower in data)
+    assert len(query_counter) == 2
+    
+    query_counter.clear()
+    client.get('/api/admin/towers?fields=id,name', headers=headers)
+    
+    assert len(query_counter) == 1
+
+
+def test_tower_grid(client, app, query_counter):
+    """Test the occupancy grid marks vacant, occupied, pending and empty cells in one query."""
+    admin_token = create_bookings_with_lease(client, app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    
+    query_counter.clear()
+    response = client.get('/api/admin/towers/1/grid', headers=headers)
+    
+    assert response.status_code == 200
+    grid = json.loads(response.data)
+    # Tower 1 has 10 floors of 4 and flats 101 (leased), 201 (pending) and 301
+    assert grid['floors'] == 10
+    assert grid['flats_per_floor'] == 4
+    assert grid['rows'][:4] == ['O---', 'P---', 'V---', '----']
+    assert grid['flat_ids'][1][0] == 2
+    assert grid['counts'] == {'vacant': 1, 'occupied': 1, 'pending': 1}
+    assert len(query_counter) == 1
+    assert client.get('/api/admin/towers/99/grid', headers=headers).status_code == 404
+
+
+def test_create_tower_with_units_provisions_every_flat(client, app, query_counter):
+    """Test that unit templates create the full flat grid with one insert statement."""
+    admin_token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    units = [
+        {'bedrooms': 2, 'bathrooms': 2, 'rent': 1500, 'area_sqft': 900, 'rent_increment': 25},
+        {'bedrooms': 1, 'bathrooms': 1, 'rent': 1000.5}
+    ] * 4
+    
+    query_counter.clear()
+    response = client.post('/api/admin/towers',
+        data=json.dumps({'name': 'Tower P', 'total_floors': 40, 'flats_per_floor': 8, 'units': units}),
+        content_type='application/json',
+        headers=headers
+    )
+    
+    assert response.status_code == 201
+    tower = json.loads(response.data)
+    assert tower['flats_created'] == 320
+    assert sum('INSERT INTO flats' in statement for statement in query_counter) == 1
+    with app.app_context():
+        flats = Flat.query.filter_by(tower_id=tower['id']).all()
+        by_unit = {flat.unit_number: flat for flat in flats}
+    assert len(flats) == 320
+    assert by_unit['4008'].floor == 40
+    assert float(by_unit['4001'].rent) == 1500 + 39 * 25
+    assert float(by_unit['102'].rent) == 1000.5
+    assert by_unit['102'].area_sqft is None
+    
+    listing = json.loads(client.get(f'/api/flats?tower_id={tower["id"]}').data)
+    assert len(listing) == 320
+    
+    response = client.post('/api/admin/towers',
+        data=json.dumps({'name': 'Tower Q', 'total_floors': 2, 'flats_per_floor': 2,
+                         'units': [{'bedrooms': 1, 'bathrooms': 1}]}),
+        content_type='application/json',
+        headers=headers
+    )
+    assert response.status_code == 400
+    
+    response = client.post('/api/admin/towers',
+        data=json.dumps({'name': 'Tower R', 'total_floors': 1, 'flats_per_floor': 1,
+                         'units': [{'bedrooms': 1, 'bathrooms': 1, 'rent': 900, 'area_sqft': True}]}),
+        content_type='application/json',
+        headers=headers
+    )
+    assert json.loads(response.data)['error']['details']['units'] == {'0': {'area_sqft': 'Must be a non-negative integer'}}
+    
+    # Non-finite rents, rents past NUMERIC(10, 2) on the top floor and oversized grids
+    for template, floors, expected in (
+        ({'rent': float('nan')}, 1, {'rent': 'Must be a non-negative number'}),
+        ({'rent': 900, 'rent_increment': float('inf')}, 1, {'rent_increment': 'Must be a non-negative number'}),
+        ({'rent': 900, 'rent_increment': 10 ** 7}, 11, {'rent': 'Rent of the top floor must be below 100000000'}),
+    ):
+        response = client.post('/api/admin/towers',
+            data=json.dumps({'name': 'Tower T', 'total_floors': floors, 'flats_per_floor': 1,
+                             'units': [{'bedrooms': 1, 'bathrooms': 1, **template}]}),
+            content_type='application/json',
+            headers=headers
+        )
+        assert json.loads(response.data)['error']['details']['units'] == {'0': expected}
+    response = client.post('/api/admin/towers',
+        data=json.dumps({'name': 'Tower T', 'total_floors': 10 ** 6, 'flats_per_floor': 1,
+                         'units': [{'bedrooms': 1, 'bathrooms': 1, 'rent': 900}]}),
+        content_type='application/json',
+        headers=headers
+    )
+    assert response.status_code == 400
+    
+    # Three-digit positions keep floor 1 position 101 apart from floor 11 position 1
+    response = client.post('/api/admin/towers',
+        data=json.dumps({'name': 'Tower S', 'total_floors': 11, 'flats_per_floor': 120,
+                         'units': [{'bedrooms': 1, 'bathrooms': 1, 'rent': 900}] * 120}),
+        content_type='application/json',
+        headers=headers
+    )
+    assert response.status_code == 201
+    with app.app_context():
+        units = {flat.unit_number for flat in Flat.query.filter_by(tower_id=json.loads(response.data)['id'])}
+    assert len(units) == 11 * 120
+    assert {'1101', '11001', '11120'} <= units
+
+
+def test_import_flats_csv_upserts_and_reports_row_errors(client, app):
+    """Test that a CSV import inserts new units, updates existing ones and reports bad rows."""
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    admin_token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    with app.app_context():
+        db.session.get(Flat, 1).is_available = False
+        db.session.commit()
+    body = (
+        'tower_id,unit_number,floor,bedrooms,bathrooms,rent,area_sqft,is_available\n'
+        '1,101,1,3,2,2100.50,950,\n'
+        '1,102,1,2,1,1800,,false\n'
+        '1,103,1,two,1,1800,,\n'
+        '9,101,1,2,1,1800,,\n'
+        '1,104,1,2,1\n'
+        '1,105,1,\u00b2,1,1800,,\n'
+    )
+    
+    response = client.post('/api/admin/flats/import', data=body, content_type='text/csv', headers=headers)
+    
+    assert response.status_code == 200
+    report = json.loads(response.data)
+    assert report['processed'] == 6
+    assert report['imported'] == 2
+    assert report['failed'] == 4
+    assert [error['line'] for error in report['errors']] == [4, 6, 7, 5]
+    assert report['errors'][0]['errors'] == {'bedrooms': 'Must be a non-negative integer'}
+    assert report['errors'][1]['errors'] == {'rent': 'Required'}
+    # A digit int() cannot read is an ordinary row error
+    assert report['errors'][2]['errors'] == {'bedrooms': 'Must be a non-negative integer'}
+    assert report['errors'][3]['errors'] == {'tower_id': 'Tower not found'}
+    with app.app_context():
+        updated = Flat.query.filter_by(unit_number='101').one()
+        created = Flat.query.filter_by(unit_number='102').one()
+        assert (updated.bedrooms, float(updated.rent), updated.is_available) == (3, 2100.5, False)
+        assert (created.area_sqft, created.is_available) == (None, False)
+    
+    response = client.post('/api/admin/flats/import', data='{}', content_type='application/json', headers=headers)
+    assert response.status_code == 400
+
+
+def test_import_flats_ndjson_in_chunks(app):
+    """Test that NDJSON records are written chunk by chunk with the last duplicate winning."""
+    create_test_flats(app, tower_count=1, flats_per_tower=0)
+    lines = [json.dumps({'tower_id': 1, 'unit_number': f'{n}01', 'floor': n,
+                         'bedrooms': 1, 'bathrooms': 1, 'rent': 1000 + n}) for n in range(1, 6)]
+    lines += ['', 'not json', '[1]', json.dumps({'tower_id': 1, 'unit_number': '501', 'floor': 5,
+                                                 'bedrooms': 4, 'bathrooms': 1, 'rent': 9000})]
+    body = io.BytesIO('\n'.join(lines).encode())
+    
+    with app.app_context():
+        report, error = FlatService.import_flats(
+            iter_import_records(body, 'application/x-ndjson'), chunk_size=2
+        )
+        flats = Flat.query.order_by(Flat.floor).all()
+        
+        assert error is None
+        # Unit 501 appears twice in the last chunk; the first record is superseded
+        assert (report['processed'], report['imported'], report['superseded'], report['failed']) == (8, 5, 1, 2)
+        assert [error['errors'] for error in report['errors']] == [
+            {'row': 'Invalid JSON'}, {'row': 'Must be a JSON object'}
+        ]
+        assert len(flats) == 5
+        assert (flats[-1].bedrooms, float(flats[-1].rent)) == (4, 9000)
+
+
+def test_rent_adjustment_dry_run_then_apply(client, app, query_counter):
+    """Test that a rent adjustment previews totals and then updates matching flats in one statement."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    admin_token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    body = {'percent': 10, 'tower_id': 1, 'min_floor': 2, 'dry_run': True}
+    
+    query_counter.clear()
+    response = client.post('/api/admin/flats/rent-adjustment', data=json.dumps(body),
+                           content_type='application/json', headers=headers)
+    
+    assert response.status_code == 200
+    # Tower 1 floors 2 and 3 rent 1250 and 1500
+    assert json.loads(response.data) == {'matched': 2, 'rent_before': 2750.0, 'rent_after': 3025.0, 'dry_run': True}
+    assert sum(statement.lstrip().startswith('SELECT') for statement in query_counter) == 1
+    with app.app_context():
+        assert float(db.session.get(Flat, 2).rent) == 1250
+    
+    body['dry_run'] = False
+    query_counter.clear()
+    response = client.post('/api/admin/flats/rent-adjustment', data=json.dumps(body),
+                           content_type='application/json', headers=headers)
+    
+    assert json.loads(response.data) == {'matched': 2, 'rent_before': 2750.0, 'rent_after': 3025.0, 'dry_run': False}
+    assert sum(statement.lstrip().startswith('UPDATE flats') for statement in query_counter) == 1
+    with app.app_context():
+        rents = [float(flat.rent) for flat in Flat.query.order_by(Flat.id)]
+    assert rents == [1000, 1375, 1650, 1000, 1250, 1500]
+    
+    response = client.post('/api/admin/flats/rent-adjustment',
+                           data=json.dumps({'amount': -1200, 'bedrooms': 1}),
+                           content_type='application/json', headers=headers)
+    assert json.loads(response.data)['rent_after'] == 0
+    
+    response = client.post('/api/admin/flats/rent-adjustment',
+                           data=json.dumps({'percent': 5, 'amount': 5}),
+                           content_type='application/json', headers=headers)
+    assert response.status_code == 400
+    
+    # Non-finite changes and rents past NUMERIC(10, 2) are rejected without writing
+    with app.app_context():
+        rents = [float(flat.rent) for flat in Flat.query.order_by(Flat.id)]
+    for body in ({'percent': float('inf')}, {'amount': float('nan'), 'dry_run': True},
+                 {'amount': 10 ** 8}, {'percent': 10 ** 7}, {'percent': 10 ** 7, 'dry_run': True}):
+        response = client.post('/api/admin/flats/rent-adjustment', data=json.dumps(body),
+                               content_type='application/json', headers=headers)
+        assert response.status_code == 400
+    with app.app_context():
+        assert [float(flat.rent) for flat in Flat.query.order_by(Flat.id)] == rents
+
+
+@pytest.mark.parametrize('name, columns, count', [
+    ('flats', 'id,tower_id,tower_name,unit_number', 6),
+    ('bookings', 'id,status,requested_date,created_at,user_id,user_email', 2),
+    ('tenants', 'user_id,name,email,phone,lease_id', 1),
+    ('leases', 'id,status,start_date,end_date,monthly_rent', 1),
+])
+def test_csv_export(client, app, name, columns, count):
+    """Test that each export streams a CSV with joined columns, optionally gzipped."""
+    admin_token = create_bookings_with_lease(client, app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    
+    response = client.get(f'/api/admin/export/{name}.csv', headers=headers)
+    
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    lines = response.data.decode().splitlines()
+    assert lines[0].startswith(columns)
+    assert len(lines) == count + 1
+    
+    gzipped = client.get(f'/api/admin/export/{name}.csv', headers={**headers, 'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.data) == response.data
+
+
+def test_csv_export_formats_values(client, app):
+    """Test that CSV cells hold enum values, ISO dates and empty NULLs."""
+    admin_token = create_bookings_with_lease(client, app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    
+    rows = list(csv.DictReader(io.StringIO(client.get('/api/admin/export/leases.csv', headers=headers).data.decode())))
+    
+    assert rows[0]['status'] == 'active'
+    assert rows[0]['start_date'] == '2025-02-01'
+    assert rows[0]['end_date'] == ''
+    assert rows[0]['tower_name'] == 'Tower 1'
+    assert client.get('/api/admin/export/users.csv', headers=headers).status_code == 404
+    
+    with app.app_context():
+        User.query.filter_by(email='test@example.com').update({'name': '=HYPERLINK("http://x")', 'phone': '-1'})
+        db.session.commit()
+    rows = list(csv.DictReader(io.StringIO(client.get('/api/admin/export/tenants.csv', headers=headers).data.decode())))
+    
+    assert (rows[0]['name'], rows[0]['phone']) == ('\'=HYPERLINK("http://x")', "'-1")
+
+
+def test_batch_process_bookings(client, app, query_counter):
+    """Test that a batch approves and declines bookings with a constant number of statements."""
+    create_test_flats(app, tower_count=1, flats_per_tower=3)
+    admin_token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    tokens = [register_and_get_token(client, email=f'user{n}@example.com') for n in range(2)]
+    for token in tokens:
+        for flat_id in (1, 2, 3):
+            client.post('/api/bookings',
+                data=json.dumps({'flat_id': flat_id, 'requested_date': '2025-02-01'}),
+                content_type='application/json',
+                headers={'Authorization': f'Bearer {token}'}
+            )
+    # Bookings 1-3 are user 0's for flats 1-3, bookings 4-6 user 1's
+    items = [
+        {'id': 1, 'action': 'approve'},
+        {'id': 4, 'action': 'approve'},
+        {'id': 2, 'action': 'decline'},
+        {'id': 6, 'action': 'approve'},
+        {'id': 2, 'action': 'approve'},
+        {'id': 99, 'action': 'decline'}
+    ]
+    
+    query_counter.clear()
+    response = client.post('/api/admin/bookings/batch', data=json.dumps({'items': items}),
+                           content_type='application/json', headers=headers)
+    
+    assert response.status_code == 200
+    results = json.loads(response.data)['results']
+    assert [result.get('status') for result in results] == ['approved', 'declined', 'declined', 'approved', None, None]
+    # Booking 4 lost flat 1 to booking 1 and was declined with its competitors
+    assert results[1]['error'] == 'Flat is no longer available'
+    assert results[4]['error'] == 'Booking appears more than once in the batch'
+    assert results[5]['error'] == 'Booking not found'
+    assert all(results[i]['lease_id'] for i in (0, 3))
+    # Booking 4 competed with booking 1 for flat 1, booking 3 with booking 6 for flat 3
+    assert [results[i]['declined_competing'] for i in (0, 3)] == [1, 1]
+    # Select bookings, claim flats, approve, decline, decline competing, insert leases, bump version
+    assert len(query_counter) == 7
+    
+    with app.app_context():
+        flats = {flat.id: flat.is_available for flat in Flat.query}
+    assert flats == {1: False, 2: True, 3: False}
+    
+    response = client.post('/api/admin/bookings/batch', data=json.dumps({'items': [{'id': 1, 'action': 'approve'}]}),
+                           content_type='application/json', headers=headers)
+    assert json.loads(response.data)['results'][0]['error'] == 'Cannot approve booking with status: approved'
+    
+    response = client.post('/api/admin/bookings/batch', data=json.dumps({'items': [{'id': 1, 'action': 'cancel'}]}),
+                           content_type='application/json', headers=headers)
+    assert response.status_code == 400
+
+
+def test_approve_declines_competing_bookings(client, app):
+    """Test that approving a booking declines the other pending bookings for the flat."""
+    create_test_flats(app, tower_count=1, flats_per_tower=2)
+    admin_token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    for n, flat_id in enumerate((1, 1, 1, 2)):
+        token = register_and_get_token(client, email=f'user{n}@example.com')
+        client.post('/api/bookings',
+            data=json.dumps({'flat_id': flat_id, 'requested_date': '2025-02-01'}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+    
+    response = client.put('/api/admin/bookings/2/approve', headers=headers)
+    
+    assert response.status_code == 200
+    assert json.loads(response.data)['declined_bookings'] == 2
+    statuses = {booking['id']: booking['status'] for booking in
+                json.loads(client.get('/api/admin/bookings', headers=headers).data)}
+    assert statuses == {1: 'declined', 2: 'approved', 3: 'declined', 4: 'pending'}
+
+
+def test_approvals_deadlocked_with_concurrent_writes_conflict(client, app, monkeypatch):
+    """Test that a deadlock while approving rolls back and returns 409 for single and batch approvals."""
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    headers = {'Authorization': f'Bearer {get_admin_token(app)}'}
+    token = register_and_get_token(client)
+    client.post('/api/bookings', data=json.dumps({'flat_id': 1, 'requested_date': '2025-02-01'}),
+                content_type='application/json', headers={'Authorization': f'Bearer {token}'})
+    
+    def deadlock(*criteria):
+        raise OperationalError('UPDATE bookings', {}, Exception('deadlock detected'))
+    monkeypatch.setattr(WaitlistService, 'queue_bookings', deadlock)
+    
+    response = client.put('/api/admin/bookings/1/approve?waitlist=true', headers=headers)
+    assert response.status_code == 409
+    assert json.loads(response.data)['error']['code'] == 'RESOURCE_CONFLICT'
+    
+    response = client.post('/api/admin/bookings/batch?waitlist=true',
+                           data=json.dumps({'items': [{'id': 1, 'action': 'approve'}]}),
+                           content_type='application/json', headers=headers)
+    assert response.status_code == 409
+    
+    # Nothing was written
+    assert db.session.get(Flat, 1).is_available
+    assert client.put('/api/admin/bookings/1/approve', headers=headers).status_code == 200
@@ -1,7 +1,11 @@
 """Tests for booking endpoints."""
 import json
-from app.models import Tower, Flat, Booking, BookingStatus
-from app import db
+import threading
+import pytest
+from app.config import TestingConfig
+from app.models import Tower, Flat, Booking, BookingStatus, Lease, LeaseStatus, User
+from app.services.booking_service import BookingService, CONCURRENT_CHANGE
+from app import create_app, db
 
 
 def create_test_tower_and_flat(app, is_available=True):
@@ -110,6 +114,26 @@ def test_create_booking_duplicate_pending(client, app):
     assert data['error']['code'] == 'BOOKING_DUPLICATE'
 
 
+def test_create_booking_other_integrity_error_is_not_a_duplicate(client, app):
+    """Test that only the pending booking index is reported as a duplicate."""
+    tower_id, flat_id = create_test_tower_and_flat(app)
+    token = register_and_get_token(client)
+    with app.app_context():
+        db.session.execute(db.text('PRAGMA foreign_keys = ON'))
+        # The token outlives its user, so the booking fails its foreign key
+        User.query.delete()
+        db.session.commit()
+    
+    response = client.post('/api/bookings',
+        data=json.dumps({'flat_id': flat_id, 'requested_date': '2025-02-01'}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    
+    assert response.status_code == 400
+    assert json.loads(response.data)['error']['message'] == 'Booking could not be created'
+
+
 def test_create_booking_nonexistent_flat(client, app):
     """Test booking creation for non-existent flat."""
     token = register_and_get_token(client)
@@ -275,3 +299,132 @@ def test_get_booking_other_user(client, app):
     )
     
     assert response.status_code == 404
+
+
+def test_get_user_bookings_sparse_fields(client, app, query_counter):
+    """Test that fields= with flat.<name> loads only the nested flat fields."""
+    tower_id, flat_id = create_test_tower_and_flat(app)
+    token = register_and_get_token(client)
+    client.post('/api/bookings',
+        data=json.dumps({'flat_id': flat_id, 'requested_date': '2025-02-01'}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    query_counter.clear()
+    response = client.get('/api/bookings?fields=id,status,flat.unit_number,flat.rent', headers=headers)
+    
+    assert response.status_code == 200
+    assert json.loads(response.data) == [{
+        'id': 1,
+        'status': 'pending',
+        'flat': {'unit_number': '101', 'rent': 1500.0}
+    }]
+    assert len(query_counter) == 1
+    assert 'towers' not in query_counter[0]
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/bookings?fields=id,status', headers=headers).data)
+    
+    assert data == [{'id': 1, 'status': 'pending'}]
+    assert 'flats' not in ' '.join(query_counter)
+    assert client.get('/api/bookings?fields=flat.owner', headers=headers).status_code == 400
+
+
+def test_create_booking_is_one_statement(client, app, query_counter):
+    """Test that a successful booking request inserts with a single statement."""
+    _, flat_id = create_test_tower_and_flat(app)
+    register_and_get_token(client)
+    
+    query_counter.clear()
+    BookingService.create_booking(1, flat_id, '2025-02-01')
+    
+    assert [statement.split()[0] for statement in query_counter] == ['INSERT']
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """Create an application on a SQLite file shared by several connections."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "bookings.db"}')
+    app = create_app('testing')
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_concurrent_duplicate_bookings_are_rejected(file_app):
+    """Test that concurrent requests for the same flat create one pending booking."""
+    _, flat_id = create_test_tower_and_flat(file_app)
+    with file_app.app_context():
+        user = User(email='racer@example.com', password_hash='x', name='Racer')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    
+    threads_count = 8
+    barrier = threading.Barrier(threads_count)
+    results = []
+    
+    def book():
+        with file_app.app_context():
+            barrier.wait()
+            booking, error = BookingService.create_booking(user_id, flat_id, '2025-02-01')
+            results.append(error)
+            db.session.remove()
+    
+    for _ in range(3):
+        threads = [threading.Thread(target=book) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    with file_app.app_context():
+        pending = Booking.query.filter_by(user_id=user_id, flat_id=flat_id, status=BookingStatus.PENDING).count()
+    
+    assert pending == 1
+    assert results.count(None) == 1
+    assert set(results) == {None, 'You already have a pending booking for this flat'}
+
+
+def test_concurrent_approvals_lease_a_flat_once(file_app):
+    """Test that approving competing bookings for one flat concurrently creates one lease."""
+    _, flat_id = create_test_tower_and_flat(file_app)
+    threads_count = 8
+    with file_app.app_context():
+        users = [User(email=f'user{n}@example.com', password_hash='x', name=f'User {n}') for n in range(threads_count)]
+        db.session.add_all(users)
+        db.session.commit()
+        booking_ids = [BookingService.create_booking(user.id, flat_id, '2025-02-01')[0].id for user in users]
+    
+    barrier = threading.Barrier(threads_count)
+    results = []
+    
+    def approve(booking_id):
+        with file_app.app_context():
+            barrier.wait()
+            booking, error = BookingService.approve_booking(booking_id)
+            results.append(error)
+            db.session.remove()
+    
+    threads = [threading.Thread(target=approve, args=(booking_id,)) for booking_id in booking_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    with file_app.app_context():
+        leases = Lease.query.filter_by(status=LeaseStatus.ACTIVE).count()
+        approved = Booking.query.filter_by(status=BookingStatus.APPROVED).count()
+    
+    assert leases == 1
+    assert approved == 1
+    assert results.count(None) == 1
+    # Losers either raced the winner to the flat, found their booking declined
+    # by it, or timed out on the database lock
+    assert set(results) <= {None, 'Flat is no longer available', 'Cannot approve booking with status: declined',
+                            CONCURRENT_CHANGE}
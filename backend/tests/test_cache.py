@@ -0,0 +1,83 @@
+"""Tests for the in-process TTL cache."""
+import threading
+from app.cache import TTLCache
+
+
+def test_cache_hit_and_miss_counters():
+    """Test that repeated lookups are served from the cache."""
+    cache = TTLCache(maxsize=4, ttl=60)
+    calls = []
+    
+    for _ in range(3):
+        value = cache.get_or_load('key', lambda: calls.append(1) or 'value')
+    
+    assert value == 'value'
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    """Test that the oldest unused entry is evicted when full."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.get_or_load('a', lambda: 1)
+    cache.get_or_load('b', lambda: 2)
+    cache.get_or_load('a', lambda: 1)
+    cache.get_or_load('c', lambda: 3)
+    
+    assert cache.get_or_load('a', lambda: 'reloaded') == 1
+    assert cache.get_or_load('b', lambda: 'reloaded') == 'reloaded'
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_cache_expires_entries():
+    """Test that entries older than the TTL are reloaded."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.get_or_load('a', lambda: 1)
+    
+    # Backdate the entry past its expiry time
+    cache._entries['a'] = (0, 1)
+    
+    assert cache.get_or_load('a', lambda: 2) == 2
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_drops_value_loaded_during_invalidation():
+    """Test that a load racing with an invalidation is not stored."""
+    cache = TTLCache(maxsize=4, ttl=60)
+    
+    def stale_load():
+        cache.invalidate()
+        return 'stale'
+    
+    assert cache.get_or_load('key', stale_load) == 'stale'
+    assert cache.get_or_load('key', lambda: 'fresh') == 'fresh'
+
+
+def test_cache_invalidate_with_predicate():
+    """Test that only matching keys are invalidated."""
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.get_or_load((1, 'x'), lambda: 'one')
+    cache.get_or_load((2, 'x'), lambda: 'two')
+    
+    assert cache.invalidate(lambda key: key[0] == 1) == 1
+    assert cache.get_or_load((2, 'x'), lambda: 'reloaded') == 'two'
+
+
+def test_cache_is_thread_safe():
+    """Test that concurrent readers keep consistent counters."""
+    cache = TTLCache(maxsize=8, ttl=60)
+    
+    def worker():
+        for i in range(500):
+            cache.get_or_load(i % 16, lambda: i)
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 8 * 500
+    assert stats['size'] <= 8
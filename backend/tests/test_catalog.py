@@ -0,0 +1,145 @@
+"""Tests for conditional requests on public catalog endpoints."""
+import json
+from app.models import Tower, Flat, Amenity, AmenityType
+from app.etag import bump_versions, FLATS
+from app import db
+from tests.test_flats import create_test_flats, get_admin_token
+
+
+def test_catalog_endpoints_return_etag(client, app):
+    """Test that catalog listings carry a strong ETag."""
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    
+    for url in ['/api/flats', '/api/towers', '/api/amenities']:
+        response = client.get(url)
+        assert response.status_code == 200
+        etag, weak = response.get_etag()
+        assert etag and not weak
+
+
+def test_matching_etag_returns_304_without_queries(client, app, query_counter):
+    """Test that a revalidation with a current ETag only looks up the versions."""
+    create_test_flats(app, tower_count=2, flats_per_tower=2)
+    first = client.get('/api/flats')
+    
+    query_counter.clear()
+    response = client.get('/api/flats', headers={'If-None-Match': first.headers['ETag']})
+    
+    assert response.status_code == 304
+    assert response.headers['ETag'] == first.headers['ETag']
+    assert response.data == b''
+    assert query_counter == []
+
+
+def test_write_from_another_process_changes_etag(client, app):
+    """Test that a write committed elsewhere invalidates the ETag and the local search cache."""
+    app.config['FLAT_SEARCH_CACHE_SIZE'] = 16
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    first = client.get('/api/flats')
+    
+    # Another instance writes: it bumps the shared version, but cannot
+    # notify this process
+    with app.app_context():
+        db.session.get(Flat, 1).rent = 4321
+        bump_versions(FLATS)
+        db.session.commit()
+    response = client.get('/api/flats', headers={'If-None-Match': first.headers['ETag']})
+    
+    assert response.status_code == 200
+    assert json.loads(response.data)[0]['rent'] == 4321
+
+
+def test_etag_depends_on_query_string(client, app):
+    """Test that different filters produce different ETags."""
+    create_test_flats(app, tower_count=1, flats_per_tower=3)
+    
+    all_flats = client.get('/api/flats')
+    one_bed = client.get('/api/flats?bedrooms=1', headers={'If-None-Match': all_flats.headers['ETag']})
+    
+    assert one_bed.status_code == 200
+    assert one_bed.headers['ETag'] != all_flats.headers['ETag']
+
+
+def test_tower_write_changes_etag(client, app):
+    """Test that creating a tower invalidates the tower listing ETag."""
+    token = get_admin_token(app)
+    first = client.get('/api/towers')
+    
+    client.post('/api/admin/towers',
+        data=json.dumps({'name': 'New Tower', 'total_floors': 5}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    response = client.get('/api/towers', headers={'If-None-Match': first.headers['ETag']})
+    
+    assert response.status_code == 200
+    assert [tower['name'] for tower in json.loads(response.data)] == ['New Tower']
+
+
+def test_amenity_write_changes_tower_detail_etag(client, app):
+    """Test that tower details are revalidated when an amenity changes."""
+    token = get_admin_token(app)
+    with app.app_context():
+        amenity = Amenity(name='Pool', type=AmenityType.POOL)
+        tower = Tower(name='Tower A', total_floors=3, amenities=[amenity])
+        db.session.add(tower)
+        db.session.commit()
+        tower_id, amenity_id = tower.id, amenity.id
+    first = client.get(f'/api/towers/{tower_id}')
+    
+    client.put(f'/api/admin/amenities/{amenity_id}',
+        data=json.dumps({'name': 'Rooftop Pool'}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    response = client.get(f'/api/towers/{tower_id}', headers={'If-None-Match': first.headers['ETag']})
+    
+    assert response.status_code == 200
+    assert json.loads(response.data)['amenities'][0]['name'] == 'Rooftop Pool'
+
+
+def test_admin_and_public_flat_listings_have_different_etags(client, app):
+    """Test that admins do not revalidate against the public listing."""
+    token = get_admin_token(app)
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    public = client.get('/api/flats')
+    
+    response = client.get('/api/flats', headers={
+        'Authorization': f'Bearer {token}',
+        'If-None-Match': public.headers['ETag']
+    })
+    
+    assert response.status_code == 200
+
+
+def create_towers_with_amenities(app, tower_count=3):
+    """Helper to create towers that each have two amenities."""
+    with app.app_context():
+        gym = Amenity(name='Gym', type=AmenityType.GYM)
+        pool = Amenity(name='Pool', type=AmenityType.POOL)
+        for t in range(tower_count):
+            db.session.add(Tower(name=f'Tower {t + 1}', total_floors=5, amenities=[gym, pool]))
+        db.session.commit()
+
+
+def test_tower_endpoints_load_amenities_only_when_serialized(client, app, query_counter):
+    """Test the query count of the public tower endpoints."""
+    create_towers_with_amenities(app)
+    db.session.expunge_all()
+    
+    query_counter.clear()
+    client.get('/api/towers')
+    
+    assert len(query_counter) == 1
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/towers/2').data)
+    
+    assert [amenity['name'] for amenity in data['amenities']] == ['Gym', 'Pool']
+    # The tower, then its amenities in one SELECT ... IN
+    assert len(query_counter) == 2
+    
+    query_counter.clear()
+    client.get('/api/flats')
+    
+    assert len(query_counter) == 1
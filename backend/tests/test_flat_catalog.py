@@ -0,0 +1,122 @@
+"""Tests for the in-memory columnar flat catalog."""
+import pytest
+from app.models import Tower, Flat
+from app.etag import bump_versions, read_versions, FLATS
+from app.services.flat_service import FlatService, get_flat_catalog
+from app import db
+from tests.test_flats import create_test_flats
+
+pytest.importorskip('numpy')
+
+
+SEARCHES = [
+    {},
+    {'include_unavailable': True},
+    {'tower_id': 2, 'min_rent': 1200},
+    {'bedrooms': 2, 'max_rent': 1500},
+    {'min_area': 850, 'max_floor': 2, 'min_bathrooms': 1},
+    {'sort': '-rent'},
+    {'sort': 'rent_per_sqft', 'include_unavailable': True},
+    {'sort': 'area_sqft', 'include_unavailable': True},
+    {'sort': '-area_sqft', 'include_unavailable': True},
+    {'sort': 'created_at'},
+    {'sort': 'floor', 'max_area': 900},
+]
+
+
+def collect_pages(limit, **search):
+    """Read every page of a search, returning the flat IDs in order."""
+    ids = []
+    after = None
+    while True:
+        flats, after = FlatService.search_flats(limit=limit, after=after, **search)
+        ids.extend(flat['id'] for flat in flats)
+        if after is None:
+            return ids
+
+
+@pytest.mark.parametrize('search', SEARCHES)
+def test_catalog_matches_sql(app, search):
+    """Test that catalog searches return what the SQL path returns, page by page."""
+    create_test_flats(app, tower_count=3, flats_per_tower=4)
+    with app.app_context():
+        Flat.query.filter(Flat.id.in_([2, 7])).update({'is_available': False, 'area_sqft': None})
+        db.session.commit()
+        
+        expected_list = [flat['id'] for flat in FlatService.search_flats(**search)[0]]
+        expected_pages = collect_pages(limit=2, **search)
+        
+        app.config['FLAT_CATALOG_ENABLED'] = True
+        catalog_list = [flat['id'] for flat in FlatService.search_flats(**search)[0]]
+        # Unsorted, unpaginated SQL results come in no particular order
+        if 'sort' not in search:
+            catalog_list, expected_list = sorted(catalog_list), sorted(expected_list)
+        assert catalog_list == expected_list
+        assert collect_pages(limit=2, **search) == expected_pages
+
+
+def test_catalog_search_makes_no_queries(app, query_counter):
+    """Test that searches after the first build are answered without SQL."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    app.config['FLAT_CATALOG_ENABLED'] = True
+    with app.app_context():
+        FlatService.search_flats()
+        
+        query_counter.clear()
+        flats, _ = FlatService.search_flats(bedrooms=2, sort='-rent')
+        
+        assert len(flats) == 2
+        assert query_counter == []
+
+
+def test_catalog_patched_by_writes(app):
+    """Test that flat and tower writes are reflected without a full rebuild."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    app.config['FLAT_CATALOG_ENABLED'] = True
+    with app.app_context():
+        FlatService.search_flats()
+        flat = Flat.query.filter_by(unit_number='101').first()
+        
+        FlatService.update_flat(flat.id, rent=5000)
+        FlatService.delete_flat(Flat.query.filter_by(unit_number='301').first().id)
+        
+        flats, _ = FlatService.search_flats(min_rent=4000)
+        assert [f['id'] for f in flats] == [flat.id]
+        assert len(FlatService.search_flats()[0]) == 5
+        
+        catalog = get_flat_catalog()
+        assert catalog.stats()['rebuilds'] == 1
+        assert catalog.stats()['patches'] == 2
+
+
+def test_catalog_marked_stale_by_write_from_another_process(app, query_counter):
+    """Test that a flats version written elsewhere drops the catalog, which the next search rebuilds."""
+    create_test_flats(app, tower_count=1, flats_per_tower=2)
+    app.config['FLAT_CATALOG_ENABLED'] = True
+    with app.app_context():
+        read_versions((FLATS,))
+        FlatService.search_flats()
+        catalog = get_flat_catalog()
+        
+        db.session.get(Flat, 1).rent = 4321
+        bump_versions(FLATS)
+        db.session.commit()
+        query_counter.clear()
+        read_versions((FLATS,))
+        
+        # Noticing the change loads nothing
+        assert query_counter == []
+        assert catalog.stats()['size'] == 0
+        flats, _ = FlatService.search_flats(min_rent=4000)
+        assert [f['id'] for f in flats] == [1]
+        assert catalog.stats()['rebuilds'] == 2
+
+
+def test_catalog_falls_back_for_text_search(app):
+    """Test that text searches still go to the database index."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    app.config['FLAT_CATALOG_ENABLED'] = True
+    with app.app_context():
+        flats, _ = FlatService.search_flats(q='tower 2 301')
+        
+        assert [(f['tower_name'], f['unit_number']) for f in flats] == [('Tower 2', '301')]
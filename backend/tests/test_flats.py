@@ -0,0 +1,399 @@
+"""Tests for flat listing endpoints."""
+import json
+from app.models import Tower, Flat, User, UserRole
+from app.services.auth_service import AuthService
+from app.pagination import encode_cursor
+from app import db
+
+
+def create_test_flats(app, tower_count=2, flats_per_tower=3):
+    """Helper to create towers with flats for testing."""
+    with app.app_context():
+        for t in range(tower_count):
+            tower = Tower(name=f'Tower {t + 1}', address=f'{t + 1}00 Test St', total_floors=10)
+            db.session.add(tower)
+            db.session.flush()
+            
+            for i in range(flats_per_tower):
+                db.session.add(Flat(
+                    tower_id=tower.id,
+                    unit_number=f'{i + 1}01',
+                    floor=i + 1,
+                    bedrooms=(i % 3) + 1,
+                    bathrooms=1,
+                    area_sqft=800 + i * 100,
+                    rent=1000 + i * 250,
+                    is_available=True
+                ))
+        db.session.commit()
+
+
+def get_admin_token(app, email='admin@example.com'):
+    """Helper to create an admin user and get their token."""
+    with app.app_context():
+        admin = User(
+            email=email,
+            password_hash=AuthService.hash_password('admin123'),
+            name='Admin User',
+            role=UserRole.ADMIN
+        )
+        db.session.add(admin)
+        db.session.commit()
+        return AuthService.generate_token(admin)
+
+
+def test_get_flats_includes_tower_name(client, app):
+    """Test that listed flats carry their tower name."""
+    create_test_flats(app, tower_count=1, flats_per_tower=2)
+    
+    response = client.get('/api/flats')
+    
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data) == 2
+    assert all(flat['tower_name'] == 'Tower 1' for flat in data)
+
+
+def test_get_flats_query_count_is_constant(client, app, query_counter):
+    """Test that listing flats does not lazy-load towers per row."""
+    create_test_flats(app, tower_count=1, flats_per_tower=2)
+    db.session.expunge_all()
+    query_counter.clear()
+    client.get('/api/flats')
+    small_listing = len(query_counter)
+    
+    create_test_flats(app, tower_count=5, flats_per_tower=10)
+    db.session.expunge_all()
+    query_counter.clear()
+    response = client.get('/api/flats')
+    
+    assert len(json.loads(response.data)) == 52
+    assert len(query_counter) == small_listing
+
+
+def test_admin_get_flats_query_count_is_constant(client, app, query_counter):
+    """Test that the admin flat listing loads towers in the same query."""
+    token = get_admin_token(app)
+    headers = {'Authorization': f'Bearer {token}'}
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    db.session.expunge_all()
+    query_counter.clear()
+    client.get('/api/admin/flats', headers=headers)
+    small_listing = len(query_counter)
+    
+    create_test_flats(app, tower_count=4, flats_per_tower=5)
+    db.session.expunge_all()
+    query_counter.clear()
+    response = client.get('/api/admin/flats', headers=headers)
+    
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data) == 21
+    assert {flat['tower_name'] for flat in data} == {'Tower 1', 'Tower 2', 'Tower 3', 'Tower 4'}
+    assert len(query_counter) == small_listing
+
+
+def test_get_flats_cursor_pagination(client, app):
+    """Test walking the flat listing page by page with cursors."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/flats?limit=4' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data['items']) <= 4
+        seen.extend(flat['id'] for flat in data['items'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) == 6
+
+
+def test_get_flats_pagination_keeps_filters(client, app):
+    """Test that cursors page through the filtered result only."""
+    create_test_flats(app, tower_count=3, flats_per_tower=3)
+    
+    first = json.loads(client.get('/api/flats?bedrooms=1&limit=2').data)
+    second = json.loads(client.get(f"/api/flats?bedrooms=1&limit=2&cursor={first['next_cursor']}").data)
+    
+    assert len(first['items']) == 2
+    assert len(second['items']) == 1
+    assert second['next_cursor'] is None
+    assert all(flat['bedrooms'] == 1 for flat in first['items'] + second['items'])
+
+
+def test_get_flats_invalid_cursor(client, app):
+    """Test that malformed pagination parameters are rejected."""
+    assert client.get('/api/flats?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/flats?limit=0').status_code == 400
+    # Forged keys past the database integer range
+    for key in ([2 ** 64], ['floor', 2 ** 64, 1], ['floor', 1, 2 ** 64], ['rent', '1e999', 1]):
+        response = client.get(f'/api/flats?limit=2&cursor={encode_cursor(key)}')
+        assert response.status_code == 400
+    
+    data = json.loads(client.get('/api/flats?limit=abc').data)
+    assert data['error']['code'] == 'VALIDATION_ERROR'
+
+
+def test_admin_get_flats_cursor_pagination(client, app):
+    """Test that the admin flat listing pages over unavailable flats too."""
+    token = get_admin_token(app)
+    create_test_flats(app, tower_count=1, flats_per_tower=3)
+    with app.app_context():
+        Flat.query.filter(Flat.unit_number == '101').update({'is_available': False})
+        db.session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    first = json.loads(client.get('/api/admin/flats?limit=2', headers=headers).data)
+    second = json.loads(client.get(f"/api/admin/flats?limit=2&cursor={first['next_cursor']}",
+        headers=headers
+    ).data)
+    
+    assert [flat['unit_number'] for flat in first['items'] + second['items']] == ['101', '201', '301']
+    assert second['next_cursor'] is None
+
+
+def test_flat_search_cache_serves_repeated_searches(client, app, query_counter):
+    """Test that identical searches are answered from the search cache."""
+    app.config['FLAT_SEARCH_CACHE_SIZE'] = 16
+    create_test_flats(app, tower_count=1, flats_per_tower=3)
+    
+    first = client.get('/api/flats?bedrooms=1&min_rent=900')
+    query_counter.clear()
+    second = client.get('/api/flats?bedrooms=1&min_rent=900.0')
+    
+    assert second.status_code == 200
+    assert json.loads(first.data) == json.loads(second.data)
+    assert query_counter == []
+    assert app.extensions['flat_search_cache'].stats()['hits'] == 1
+
+
+def test_flat_search_cache_invalidated_by_flat_update(client, app):
+    """Test that updating a flat drops the cached searches of its tower."""
+    app.config['FLAT_SEARCH_CACHE_SIZE'] = 16
+    token = get_admin_token(app)
+    create_test_flats(app, tower_count=2, flats_per_tower=1)
+    with app.app_context():
+        flat = Flat.query.join(Tower).filter(Tower.name == 'Tower 1').first()
+        flat_id, tower_id = flat.id, flat.tower_id
+    
+    assert len(json.loads(client.get('/api/flats').data)) == 2
+    
+    client.put(f'/api/admin/flats/{flat_id}',
+        data=json.dumps({'is_available': False}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    
+    assert len(json.loads(client.get('/api/flats').data)) == 1
+    assert json.loads(client.get(f'/api/flats?tower_id={tower_id}').data) == []
+
+
+def test_flat_search_cache_invalidated_by_tower_address_change(client, app):
+    """Test that changing a tower's address drops cached text searches that match on it."""
+    app.config['FLAT_SEARCH_CACHE_SIZE'] = 16
+    token = get_admin_token(app)
+    create_test_flats(app, tower_count=2, flats_per_tower=1)
+    
+    assert json.loads(client.get('/api/flats?q=harbour').data) == []
+    
+    client.put('/api/admin/towers/1',
+        data=json.dumps({'address': '5 Harbour Rd'}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    
+    assert [flat['tower_id'] for flat in json.loads(client.get('/api/flats?q=harbour').data)] == [1]
+
+
+def test_get_flat_facets(client, app, query_counter):
+    """Test facet counts per bedrooms, tower and rent bucket."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    query_counter.clear()
+    
+    response = client.get('/api/flats/facets?rent_buckets=1200,1400')
+    
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['total'] == 6
+    assert data['bedrooms'] == [
+        {'bedrooms': 1, 'count': 2},
+        {'bedrooms': 2, 'count': 2},
+        {'bedrooms': 3, 'count': 2}
+    ]
+    assert [tower['count'] for tower in data['towers']] == [3, 3]
+    assert data['towers'][0]['tower_name'] == 'Tower 1'
+    assert data['rent'] == [
+        {'min_rent': None, 'max_rent': 1200.0, 'count': 2},
+        {'min_rent': 1200.0, 'max_rent': 1400.0, 'count': 2},
+        {'min_rent': 1400.0, 'max_rent': None, 'count': 2}
+    ]
+    assert len(query_counter) == 1
+
+
+def test_get_flat_facets_applies_filters(client, app):
+    """Test that facets only count flats matching the search filters."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    
+    data = json.loads(client.get('/api/flats/facets?min_rent=1200').data)
+    
+    assert data['total'] == 4
+    assert {entry['bedrooms'] for entry in data['bedrooms']} == {2, 3}
+    assert client.get('/api/flats/facets?rent_buckets=2000,1000').status_code == 400
+
+
+def test_get_flats_sorted_by_rent_descending(client, app):
+    """Test server-side sorting with cursors across pages."""
+    create_test_flats(app, tower_count=3, flats_per_tower=3)
+    
+    rents = []
+    cursor = None
+    while True:
+        url = '/api/flats?sort=-rent&limit=2' + (f'&cursor={cursor}' if cursor else '')
+        data = json.loads(client.get(url).data)
+        rents.extend(flat['rent'] for flat in data['items'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    
+    assert rents == sorted(rents, reverse=True)
+    assert len(rents) == 9
+
+
+def test_get_flats_range_filters(client, app):
+    """Test area, floor and bathroom range filters."""
+    create_test_flats(app, tower_count=1, flats_per_tower=3)
+    
+    data = json.loads(client.get('/api/flats?min_area=850&max_floor=2&min_bathrooms=1&sort=floor').data)
+    
+    assert [flat['unit_number'] for flat in data] == ['201']
+
+
+def test_get_flats_sorted_by_rent_per_sqft(client, app):
+    """Test sorting by rent per square foot puts flats without an area last."""
+    create_test_flats(app, tower_count=1, flats_per_tower=3)
+    with app.app_context():
+        Flat.query.filter(Flat.unit_number == '101').update({'area_sqft': None})
+        db.session.commit()
+    
+    data = json.loads(client.get('/api/flats?sort=rent_per_sqft').data)
+    
+    ratios = [flat['rent'] / flat['area_sqft'] for flat in data[:2]]
+    assert ratios == sorted(ratios)
+    assert [flat['unit_number'] for flat in data] == ['201', '301', '101']
+
+
+def test_get_flats_sorted_pages_keep_flats_without_area(client, app):
+    """Test that paging a nullable sort returns every flat once, without a value last."""
+    create_test_flats(app, tower_count=1, flats_per_tower=4)
+    with app.app_context():
+        Flat.query.filter(Flat.unit_number.in_(['101', '301'])).update({'area_sqft': None})
+        db.session.commit()
+    
+    for sort, expected in [('area_sqft', ['201', '401', '101', '301']), ('-area_sqft', ['401', '201', '301', '101'])]:
+        units, cursor = [], ''
+        while cursor is not None:
+            data = json.loads(client.get(f'/api/flats?sort={sort}&limit=1&cursor={cursor}').data)
+            units.extend(flat['unit_number'] for flat in data['items'])
+            cursor = data['next_cursor']
+        assert units == expected
+
+
+def test_get_flats_invalid_sort(client, app):
+    """Test that unsupported sorts and mismatched cursors are rejected."""
+    create_test_flats(app, tower_count=1, flats_per_tower=3)
+    cursor = json.loads(client.get('/api/flats?sort=rent&limit=1').data)['next_cursor']
+    
+    assert client.get('/api/flats?sort=password').status_code == 400
+    assert client.get(f'/api/flats?sort=floor&limit=1&cursor={cursor}').status_code == 400
+
+
+def test_get_flats_text_search(client, app):
+    """Test free-text search over tower name and unit number with a bedroom phrase."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    with app.app_context():
+        tower = Tower.query.filter_by(name='Tower 2').first()
+        tower.name = 'Ocean View'
+        db.session.commit()
+    
+    data = json.loads(client.get('/api/flats?q=ocean 2 bed').data)
+    
+    assert [(flat['tower_name'], flat['unit_number']) for flat in data] == [('Ocean View', '201')]
+    
+    data = json.loads(client.get('/api/flats?q=301').data)
+    
+    assert sorted(flat['tower_name'] for flat in data) == ['Ocean View', 'Tower 1']
+
+
+def test_get_flats_text_search_ranked_pages(client, app):
+    """Test that text search ranks unit number matches first and paginates."""
+    create_test_flats(app, tower_count=3, flats_per_tower=3)
+    with app.app_context():
+        tower = Tower.query.filter_by(name='Tower 3').first()
+        tower.address = '201 Harbour Rd'
+        db.session.commit()
+    
+    units = []
+    cursor = None
+    while True:
+        url = '/api/flats?q=201&limit=2' + (f'&cursor={cursor}' if cursor else '')
+        data = json.loads(client.get(url).data)
+        units.extend((flat['tower_name'], flat['unit_number']) for flat in data['items'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    
+    # Every unit 201 outranks the flats only matching on the address
+    assert sorted(units[:3]) == [('Tower 1', '201'), ('Tower 2', '201'), ('Tower 3', '201')]
+    assert sorted(units[3:]) == [('Tower 3', '101'), ('Tower 3', '301')]
+    assert client.get('/api/flats?sort=relevance').status_code == 400
+
+
+def test_get_flats_sparse_fields(client, app, query_counter):
+    """Test that fields= narrows both the JSON keys and the selected columns."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/flats?fields=id,unit_number,rent,tower_name&sort=rent').data)
+    
+    assert len(data) == 6
+    assert all(set(flat) == {'id', 'unit_number', 'rent', 'tower_name'} for flat in data)
+    assert 'area_sqft' not in query_counter[0].split('FROM')[0]
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/flats?fields=id,rent').data)
+    
+    assert all(set(flat) == {'id', 'rent'} for flat in data)
+    assert 'towers' not in ' '.join(query_counter)
+    assert client.get('/api/flats?fields=id,password').status_code == 400
+
+
+def test_get_flats_by_ids(client, app, query_counter):
+    """Test batch fetch by IDs keeps the requested order and reports missing IDs."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    with app.app_context():
+        Flat.query.filter(Flat.id == 5).update({'is_available': False})
+        db.session.commit()
+    
+    query_counter.clear()
+    data = json.loads(client.get('/api/flats?ids=5,99,2,5&fields=unit_number,tower_name').data)
+    
+    assert data == {
+        'items': [
+            {'unit_number': '201', 'tower_name': 'Tower 2'},
+            {'unit_number': '201', 'tower_name': 'Tower 1'}
+        ],
+        'missing': [99]
+    }
+    assert len(query_counter) == 1
+    assert client.get('/api/flats?ids=1,abc').status_code == 400
+    assert client.get(f'/api/flats?ids=1,{2 ** 64}').status_code == 400
+    response = client.get('/api/flats?ids=1,\u00b2')
+    assert response.status_code == 400
+    assert json.loads(response.data)['error']['message'] == 'IDs must be positive integers'
+    assert client.get('/api/flats?ids=' + ','.join(str(i) for i in range(1, 102))).status_code == 400
@@ -0,0 +1,91 @@
+"""Tests for Idempotency-Key support on write endpoints."""
+import json
+from datetime import datetime, timedelta
+from app import db
+from app.models import Booking, IdempotencyKey
+from tests.test_flats import create_test_flats, get_admin_token
+from tests.test_bookings import register_and_get_token
+
+
+def book(client, token, key, flat_id=1):
+    """Helper to request a booking with an Idempotency-Key."""
+    return client.post('/api/bookings',
+        data=json.dumps({'flat_id': flat_id, 'requested_date': '2025-02-01'}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}', 'Idempotency-Key': key}
+    )
+
+
+def test_booking_replay_does_not_create_again(client, app, query_counter):
+    """Test that a retried booking returns the stored response without creating a second booking."""
+    create_test_flats(app, tower_count=1, flats_per_tower=2)
+    token = register_and_get_token(client)
+
+    first = book(client, token, 'booking-1')
+    query_counter.clear()
+    retry = book(client, token, 'booking-1')
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert json.loads(retry.data) == json.loads(first.data)
+    assert len(query_counter) == 1
+    assert db.session.query(Booking).count() == 1
+
+    # The key was used for flat 1; reusing it for another request is rejected
+    response = book(client, token, 'booking-1', flat_id=2)
+    assert response.status_code == 422
+    assert json.loads(response.data)['error']['code'] == 'IDEMPOTENCY_KEY_REUSED'
+
+    # Keys are scoped per user
+    other = register_and_get_token(client, email='other@example.com')
+    assert book(client, other, 'booking-1').status_code == 201
+    assert db.session.query(Booking).count() == 2
+
+    assert book(client, token, 'x' * 256).status_code == 400
+
+
+def test_admin_replay_and_expiry(client, app):
+    """Test that a retried approval is replayed, in-progress keys conflict and expired keys run again."""
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    token = register_and_get_token(client)
+    booking_id = json.loads(book(client, token, 'booking-1').data)['id']
+    admin_headers = {'Authorization': f'Bearer {get_admin_token(app)}', 'Idempotency-Key': 'approve-1'}
+
+    first = client.put(f'/api/admin/bookings/{booking_id}/approve', headers=admin_headers)
+    retry = client.put(f'/api/admin/bookings/{booking_id}/approve', headers=admin_headers)
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.data == first.data
+
+    # A key claimed by a request still in progress
+    db.session.add(IdempotencyKey(owner='1', key='pending', request_hash='unknown',
+                                  locked_until=datetime.utcnow() + timedelta(minutes=1)))
+    db.session.commit()
+    response = book(client, token, 'pending')
+    assert response.status_code == 409
+    assert json.loads(response.data)['error']['code'] == 'IDEMPOTENCY_IN_PROGRESS'
+
+    # Once expired, the key runs the endpoint again, which now rejects the approval
+    app.config['IDEMPOTENCY_KEY_TTL'] = 0
+    response = client.put(f'/api/admin/bookings/{booking_id}/approve', headers=admin_headers)
+    assert response.status_code == 400
+    assert 'Idempotent-Replayed' not in response.headers
+
+
+def test_stale_in_progress_key_is_reclaimed(client, app):
+    """Test that a key left in progress by a request that died runs again once its lock runs out."""
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    token = register_and_get_token(client)
+    db.session.add(IdempotencyKey(owner='1', key='crashed', request_hash='unknown',
+                                  locked_until=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+    
+    first = book(client, token, 'crashed')
+    retry = book(client, token, 'crashed')
+    
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert db.session.query(Booking).count() == 1
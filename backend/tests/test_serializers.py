@@ -0,0 +1,59 @@
+"""Tests for the row serializers and the JSON provider."""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from app.models import Flat, Booking, BookingStatus
+from app.serializers import RowSerializer
+from app.services.flat_service import FlatService
+from app.json_provider import FastJSONProvider
+from app import db
+from tests.test_flats import create_test_flats
+
+
+def test_flat_rows_match_to_dict(app):
+    """Test that row-serialized flats equal Flat.to_dict() for lists, pages and fieldsets."""
+    create_test_flats(app, tower_count=2, flats_per_tower=3)
+    with app.app_context():
+        Flat.query.filter(Flat.id == 2).update({'area_sqft': None})
+        # A rent of 0 is a value on both paths, not a missing one
+        Flat.query.filter(Flat.id == 3).update({'rent': 0})
+        db.session.commit()
+        
+        rows, _ = FlatService.get_flat_rows(sort='-rent')
+        assert rows == [db.session.get(Flat, row['id']).to_dict() for row in rows]
+        assert [row['rent'] for row in rows] == sorted((row['rent'] for row in rows), reverse=True)
+        assert rows[-1]['rent'] == 0.0
+        
+        page, next_key = FlatService.get_flat_rows(limit=2, sort='rent_per_sqft')
+        assert page == [db.session.get(Flat, row['id']).to_dict() for row in page]
+        
+        fields = ('unit_number', 'tower_name', 'rent')
+        page, _ = FlatService.get_flat_rows(limit=3, after=next_key, sort='rent_per_sqft', fields=fields)
+        full_page, _ = FlatService.get_flat_rows(limit=3, after=next_key, sort='rent_per_sqft')
+        assert page == [db.session.get(Flat, row['id']).to_dict(fields) for row in full_page]
+
+def test_row_serializer_converts_column_types(app):
+    """Test enum, date and datetime columns are converted like to_dict()."""
+    serializer = RowSerializer([
+        ('status', Booking.status),
+        ('requested_date', Booking.requested_date),
+        ('created_at', Booking.created_at)
+    ])
+    
+    rows = [(BookingStatus.PENDING, date(2025, 2, 1), datetime(2025, 1, 2, 3, 4, 5)), (BookingStatus.DECLINED, None, None)]
+    
+    assert serializer(rows) == [
+        {'status': 'pending', 'requested_date': '2025-02-01', 'created_at': '2025-01-02T03:04:05'},
+        {'status': 'declined', 'requested_date': None, 'created_at': None}
+    ]
+
+
+def test_json_provider_matches_default_encoding(app):
+    """Test that the JSON provider encodes values like Flask's default provider."""
+    data = {'b': [1, 2.5, None, True], 'a': Decimal('10.50'), 'when': datetime(2025, 1, 2), 'status': BookingStatus.PENDING}
+    
+    provider = FastJSONProvider(app)
+    expected = super(FastJSONProvider, provider).dumps(data)
+    
+    assert json.loads(provider.dumps(data)) == json.loads(expected)
+    assert list(json.loads(provider.dumps(data))) == ['a', 'b', 'status', 'when']
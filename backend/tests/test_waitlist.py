@@ -0,0 +1,110 @@
+"""Tests for flat waitlists."""
+import json
+from datetime import date
+from app import db
+from app.models import Booking, BookingStatus
+from tests.test_flats import create_test_flats, get_admin_token
+from tests.test_bookings import register_and_get_token
+
+
+def book(client, token, flat_id=1):
+    """Helper to request a booking for a flat."""
+    return client.post('/api/bookings',
+        data=json.dumps({'flat_id': flat_id, 'requested_date': '2025-02-01'}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+
+def join(client, token, flat_id=1):
+    """Helper to join the waitlist of a flat."""
+    return client.post(f'/api/flats/{flat_id}/waitlist',
+        data=json.dumps({'requested_date': '2025-03-01'}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+
+def position(client, token, flat_id=1):
+    """Helper to get the waitlist position of a user, or None."""
+    response = client.get(f'/api/flats/{flat_id}/waitlist', headers={'Authorization': f'Bearer {token}'})
+    return json.loads(response.data)['position'] if response.status_code == 200 else None
+
+
+def test_waitlist_queue_and_promotion(client, app, query_counter):
+    """Test that competing bookings are queued on approval and the head is promoted on termination."""
+    create_test_flats(app, tower_count=1, flats_per_tower=2)
+    admin_headers = {'Authorization': f'Bearer {get_admin_token(app)}'}
+    tokens = [register_and_get_token(client, email=f'user{n}@example.com') for n in range(4)]
+    booking_ids = [json.loads(book(client, token).data)['id'] for token in tokens[:3]]
+    
+    response = client.put(f'/api/admin/bookings/{booking_ids[0]}/approve?waitlist=true', headers=admin_headers)
+    lease_id = json.loads(response.data)['lease']['id']
+    
+    assert json.loads(response.data)['declined_bookings'] == 2
+    assert [position(client, token) for token in tokens] == [None, 1, 2, None]
+    
+    response = join(client, tokens[3])
+    assert response.status_code == 201
+    assert json.loads(response.data)['position'] == 3
+    assert join(client, tokens[3]).status_code == 409
+    assert join(client, tokens[3], flat_id=2).status_code == 400
+    assert join(client, tokens[3], flat_id=99).status_code == 404
+    
+    assert client.delete('/api/flats/1/waitlist', headers={'Authorization': f'Bearer {tokens[2]}'}).status_code == 200
+    assert position(client, tokens[3]) == 2
+    
+    query_counter.clear()
+    response = client.delete(f'/api/admin/leases/{lease_id}', headers=admin_headers)
+    
+    promoted = json.loads(response.data)['promoted_booking']
+    assert promoted['user_id'] == 3
+    assert promoted['status'] == 'pending'
+    assert sum('waitlist_entries' in statement for statement in query_counter) == 1
+    assert [position(client, token) for token in tokens] == [None, None, None, 1]
+    
+    bookings = json.loads(client.get('/api/bookings', headers={'Authorization': f'Bearer {tokens[1]}'}).data)
+    assert [booking['status'] for booking in bookings] == ['pending', 'declined']
+
+
+def test_batch_approval_queues_competing_bookings(client, app):
+    """Test that a batch approval with waitlist=true queues the competitors of every leased flat."""
+    create_test_flats(app, tower_count=1, flats_per_tower=2)
+    admin_headers = {'Authorization': f'Bearer {get_admin_token(app)}'}
+    tokens = [register_and_get_token(client, email=f'user{n}@example.com') for n in range(3)]
+    booking_ids = {(n, flat_id): json.loads(book(client, token, flat_id).data)['id']
+                   for flat_id in (1, 2) for n, token in enumerate(tokens)}
+    items = [{'id': booking_ids[(0, 1)], 'action': 'approve'}, {'id': booking_ids[(2, 2)], 'action': 'approve'}]
+    
+    response = client.post('/api/admin/bookings/batch?waitlist=true', data=json.dumps({'items': items}),
+                           content_type='application/json', headers=admin_headers)
+    
+    assert [result['declined_competing'] for result in json.loads(response.data)['results']] == [2, 2]
+    assert [position(client, token, flat_id=1) for token in tokens] == [None, 1, 2]
+    assert [position(client, token, flat_id=2) for token in tokens] == [1, 2, None]
+
+
+def test_join_rejects_tenant_and_promotion_passes_over_pending_bookings(client, app):
+    """Test that the lessee cannot join and a waiting user with a pending booking keeps their place."""
+    create_test_flats(app, tower_count=1, flats_per_tower=1)
+    admin_headers = {'Authorization': f'Bearer {get_admin_token(app)}'}
+    tokens = [register_and_get_token(client, email=f'user{n}@example.com') for n in range(3)]
+    booking_ids = [json.loads(book(client, token).data)['id'] for token in tokens]
+    
+    response = client.put(f'/api/admin/bookings/{booking_ids[0]}/approve?waitlist=true', headers=admin_headers)
+    lease_id = json.loads(response.data)['lease']['id']
+    
+    response = join(client, tokens[0])
+    assert response.status_code == 409
+    assert json.loads(response.data)['error']['message'] == 'You already lease this flat'
+    
+    # The head of the queue got a pending booking in the meantime
+    with app.app_context():
+        db.session.add(Booking(user_id=3, flat_id=1, requested_date=date(2025, 3, 1), status=BookingStatus.PENDING))
+        db.session.commit()
+    
+    response = client.delete(f'/api/admin/leases/{lease_id}', headers=admin_headers)
+    
+    assert response.status_code == 200
+    assert json.loads(response.data)['promoted_booking']['user_id'] == 4
+    assert [position(client, token) for token in tokens] == [None, 1, None]